@@ -1,4 +1,7 @@
 # Compression and Efficiency Time
+# --metrics FILE records how long the copy, compress and cleanup phases took and how many files
+# and bytes went through them (see instrument.py); --profile shows where the time went.
+import argparse
 import os
 import shutil
 import json
@@ -9,6 +12,9 @@ import zipfile
 import time
 import stat
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # instrument.py is shared by the tools
+from instrument import Metrics, add_arguments, instrumented
+
 def load_config(config_path):
     """Load and validate configuration"""
     if not os.path.exists(config_path):
@@ -38,7 +44,15 @@ def validate_paths(paths):
     
     return valid_paths, invalid_paths
 
-def zip_in_same_parent(source_folder):
+def counting_copy(metrics):
+    """A copy function for shutil.copytree that counts the files and bytes it copies."""
+    def copy(src, dst, *, follow_symlinks=True):
+        shutil.copy2(src, dst, follow_symlinks=follow_symlinks)
+        metrics.count('files_copied')
+        metrics.count('bytes_copied', os.path.getsize(dst))
+    return copy
+
+def zip_in_same_parent(source_folder, metrics):
     source_path = Path(source_folder).resolve() # Full path to the folder
     parent_dir = source_path.parent             # The folder containing the source
     
@@ -57,7 +71,10 @@ def zip_in_same_parent(source_folder):
                     
                 arcname = file_path.relative_to(source_path)
                 zipf.write(file_path, arcname)
+                metrics.count('files_zipped')
+                metrics.count('bytes_zipped', file_path.stat().st_size)
     
+    metrics.gauge('zip_bytes', zip_full_path.stat().st_size)
     print(f"\nZip created at: {zip_full_path}")
 
 def remove_readonly(func, path, excinfo):
@@ -66,6 +83,14 @@ def remove_readonly(func, path, excinfo):
     func(path)
 
 def main():
+    parser = argparse.ArgumentParser(description="Back up the folders listed in files_to_backup.json into a zip")
+    add_arguments(parser)
+    args = parser.parse_args()
+    metrics = Metrics('backup_script')
+    with instrumented(args, metrics, 'backup_script.prof'):
+        backup(metrics)
+
+def backup(metrics):
     # Use relative or configurable config path
     CONFIG_PATH = Path('files_to_backup.json')  # Or make this configurable
     BACKUP_DIR = Path(r"F:/Backup")
@@ -108,7 +133,8 @@ def main():
                 print(f"Skipping {source} - already exists in backup")
                 continue
                 
-            shutil.copytree(source, new_file_path)
+            with metrics.span('copy'):
+                shutil.copytree(source, new_file_path, copy_function=counting_copy(metrics))
             successful_backups.append(source)
             print(f"Successfully backed up: {source} to {new_file_path}")
 
@@ -116,12 +142,14 @@ def main():
             failed_backups.append((source, str(e)))
             print(f"Failed to backup {source}: {e}")
 
-    zip_in_same_parent(zip_file) #Creating the zip folder
+    with metrics.span('compress'):
+        zip_in_same_parent(zip_file, metrics) #Creating the zip folder
     temp_file = zip_file
     time.sleep(1)
     try:
         if os.path.exists(temp_file):
-            shutil.rmtree(temp_file, onexc=remove_readonly)
+            with metrics.span('cleanup'):
+                shutil.rmtree(temp_file, onexc=remove_readonly)
             print(f"\nTemporary folder has been deleted successfully!: {zip_file}")
     except PermissionError:\
         print(f"\nAccess Denied. Could not delete file: {zip_file}")
@@ -135,6 +163,8 @@ def main():
     print(f"Failed: {len(failed_backups)}")
     print(f"Skipped (invalid paths): {len(invalid_paths)}")
     print(f"Backup location: {zip_file}")
+    metrics.count('sources_backed_up', len(successful_backups))
+    metrics.count('sources_failed', len(failed_backups))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,350 @@
+# Benchmark and correctness harness for the csv_data_analyzer versions
+# Generates synthetic name,age,score files (skewed values, some empty cells, and a few empty,
+# blank, short and quoted rows), runs every implementation in its own process so timings and peak
+# memory don't leak between runs, checks each answer against a reference and writes a Markdown +
+# JSON comparison report.
+# The repo's own data.csv, whose last row has no line break, and a tiny file of short and quoted
+# rows are always checked first.
+#
+#   python benchmark.py --sizes 1MB,10MB,100MB --report benchmark_report.md
+#   python benchmark.py --sizes 1MB --baseline old_report.json   # exits 1 on a regression
+#   python benchmark.py --sizes 100MB --extra-columns 40           # narrow query over a wide file
+#
+# main_v5.py is not benchmarked: it only prints df.head(), there is no answer to compare.
+import argparse
+import builtins
+import contextlib
+import csv
+import io
+import json
+import os
+import random
+import re
+import resource
+import runpy
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+FIELDS = ["participants", "average_age", "average_score", "above_average", "mean_score"]
+UNITS = {"KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+# rows shorter than the header don't count, a comma inside quotes doesn't split the name
+EDGE_CASES = 'name,age,score\nbob\nalice,30,80\ncarl,20\n"d,x",40,90\n'
+
+
+# --- synthetic data -----------------------------------------------------------------------
+
+def parse_size(text: str) -> int:
+  match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*(KB|MB|GB)?\s*", text.upper())
+  if not match:
+    raise argparse.ArgumentTypeError(f"Invalid size: {text}")
+  number, unit = match.groups()
+  return int(float(number) * UNITS.get(unit, 1))
+
+
+def generate_csv(file_path: Path, target_bytes: int, empty_rate: float = 0.02, seed: int = 42,
+                 extra_columns: int = 0):
+  """Write roughly `target_bytes` of name,age,score rows with skewed values and empty cells.
+
+  A few rows are blank, cut short or have a quoted name with a comma in it; the analyzers skip
+  the first two kinds. `extra_columns` unused text columns are appended to every row to make
+  the file wide.
+  """
+  rng = random.Random(seed)
+  padding = [f"note{i}" for i in range(extra_columns)]
+  with open(file_path, 'w', newline='') as f:
+    writer = csv.writer(f)
+    writer.writerow(["name", "age", "score"] + [f"extra_{i}" for i in range(extra_columns)])
+    while f.tell() < target_bytes:
+      rows = []
+      for _ in range(10000):
+        kind = rng.random()
+        if kind < empty_rate / 4:
+          rows.append([""] * (3 + extra_columns))   # completely empty row, like the ones in Book1.csv
+          continue
+        if kind < empty_rate / 2:
+          rows.append([])   # blank line
+          continue
+        name = f"user{int(rng.paretovariate(1.2))}"   # a few very common names, a long tail
+        if kind < empty_rate * 3 / 4:
+          name += ", jr"   # written quoted
+        age = str(min(90, int(rng.triangular(10, 90, 18))))
+        score = str(int(100 * rng.betavariate(5, 2)))
+        row = [value if rng.random() >= empty_rate else "" for value in (name, age, score)] + padding
+        if kind < empty_rate:
+          row = row[:rng.randint(1, 2)]   # cut short
+        rows.append(row)
+      writer.writerows(rows)
+
+
+def dataset(data_dir: Path, size: int, empty_rate: float, seed: int, extra_columns: int = 0) -> Path:
+  data_dir.mkdir(parents=True, exist_ok=True)
+  file_path = data_dir / f"synthetic_{size}_{empty_rate}_{seed}_{extra_columns}.csv"
+  if not file_path.exists():
+    print(f"Generating {file_path.name} ...")
+    partial = file_path.with_suffix(".partial")
+    generate_csv(partial, size, empty_rate, seed, extra_columns)
+    os.replace(partial, file_path)
+  return file_path
+
+
+# --- reference and engines ----------------------------------------------------------------
+
+def reference(file_path: str) -> tuple:
+  """Plain, obviously-correct answer: averages over rows with a name, empty cells skipped.
+
+  Rows follow main_v6's rules: blank lines and rows with fewer fields than the header are not
+  counted at all. The last field is the mean over the scores that are there, which is what
+  pandas' mean() (v4) answers; the other versions divide by the participants instead and don't
+  report it.
+  """
+  participants, total_age, scores = 0, 0, []
+  with open(file_path, newline='') as f:
+    reader = csv.reader(f)
+    header = next(reader)
+    for cells in reader:
+      if len(cells) < len(header):
+        continue
+      row = dict(zip(header, cells))
+      participants += bool(row["name"])
+      total_age += int(row["age"]) if row["age"] else 0
+      if row["score"]:
+        scores.append(int(row["score"]))
+  average_age = total_age / participants if participants else 0
+  average_score = sum(scores) / participants if participants else 0
+  mean_score = sum(scores) / len(scores) if scores else 0
+  return participants, average_age, average_score, sum(1 for s in scores if s > average_score), mean_score
+
+
+def _run_script(script: str, file_path: str, answers: list | None = None) -> str:
+  """Run one of the script-style versions and return what it printed."""
+  output = io.StringIO()
+  with tempfile.TemporaryDirectory() as work_dir:
+    os.symlink(os.path.abspath(file_path), os.path.join(work_dir, "Book1.csv"))
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    answers = iter(answers or [])
+    original_input = builtins.input
+    builtins.input = lambda prompt="": next(answers)
+    try:
+      with contextlib.redirect_stdout(output):
+        runpy.run_path(str(HERE / script), run_name="__main__")
+    finally:
+      builtins.input = original_input
+      os.chdir(cwd)
+  return output.getvalue()
+
+
+def _parse_summary(text: str) -> tuple:
+  patterns = [r"Total Participants: (\S+)", r"Average Age of Participants: (\S+)",
+              r"Average Score: (\S+)", r"Scores Above Average: (\S+)"]
+  values = []
+  for pattern in patterns:
+    match = re.search(pattern, text)
+    if not match:
+      raise RuntimeError(text.strip().splitlines()[-1] if text.strip() else "no output")
+    values.append(float(match.group(1)))
+  return tuple(values)
+
+
+def _engine_function(module: str):
+  def run(file_path: str) -> tuple:
+    sys.path.insert(0, str(HERE))
+    return __import__(module).analyze_csv(file_path)
+  return run
+
+
+def _engine_v3(file_path: str) -> tuple:
+  return _parse_summary(_run_script("main_v3.py", file_path))
+
+
+def _engine_v4(file_path: str) -> tuple:
+  # v4 is interactive and answers one question at a time: ask for the mean score, which pandas
+  # takes over the non-empty scores only
+  text = _run_script("main_v4.py", file_path, answers=["Book1.csv", "score", "mean"])
+  match = re.search(r"Result: (\S+)", text)
+  if not match:
+    raise RuntimeError(text.strip().splitlines()[-1] if text.strip() else "no output")
+  return None, None, None, None, float(match.group(1))
+
+
+def _engine_v6_mmap(file_path: str) -> tuple:
+  sys.path.insert(0, str(HERE))
+  from scanner import analyze_csv
+  return analyze_csv(file_path)
+
+
+def _engine_v6_approx(file_path: str) -> tuple:
+  sys.path.insert(0, str(HERE))
+  from main_v6 import approx_analyze
+  columns = {column.name: column for column in approx_analyze(file_path)[0]}
+  name, age, score = columns["name"], columns["age"], columns["score"]
+  participants = name.count - name.missing
+  average_score = score.total / participants if participants else 0
+  above = score.quantiles.n - score.quantiles.rank(average_score)
+  return participants, age.total / participants if participants else 0, average_score, above
+
+
+def _engine_v6_incremental(file_path: str) -> tuple:
+  sys.path.insert(0, str(HERE))
+  from incremental import analyze_incremental
+  with tempfile.TemporaryDirectory() as state_dir:
+    results, _, _ = analyze_incremental(file_path, os.path.join(state_dir, "state.json"))
+  return results
+
+
+# name -> (callable, relative tolerance allowed against the reference)
+ENGINES = {
+  "v1": (_engine_function("main_v1"), 1e-9),
+  "v2": (_engine_function("main_v2"), 1e-9),
+  "v3": (_engine_v3, 1e-3),
+  "v4": (_engine_v4, 1e-6),
+  "v6": (_engine_function("main_v6"), 1e-9),
+  "v6-mmap": (_engine_v6_mmap, 1e-9),
+  "v6-approx": (_engine_v6_approx, 0.02),
+  "v6-incremental": (_engine_v6_incremental, 1e-9),
+}
+
+
+def run_one(engine: str, file_path: str):
+  """Child-process entry point: run one engine once and print a JSON line."""
+  func, _ = ENGINES[engine]
+  start = time.perf_counter()
+  try:
+    result, error = func(file_path), None
+  except BaseException as err:   # SystemExit from the scripts included
+    result, error = None, f"{type(err).__name__}: {err}"
+  seconds = time.perf_counter() - start
+  peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  print(json.dumps({"seconds": seconds, "peak_rss_kb": peak_kb, "result": result, "error": error}))
+
+
+def measure(engine: str, file_path: Path, repeat: int) -> dict:
+  best = None
+  for _ in range(repeat):
+    completed = subprocess.run([sys.executable, __file__, "--run-one", engine, str(file_path)],
+                               capture_output=True, text=True)
+    lines = completed.stdout.strip().splitlines()
+    if not lines:
+      return {"seconds": None, "peak_rss_kb": None, "result": None,
+              "error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "crashed"}
+    run = json.loads(lines[-1])
+    if run["error"]:
+      return run
+    if best is None or run["seconds"] < best["seconds"]:
+      best = run
+  return best
+
+
+def compare(result, expected: tuple, tolerance: float) -> list:
+  """Names of the fields that disagree with the reference (fields an engine can't answer are skipped)."""
+  wrong = []
+  for field, got, want in zip(FIELDS, result, expected):
+    if got is None:
+      continue
+    if abs(got - want) > tolerance * max(1, abs(want)) + 1e-6:
+      wrong.append(field)
+  return wrong
+
+
+# --- report -------------------------------------------------------------------------------
+
+def write_report(rows: list, report_path: Path):
+  lines = ["# csv_data_analyzer benchmark", "",
+           f"Python {sys.version.split()[0]} on {sys.platform}", "",
+           "| File size | Engine | Time (s) | MB/s | Peak RSS (MB) | Check |",
+           "|---|---|---|---|---|---|"]
+  for row in rows:
+    if row["error"]:
+      lines.append(f"| {row['size_mb']:.0f} MB | {row['engine']} | - | - | - | error: {row['error']} |")
+      continue
+    check = "ok" if not row["mismatches"] else "MISMATCH: " + ", ".join(row["mismatches"])
+    lines.append(f"| {row['size_mb']:.0f} MB | {row['engine']} | {row['seconds']:.3f} | "
+                 f"{row['size_mb'] / row['seconds']:.1f} | {row['peak_rss_kb'] / 1024:.1f} | {check} |")
+  report_path.write_text("\n".join(lines) + "\n", encoding='utf-8')
+  report_path.with_suffix(".json").write_text(json.dumps(rows, indent=2), encoding='utf-8')
+
+
+def find_regressions(rows: list, baseline_path: Path, threshold: float) -> list:
+  with open(baseline_path, 'r', encoding='utf-8') as f:
+    baseline = {(row["size"], row["engine"]): row for row in json.load(f)}
+  regressions = []
+  for row in rows:
+    old = baseline.get((row["size"], row["engine"]))
+    if not old or old["error"]:
+      continue
+    if row["error"]:
+      regressions.append(f"{row['engine']} @ {row['size_mb']:.0f} MB now fails: {row['error']}")
+    elif row["mismatches"] and not old["mismatches"]:
+      regressions.append(f"{row['engine']} @ {row['size_mb']:.0f} MB now disagrees with the reference")
+    elif row["seconds"] > old["seconds"] * (1 + threshold):
+      regressions.append(f"{row['engine']} @ {row['size_mb']:.0f} MB is slower: "
+                         f"{old['seconds']:.3f}s -> {row['seconds']:.3f}s")
+  return regressions
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmark and cross-check the csv_data_analyzer versions.")
+  parser.add_argument('--sizes', default="1MB,10MB",
+                      help="Comma-separated file sizes to generate, e.g. 1MB,100MB,2GB (default: 1MB,10MB)")
+  parser.add_argument('--engines', default=",".join(ENGINES),
+                      help=f"Comma-separated engines to run (default: all of {', '.join(ENGINES)})")
+  parser.add_argument('--empty-rate', type=float, default=0.02, help="Share of empty cells (default: 0.02)")
+  parser.add_argument('--seed', type=int, default=42)
+  parser.add_argument('--extra-columns', type=int, default=0,
+                      help="Unused text columns added to every row to make the files wide (default: 0)")
+  parser.add_argument('--repeat', type=int, default=3, help="Runs per engine, the fastest is kept (default: 3)")
+  parser.add_argument('--data-dir', default=str(HERE / "bench_data"), help="Where generated files are cached")
+  parser.add_argument('--report', default="benchmark_report.md", help="Markdown report (a .json copy is written too)")
+  parser.add_argument('--baseline', help="Earlier report .json to compare against")
+  parser.add_argument('--threshold', type=float, default=0.2,
+                      help="Slowdown against --baseline counted as a regression (default: 0.2 = 20%%)")
+  parser.add_argument('--run-one', nargs=2, metavar=("ENGINE", "FILE"), help=argparse.SUPPRESS)
+  args = parser.parse_args()
+
+  if args.run_one:
+    run_one(*args.run_one)
+    return
+
+  engines = [name.strip() for name in args.engines.split(",") if name.strip()]
+  unknown = [name for name in engines if name not in ENGINES]
+  if unknown:
+    parser.error(f"Unknown engine(s): {', '.join(unknown)}")
+
+  rows = []
+  own = HERE / "data.csv"   # tiny, but its last row has no final newline
+  edge = Path(args.data_dir) / "edge_cases.csv"
+  edge.parent.mkdir(parents=True, exist_ok=True)
+  edge.write_text(EDGE_CASES, encoding='utf-8')
+  files = [(own.stat().st_size, own), (edge.stat().st_size, edge)]
+  files += [(size, dataset(Path(args.data_dir), size, args.empty_rate, args.seed, args.extra_columns))
+            for size in (parse_size(text) for text in args.sizes.split(","))]
+  for size, file_path in files:
+    expected = reference(str(file_path))
+    for engine in engines:
+      run = measure(engine, file_path, args.repeat)
+      mismatches = [] if run["error"] else compare(run["result"], expected, ENGINES[engine][1])
+      row = {"size": size, "size_mb": file_path.stat().st_size / UNITS["MB"], "engine": engine,
+             "mismatches": mismatches, **run}
+      rows.append(row)
+      status = run["error"] or ("ok" if not mismatches else "MISMATCH " + ", ".join(mismatches))
+      timing = f"{run['seconds']:.3f}s" if run["seconds"] is not None else "-"
+      print(f"{row['size_mb']:8.1f} MB  {engine:15} {timing:>9}  {status}")
+
+  report_path = Path(args.report)
+  write_report(rows, report_path)
+  print(f"\nReport written to {report_path} and {report_path.with_suffix('.json')}")
+
+  if args.baseline:
+    regressions = find_regressions(rows, Path(args.baseline), args.threshold)
+    for regression in regressions:
+      print(f"REGRESSION: {regression}")
+    if regressions:
+      sys.exit(1)
+
+
+if __name__ == "__main__":
+  main()
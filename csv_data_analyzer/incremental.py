@@ -0,0 +1,146 @@
+# Incremental analysis for CSV files that only ever grow by appended rows
+# The aggregate state is saved next to the data together with the byte offset that was reached,
+# so the next run only reads the new tail. The header and the bytes just before the saved offset
+# are fingerprinted; if either changed (or the file shrank) the file was rewritten and the state
+# is rebuilt from the first byte. A last row without a line break is counted in the answer but
+# not saved: the offset stops before it, so the next run reads it again once it is complete.
+import csv
+import hashlib
+import json
+import os
+from collections import Counter
+
+STATE_VERSION = 1
+CHECK_BYTES = 4096   # how much of the already-read data is re-hashed to detect rewrites
+
+
+def fingerprint(data: bytes) -> str:
+  return hashlib.sha256(data).hexdigest()
+
+
+def default_state_path(file_path: str) -> str:
+  return f"{file_path}.state.json"
+
+
+def empty_state() -> dict:
+  return {
+    "version": STATE_VERSION,
+    "header_fingerprint": None,
+    "offset": 0,
+    "tail_fingerprint": None,
+    "participants": 0,
+    "total_age": 0,
+    "score_counts": {},   # score -> how many participants got it, enough to recount "above average"
+  }
+
+
+def load_state(state_path: str) -> dict:
+  try:
+    with open(state_path, 'r', encoding='utf-8') as f:
+      state = json.load(f)
+  except (FileNotFoundError, json.JSONDecodeError):
+    return empty_state()
+  if state.get("version") != STATE_VERSION:
+    return empty_state()
+  return state
+
+
+def save_state(state: dict, state_path: str):
+  temp_path = f"{state_path}.tmp"
+  with open(temp_path, 'w', encoding='utf-8') as f:
+    json.dump(state, f)
+    f.flush()
+    os.fsync(f.fileno())
+  os.replace(temp_path, state_path)
+
+
+def _tail_fingerprint(f, offset: int) -> str:
+  start = max(0, offset - CHECK_BYTES)
+  f.seek(start)
+  return fingerprint(f.read(offset - start))
+
+
+def is_still_valid(state: dict, f, header_line: bytes, size: int) -> bool:
+  """True when the file is the one the state was built from, plus appended rows."""
+  if state["header_fingerprint"] != fingerprint(header_line):
+    return False
+  if size < state["offset"]:
+    return False   # truncated
+  return state["tail_fingerprint"] == _tail_fingerprint(f, state["offset"])
+
+
+def _count_row(row: list, width: int, columns: tuple, state: dict, score_counts: Counter):
+  if len(row) < width:
+    return
+  name_index, age_index, score_index = columns
+  if row[name_index]:
+    state["participants"] += 1
+  if row[age_index]:
+    state["total_age"] += int(row[age_index])
+  if row[score_index]:
+    score_counts[int(row[score_index])] += 1
+
+
+def update_state(file_path: str, state: dict) -> tuple:
+  """Fold any newly appended rows into `state`. Returns (state, current, rebuilt, bytes_read):
+  `state` is what should be saved, `current` also counts an unterminated last row."""
+  size = os.path.getsize(file_path)
+  with open(file_path, 'rb') as f:
+    header_line = f.readline()
+    data_start = f.tell()
+    rebuilt = not is_still_valid(state, f, header_line, size)
+    if rebuilt:
+      state = empty_state()
+      state["header_fingerprint"] = fingerprint(header_line)
+      state["offset"] = data_start
+
+    header = next(csv.reader([header_line.decode('utf-8-sig')]))
+    columns = (header.index("name"), header.index("age"), header.index("score"))
+
+    f.seek(state["offset"])
+    score_counts = Counter({int(score): count for score, count in state["score_counts"].items()})
+    position = [state["offset"]]
+    unterminated = []
+
+    def complete_lines():
+      for line in f:
+        if not line.endswith(b'\n'):
+          unterminated.append(line.decode('utf-8'))   # the last row, possibly still being written
+          break
+        position[0] += len(line)
+        yield line.decode('utf-8')
+
+    for row in csv.reader(complete_lines()):
+      _count_row(row, len(header), columns, state, score_counts)
+
+    offset = position[0]
+    bytes_read = offset - state["offset"]
+    state["score_counts"] = {str(score): count for score, count in score_counts.items()}
+    state["offset"] = offset
+    state["tail_fingerprint"] = _tail_fingerprint(f, offset)
+
+  current = state
+  if unterminated:
+    current = dict(state)
+    for row in csv.reader(unterminated):
+      _count_row(row, len(header), columns, current, score_counts)
+    current["score_counts"] = {str(score): count for score, count in score_counts.items()}
+  return state, current, rebuilt, bytes_read
+
+
+def summarize(state: dict) -> tuple:
+  """Same tuple as main_v6.analyze_csv, computed from the saved aggregates."""
+  participants = state["participants"]
+  score_counts = {int(score): count for score, count in state["score_counts"].items()}
+  total_score = sum(score * count for score, count in score_counts.items())
+  average_age = state["total_age"] / participants if participants > 0 else 0
+  average_score = total_score / participants if participants > 0 else 0
+  no_above_average_scores = sum(count for score, count in score_counts.items() if score > average_score)
+  return participants, average_age, average_score, no_above_average_scores
+
+
+def analyze_incremental(file_path: str, state_path: str | None = None) -> tuple:
+  state_path = state_path or default_state_path(file_path)
+  state, current, rebuilt, bytes_read = update_state(file_path, load_state(state_path))
+  save_state(state, state_path)
+  return summarize(current), rebuilt, bytes_read
@@ -1,4 +1,3 @@
-import matplotlib.pyplot as plt
 import pandas as pd
 df = pd.read_csv('Book1.csv')
 print(df.head())
\ No newline at end of file
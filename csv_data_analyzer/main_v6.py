@@ -0,0 +1,215 @@
+# Version 6: proper command line flags and an --approx mode for files too big to answer exactly
+# The approx mode reads the file once and keeps streaming sketches per column (see sketches.py),
+# --workers splits the file into byte ranges that are sketched in parallel and then merged.
+# NOTE: byte-range splitting assumes no quoted field contains a newline.
+# --incremental keeps the totals in a state file and only reads rows appended since the last run.
+# --mmap answers the exact summary from a memory-mapped scan of just the needed columns (scanner.py).
+# --report DIR writes histograms, a score-vs-age chart and a summary table (report.py).
+# The modules behind each flag are only imported when that flag is used: the scanner pulls in
+# numpy, which costs more than a plain run of the exact summary takes on a small file.
+# --metrics FILE records how long the file took to parse and how many bytes and participants it
+# had (see instrument.py); --profile shows where the time went.
+import argparse
+import csv
+import os
+import sys
+from pathlib import Path
+
+from sketches import ColumnSketch, Reservoir
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # instrument.py is shared by the tools
+from instrument import Metrics, add_arguments, instrumented
+
+QUANTILES = [0.25, 0.5, 0.75, 0.9, 0.99]
+
+
+def analyze_csv(file_path: str) -> tuple:
+  participants = 0
+  total_age = 0
+  scores = []
+  with open(file_path, 'r', newline='') as f:
+    csv_reader = csv.reader(f)
+    header = next(csv_reader)
+    name_index = header.index("name")
+    age_index = header.index("age")
+    score_index = header.index("score")
+    for row in csv_reader:
+      if len(row) < len(header):
+        continue
+      if row[name_index]:
+        participants += 1
+      if row[age_index]:
+        total_age += int(row[age_index])
+      if row[score_index]:
+        scores.append(int(row[score_index]))
+
+  average_age = total_age / participants if participants > 0 else 0
+  average_score = sum(scores) / participants if participants > 0 else 0
+  no_above_average_scores = sum(1 for score in scores if score > average_score)
+  return participants, average_age, average_score, no_above_average_scores
+
+
+def read_header(file_path: str) -> tuple:
+  """Return the header row and the byte offset where the data rows start."""
+  with open(file_path, 'rb') as f:
+    first_line = f.readline()
+    header = next(csv.reader([first_line.decode('utf-8-sig')]))
+    return header, f.tell()
+
+
+def byte_ranges(file_path: str, data_start: int, parts: int) -> list:
+  """Split the data section into `parts` byte ranges that start and end on line boundaries."""
+  size = os.path.getsize(file_path)
+  step = max(1, (size - data_start) // parts)
+  bounds = [data_start]
+  with open(file_path, 'rb') as f:
+    for i in range(1, parts):
+      f.seek(data_start + i * step)
+      f.readline()   # move forward to the start of the next full line
+      bounds.append(max(min(f.tell(), size), bounds[-1]))
+  bounds.append(size)
+  return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+
+def iter_lines(file_path: str, start: int, end: int):
+  with open(file_path, 'rb') as f:
+    f.seek(start)
+    while f.tell() < end:
+      line = f.readline()
+      if not line:
+        break
+      yield line.decode('utf-8')
+
+
+def sketch_range(job: tuple) -> tuple:
+  file_path, header, start, end, preview_size = job
+  columns = [ColumnSketch(name) for name in header]
+  preview = Reservoir(preview_size)
+  width = len(header)
+  for row in csv.reader(iter_lines(file_path, start, end)):
+    if len(row) < width:   # blank or short rows are skipped, as in analyze_csv
+      continue
+    for i in range(width):
+      columns[i].update(row[i])
+    if any(row):
+      preview.update(row)
+  return columns, preview
+
+
+def approx_analyze(file_path: str, workers: int = 1, preview_size: int = 5) -> tuple:
+  header, data_start = read_header(file_path)
+  jobs = [(file_path, header, start, end, preview_size)
+          for start, end in byte_ranges(file_path, data_start, max(1, workers))]
+  if workers > 1 and len(jobs) > 1:
+    from multiprocessing import Pool
+    with Pool(workers) as pool:
+      results = pool.map(sketch_range, jobs)
+  else:
+    results = [sketch_range(job) for job in jobs]
+
+  if not results:
+    return [ColumnSketch(name) for name in header], Reservoir(preview_size)
+  columns, preview = results[0]
+  for other_columns, other_preview in results[1:]:
+    for column, other in zip(columns, other_columns):
+      column.merge(other)
+    preview.merge(other_preview)
+  return columns, preview
+
+
+def print_exact(participants, average_age, average_score, no_above_average_scores):
+  print("-"*50)
+  print(f'|\t Total Participants: {participants}')
+  print(f'|\t Average Score: {round(average_score, 3)}')
+  print(f'|\t Average Age of Participants: {round(average_age, 2)}')
+  print(f'|\t Number of Participants With Scores Above Average: {no_above_average_scores}')
+  print("-"*50)
+
+
+def print_approx(columns: list, preview: Reservoir):
+  print("-"*50)
+  print("|\t APPROXIMATE RESULTS (one pass, streaming sketches)")
+  for column in columns:
+    filled = column.count - column.missing
+    print("-"*50)
+    print(f"| Column: {column.name}")
+    print(f"|\t Filled cells: {filled} (empty: {column.missing})")
+    distinct = column.distinct
+    print(f"|\t Distinct values: ~{round(distinct.count())} (±{distinct.relative_error():.1%})")
+    if column.is_numeric():
+      kll = column.quantiles
+      error = kll.rank_error()
+      print(f"|\t Mean: {round(column.mean(), 3)}  Min: {column.minimum}  Max: {column.maximum}")
+      for q, value in zip(QUANTILES, kll.quantiles(QUANTILES)):
+        print(f"|\t p{round(q * 100)}: ~{value} (rank ±{error:.2%})")
+      above = kll.n - kll.rank(column.mean())
+      print(f"|\t Values above mean: ~{above} (±{round(error * kll.n)})")
+    frequent = column.frequent
+    top = ", ".join(f"{value} (~{count})" for count, value in frequent.top(5))
+    print(f"|\t Top values: {top} (counts may be over by ≤{round(frequent.error_bound())})")
+  print("-"*50)
+  print(f"| Random preview ({len(preview.items)} of {preview.n} rows):")
+  for row in preview.items:
+    print(f"|\t {', '.join(row)}")
+  print("-"*50)
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Summarise a name,age,score CSV file.")
+  parser.add_argument('file', nargs='?', default='Book1.csv', help="CSV file to analyze")
+  parser.add_argument('--approx', action='store_true',
+                      help="Answer from streaming sketches in one pass (quantiles, distinct counts, top values)")
+  parser.add_argument('--workers', type=int, default=1,
+                      help="Processes used to sketch the file in parallel with --approx (default: 1)")
+  parser.add_argument('--incremental', action='store_true',
+                      help="Reuse the saved totals and only read rows appended since the last run")
+  parser.add_argument('--state', help="State file for --incremental (default: <file>.state.json)")
+  parser.add_argument('--mmap', action='store_true',
+                      help="Memory-map the file and parse only the name, age and score columns")
+  parser.add_argument('--report', metavar='DIR',
+                      help="Write PNG charts and an HTML summary for the file into DIR")
+  add_arguments(parser)
+  args = parser.parse_args()
+  file = Path(args.file)
+  mode = next((flag for flag in ('report', 'incremental', 'approx', 'mmap') if getattr(args, flag)), 'exact')
+  metrics = Metrics('csv_data_analyzer', mode=mode)
+
+  try:
+    with instrumented(args, metrics, 'csv_data_analyzer.prof'):
+      metrics.count('bytes', os.path.getsize(args.file))
+      if args.report:
+        from report import build_report
+        with metrics.span('report'):
+          path = build_report(args.file, args.report)
+        print(f"Report written to {path}")
+      elif args.incremental:
+        from incremental import analyze_incremental
+        with metrics.span('parse'):
+          results, rebuilt, bytes_read = analyze_incremental(args.file, args.state)
+        metrics.count('bytes_read', bytes_read)
+        print(f"{'Full scan' if rebuilt else 'Appended rows only'}: read {bytes_read} bytes")
+        print_exact(*results)
+      elif args.approx:
+        with metrics.span('sketch'):
+          columns, preview = approx_analyze(args.file, workers=args.workers)
+        print_approx(columns, preview)
+      else:
+        if args.mmap:
+          from scanner import analyze_csv as scan_analyze_csv
+        with metrics.span('parse'):
+          results = scan_analyze_csv(args.file) if args.mmap else analyze_csv(args.file)
+        metrics.count('participants', results[0])
+        print_exact(*results)
+  except FileNotFoundError:
+    print(f"File not Found: {file.name}")
+    sys.exit(1)
+  except PermissionError:
+    print(f"Permission Denied: {file.name}")
+    sys.exit(1)
+  except Exception as err:
+    print(f"Error Found: {err}")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+  main()
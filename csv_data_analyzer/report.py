@@ -0,0 +1,299 @@
+# Chart/report generation for name,age,score CSV files of any size
+# One streaming pass reduces the file to small aggregates: adaptive-width histograms for age and
+# score, a 2-D binned grid plus a reservoir sample of points for the score-vs-age scatter, and a
+# summary table (count, mean, min, max, KLL quantiles). Millions of rows never reach matplotlib.
+# The charts are independent, so they are rendered in parallel processes, and everything is
+# cached under the output directory by an input fingerprint; re-running on an unchanged file
+# only rewrites report.html.
+#
+#   python report.py Book1.csv --out report
+import argparse
+import csv
+import hashlib
+import html
+import json
+import math
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from sketches import KLL, Reservoir
+
+QUANTILES = [0.25, 0.5, 0.75, 0.9, 0.99]
+SAMPLE_BYTES = 1 << 16
+
+
+class StreamingHistogram:
+  """Histogram whose bin width doubles whenever the data would need more than `max_bins` bins."""
+
+  def __init__(self, max_bins: int = 120, width: float = 2 ** -10):
+    self.max_bins = max_bins
+    self.width = width
+    self.counts = Counter()
+    self.low = None
+    self.high = None
+
+  def key(self, value: float) -> int:
+    return math.floor(value / self.width)
+
+  def add(self, value: float):
+    key = self.key(value)
+    self.counts[key] += 1
+    self.low = key if self.low is None else min(self.low, key)
+    self.high = key if self.high is None else max(self.high, key)
+    while self.high - self.low + 1 > self.max_bins:
+      self._coarsen()
+
+  def _coarsen(self):
+    self.width *= 2
+    merged = Counter()
+    for key, count in self.counts.items():
+      merged[key // 2] += count
+    self.counts = merged
+    self.low //= 2
+    self.high //= 2
+
+  def bins(self) -> list:
+    """[(left edge, count), ...] in order."""
+    return [(key * self.width, self.counts[key]) for key in sorted(self.counts)]
+
+
+class StreamingGrid:
+  """2-D version of StreamingHistogram: each axis coarsens independently."""
+
+  def __init__(self, max_bins: int = 80):
+    self.x = StreamingHistogram(max_bins)
+    self.y = StreamingHistogram(max_bins)
+    self.counts = Counter()
+
+  def add(self, x: float, y: float):
+    x_width, y_width = self.x.width, self.y.width
+    self.x.add(x)
+    self.y.add(y)
+    if (x_width, y_width) != (self.x.width, self.y.width):
+      x_factor, y_factor = int(self.x.width / x_width), int(self.y.width / y_width)
+      merged = Counter()
+      for (i, j), count in self.counts.items():
+        merged[i // x_factor, j // y_factor] += count
+      self.counts = merged
+    self.counts[self.x.key(x), self.y.key(y)] += 1
+
+  def cells(self) -> list:
+    """[(x left edge, y left edge, count), ...]."""
+    return [(i * self.x.width, j * self.y.width, count) for (i, j), count in self.counts.items()]
+
+
+def fingerprint(file_path: str) -> str:
+  """Cheap input fingerprint: size, mtime and the first and last 64 KiB."""
+  stat = os.stat(file_path)
+  digest = hashlib.sha256(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+  with open(file_path, 'rb') as f:
+    digest.update(f.read(SAMPLE_BYTES))
+    if stat.st_size > SAMPLE_BYTES:
+      f.seek(max(SAMPLE_BYTES, stat.st_size - SAMPLE_BYTES))
+      digest.update(f.read())
+  return digest.hexdigest()[:16]
+
+
+def _to_number(value: str):
+  """The cell as a float, or None when it is not a (finite) number; "nan" and "inf" count as missing."""
+  try:
+    number = float(value)
+  except ValueError:
+    return None
+  return number if math.isfinite(number) else None
+
+
+def aggregate(file_path: str, sample_size: int = 5000) -> dict:
+  """Single streaming pass; returns JSON-serialisable aggregates for the charts and table."""
+  histograms = {"age": StreamingHistogram(), "score": StreamingHistogram()}
+  quantiles = {"age": KLL(), "score": KLL()}
+  stats = {column: {"count": 0, "total": 0.0, "min": None, "max": None} for column in histograms}
+  grid = StreamingGrid()
+  sample = Reservoir(sample_size)
+  rows = 0
+  with open(file_path, 'r', newline='') as f:
+    csv_reader = csv.reader(f)
+    header = next(csv_reader)
+    indexes = {column: header.index(column) for column in histograms}
+    for row in csv_reader:
+      if not any(row):
+        continue
+      rows += 1
+      values = {}
+      for column, index in indexes.items():
+        value = _to_number(row[index]) if index < len(row) and row[index] else None
+        if value is None:
+          continue
+        values[column] = value
+        histograms[column].add(value)
+        quantiles[column].update(value)
+        stat = stats[column]
+        stat["count"] += 1
+        stat["total"] += value
+        stat["min"] = value if stat["min"] is None else min(stat["min"], value)
+        stat["max"] = value if stat["max"] is None else max(stat["max"], value)
+      if len(values) == 2:
+        grid.add(values["age"], values["score"])
+        sample.update((values["age"], values["score"]))
+
+  summary = {}
+  for column, stat in stats.items():
+    summary[column] = {
+      "count": stat["count"],
+      "mean": stat["total"] / stat["count"] if stat["count"] else None,
+      "min": stat["min"],
+      "max": stat["max"],
+      "quantiles": dict(zip((str(q) for q in QUANTILES), quantiles[column].quantiles(QUANTILES))),
+      "rank_error": quantiles[column].rank_error(),
+    }
+  return {
+    "rows": rows,
+    "summary": summary,
+    "histograms": {column: {"width": h.width, "bins": h.bins()} for column, h in histograms.items()},
+    "grid": {"x_width": grid.x.width, "y_width": grid.y.width, "cells": grid.cells()},
+    "sample": sample.items,
+    "sample_of": sample.n,
+  }
+
+
+# --- rendering (runs in worker processes) -------------------------------------------------
+
+def _pyplot():
+  import matplotlib
+  matplotlib.use("Agg")
+  import matplotlib.pyplot as plt
+  return plt
+
+
+def render_histogram(column: str, histogram: dict, out_path: str) -> str:
+  plt = _pyplot()
+  fig, ax = plt.subplots(figsize=(7, 4))
+  edges = [edge for edge, _ in histogram["bins"]]
+  counts = [count for _, count in histogram["bins"]]
+  ax.bar(edges, counts, width=histogram["width"], align='edge', edgecolor='white')
+  ax.set_title(f"Distribution of {column}")
+  ax.set_xlabel(column)
+  ax.set_ylabel("participants")
+  fig.tight_layout()
+  fig.savefig(out_path, dpi=100)
+  plt.close(fig)
+  return out_path
+
+
+def render_scatter(grid: dict, sample: list, sample_of: int, out_path: str) -> str:
+  plt = _pyplot()
+  fig, ax = plt.subplots(figsize=(7, 5))
+  if grid["cells"]:
+    xs, ys, counts = zip(*grid["cells"])
+    shading = ax.scatter([x + grid["x_width"] / 2 for x in xs], [y + grid["y_width"] / 2 for y in ys],
+                         c=counts, s=30, marker='s', cmap='Blues', norm='log')
+    fig.colorbar(shading, ax=ax, label="participants per bin")
+  if sample:
+    ax.scatter([x for x, _ in sample], [y for _, y in sample], s=2, c='black', alpha=0.3,
+               label=f"random sample ({len(sample)} of {sample_of})")
+    ax.legend(loc='upper right')
+  ax.set_title("Score vs age")
+  ax.set_xlabel("age")
+  ax.set_ylabel("score")
+  fig.tight_layout()
+  fig.savefig(out_path, dpi=100)
+  plt.close(fig)
+  return out_path
+
+
+def write_html(file_path: str, data: dict, charts: list, out_path: Path):
+  def cell(value):
+    return "-" if value is None else html.escape(str(round(value, 3)))
+
+  rows = []
+  for column, stat in data["summary"].items():
+    quantile_cells = "".join(f"<td>{cell(stat['quantiles'][str(q)])}</td>" for q in QUANTILES)
+    rows.append(f"<tr><th>{column}</th><td>{stat['count']}</td><td>{cell(stat['mean'])}</td>"
+                f"<td>{cell(stat['min'])}</td><td>{cell(stat['max'])}</td>{quantile_cells}</tr>")
+  quantile_heads = "".join(f"<th>p{round(q * 100)}</th>" for q in QUANTILES)
+  images = "\n".join(f'<img src="{html.escape(Path(chart).name)}" alt="{html.escape(Path(chart).stem)}">'
+                     for chart in charts)
+  page = f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Report for {html.escape(Path(file_path).name)}</title>
+<style>
+  body {{ font-family: sans-serif; margin: 2em; }}
+  table {{ border-collapse: collapse; margin-bottom: 1em; }}
+  th, td {{ border: 1px solid #ccc; padding: 4px 10px; text-align: right; }}
+  img {{ display: block; margin: 1em 0; }}
+</style>
+</head>
+<body>
+<h1>{html.escape(Path(file_path).name)}</h1>
+<p>{data['rows']} rows. Quantiles are approximate (rank error within about
+{max(stat['rank_error'] for stat in data['summary'].values()):.2%}).</p>
+<table>
+<tr><th>column</th><th>count</th><th>mean</th><th>min</th><th>max</th>{quantile_heads}</tr>
+{''.join(rows)}
+</table>
+{images}
+</body>
+</html>
+"""
+  out_path.write_text(page, encoding='utf-8')
+
+
+def build_report(file_path: str, out_dir: str, workers: int | None = None) -> Path:
+  out = Path(out_dir)
+  out.mkdir(parents=True, exist_ok=True)
+  key = f"{Path(file_path).stem}_{fingerprint(file_path)}"
+  cache_path = out / f"{key}.json"
+  if cache_path.exists():
+    with open(cache_path, 'r', encoding='utf-8') as f:
+      data = json.load(f)
+    print(f"Using cached aggregates: {cache_path.name}")
+  else:
+    data = aggregate(file_path)
+    with open(cache_path, 'w', encoding='utf-8') as f:
+      json.dump(data, f)
+
+  jobs = [(render_histogram, column, data["histograms"][column], str(out / f"{key}_{column}_hist.png"))
+          for column in data["histograms"]]
+  jobs.append((render_scatter, data["grid"], data["sample"], data["sample_of"],
+               str(out / f"{key}_score_vs_age.png")))
+  charts = [job[-1] for job in jobs]
+  missing = [job for job in jobs if not Path(job[-1]).exists()]
+  if missing:
+    try:
+      with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(func, *args) for func, *args in missing]
+        for future in futures:
+          future.result()
+    except ImportError:
+      print("matplotlib is not installed, the report will only contain the summary table.")
+      charts = [chart for chart in charts if Path(chart).exists()]
+
+  report_path = out / "report.html"
+  write_html(file_path, data, charts, report_path)
+  return report_path
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Build histograms, a score-vs-age chart and a summary table.")
+  parser.add_argument('file', nargs='?', default='Book1.csv', help="CSV file with age and score columns")
+  parser.add_argument('--out', default='report', help="Output directory (default: report)")
+  parser.add_argument('--workers', type=int, help="Processes used to render charts (default: CPU count)")
+  args = parser.parse_args()
+  try:
+    report_path = build_report(args.file, args.out, args.workers)
+  except FileNotFoundError:
+    print(f"File not Found: {Path(args.file).name}")
+    sys.exit(1)
+  except Exception as err:
+    print(f"Error Found: {err}")
+    sys.exit(1)
+  print(f"Report written to {report_path}")
+
+
+if __name__ == "__main__":
+  main()
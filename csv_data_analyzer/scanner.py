@@ -0,0 +1,294 @@
+# Memory-mapped scanner that pulls only the requested columns out of a CSV file
+# csv.reader builds a list of str objects for every row, even for columns nobody asked for.
+# Here the file is memory-mapped and the wanted fields are located and parsed straight from the
+# byte buffer into preallocated float arrays (NaN for empty or non-numeric cells):
+#   - with numpy (already installed alongside pandas) newlines and commas are found with vector
+#     operations a chunk at a time and the digits are accumulated column-wise, so no per-row
+#     Python objects are created at all;
+#   - without numpy a slower pure-Python path uses mmap.find to hop from comma to comma and skips
+#     the rest of each line once the last wanted column has been read.
+# Lines containing a double quote fall back to csv parsing, so quoted fields still work as long
+# as they don't contain newlines. Blank lines are not rows, and with skip_short rows that have
+# fewer fields than the header are skipped too, as main_v6 does.
+import csv
+import math
+import mmap
+import os
+from array import array
+
+try:
+  import numpy as np
+except ImportError:
+  np = None
+
+NAN = math.nan
+CHUNK = 1 << 24   # bytes handed to numpy at a time, keeps the comma index small on wide files
+MAX_DIGITS = 24   # longer fields are parsed with float() instead of the vectorised digit loop
+
+
+class ColumnScan:
+  """Values of one column (NaN when empty or not a number) plus how many cells were filled.
+
+  Columns scanned with count_only=True only get the filled count; their values stay None.
+  """
+
+  def __init__(self, name: str, rows: int, use_numpy: bool = True, count_only: bool = False):
+    self.name = name
+    self.count_only = count_only
+    if count_only:
+      self.values = None
+    elif use_numpy:
+      self.values = np.full(rows, np.nan)
+    else:
+      self.values = array('d', [NAN]) * rows
+    self.filled = 0
+
+
+def _to_number(cell) -> float:
+  try:
+    return float(cell)
+  except ValueError:
+    return NAN
+
+
+def _read_header(mm: mmap.mmap) -> tuple:
+  header_end = mm.find(b'\n')
+  header_end = len(mm) if header_end == -1 else header_end
+  header = next(csv.reader([mm[:header_end].decode('utf-8-sig').rstrip('\r')]), [])
+  return header, header_end + 1
+
+
+def scan_columns(file_path: str, columns: list, count_only: tuple = (), use_numpy: bool = True,
+                 skip_short: bool = False) -> dict:
+  """Read only `columns` from the CSV at `file_path`; returns {name: ColumnScan}.
+
+  Columns also listed in `count_only` are not parsed, only their non-empty cells are counted.
+  With `skip_short`, rows with fewer fields than the header are skipped.
+  """
+  with open(file_path, 'rb') as f:
+    if os.fstat(f.fileno()).st_size == 0:
+      raise ValueError(f"Empty file: {file_path}")
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+      header, data_start = _read_header(mm)
+      missing = [name for name in columns if name not in header]
+      if missing:
+        raise ValueError(f"Column(s) not in header: {', '.join(missing)}")
+      slots = sorted((header.index(name), name) for name in columns)
+      min_fields = len(header) if skip_short else 0
+      if use_numpy and np is not None:
+        return _scan_numpy(mm, data_start, slots, count_only, min_fields)
+      return _scan_python(mm, data_start, slots, count_only, min_fields)
+
+
+# --- numpy path ---------------------------------------------------------------------------
+
+def _parse_fields(buf, starts, ends):
+  """Parse the numeric fields buf[starts[i]:ends[i]] without leaving numpy."""
+  lengths = ends - starts
+  values = np.zeros(len(starts))
+  decimals = np.zeros(len(starts), dtype=np.int64)
+  seen_point = np.zeros(len(starts), dtype=bool)
+  seen_digit = np.zeros(len(starts), dtype=bool)
+  negative = np.zeros(len(starts), dtype=bool)
+  valid = lengths > 0
+  last = len(buf) - 1
+  for d in range(int(lengths.max(initial=0))):
+    active = valid & (d < lengths)
+    if not active.any():
+      break
+    char = buf[np.minimum(starts + d, last)]
+    digit = (char >= 48) & (char <= 57) & active
+    values = np.where(digit, values * 10 + (char.astype(np.int64) - 48), values)
+    decimals += digit & seen_point
+    seen_digit |= digit
+    point = active & (char == 46)
+    sign = active & ((char == 45) | (char == 43)) & (d == 0)
+    negative |= sign & (char == 45)
+    valid &= ~(point & seen_point) & (digit | point | sign | ~active)
+    seen_point |= point
+  valid &= seen_digit
+  values = values / np.power(10.0, decimals)
+  values[negative] *= -1
+  values[~valid] = np.nan
+  return values, valid
+
+
+def _scan_numpy(mm: mmap.mmap, data_start: int, slots: list, count_only: tuple, min_fields: int) -> dict:
+  data = np.frombuffer(mm, dtype=np.uint8)
+  rows = 0
+  for start in range(data_start, len(data), CHUNK):
+    rows += int(np.count_nonzero(data[start:start + CHUNK] == 10))
+  scans = {name: ColumnScan(name, rows + 1, count_only=name in count_only) for _, name in slots}
+
+  row = 0
+  chunk_start = data_start
+  while chunk_start < len(data):
+    chunk_end = min(chunk_start + CHUNK, len(data))
+    if chunk_end < len(data):
+      newline = mm.find(b'\n', chunk_end)
+      chunk_end = len(data) if newline == -1 else newline + 1
+    buf = data[chunk_start:chunk_end]
+    row += _scan_chunk(buf, slots, scans, row, min_fields)
+    chunk_start = chunk_end
+
+  for scan in scans.values():
+    if not scan.count_only:
+      scan.values = scan.values[:row]
+  return scans
+
+
+def _scan_chunk(buf, slots: list, scans: dict, row: int, min_fields: int) -> int:
+  newlines = np.flatnonzero(buf == 10)
+  line_starts = np.concatenate(([0], newlines + 1))
+  line_ends = np.concatenate((newlines, [len(buf)]))
+  carriage = (line_ends > line_starts) & (buf[np.maximum(line_ends - 1, 0)] == 13)
+  line_ends = line_ends - carriage
+  keep = line_ends > line_starts   # blank lines are not rows
+  line_starts, line_ends = line_starts[keep], line_ends[keep]
+  count = len(line_starts)
+  if not count:
+    return 0
+
+  quotes = np.flatnonzero(buf == 34)
+  quoted = np.zeros(count, dtype=bool)
+  if len(quotes):
+    first_quote = np.searchsorted(quotes, line_starts)
+    has_quote = first_quote < len(quotes)
+    quoted[has_quote] = quotes[first_quote[has_quote]] < line_ends[has_quote]
+  quoted_rows = [next(csv.reader([buf[start:end].tobytes().decode('utf-8')]))
+                 for start, end in zip(line_starts[quoted], line_ends[quoted])]
+
+  commas = np.flatnonzero(buf == 44)
+  first_comma = np.searchsorted(commas, line_starts)
+  if min_fields > 1:
+    fields = np.searchsorted(commas, line_ends) - first_comma + 1
+    fields[quoted] = [len(cells) for cells in quoted_rows]
+    keep = fields >= min_fields
+    if not keep.all():   # drop the short rows before anything is parsed
+      quoted_rows = [cells for cells, kept in zip(quoted_rows, keep[quoted]) if kept]
+      line_starts, line_ends = line_starts[keep], line_ends[keep]
+      quoted, first_comma = quoted[keep], first_comma[keep]
+      count = len(line_starts)
+      if not count:
+        return 0
+  padded = np.concatenate((commas, [len(buf) + 1]))   # sentinel past every line end
+
+  def comma_after(n):
+    """Position of the n-th comma of each line, or the line end when the line is shorter."""
+    index = np.minimum(first_comma + n, len(commas))
+    position = padded[index]
+    return np.where(position < line_ends, position, -1)
+
+  for index, name in slots:
+    scan = scans[name]
+    if index == 0:
+      starts = line_starts.copy()
+    else:
+      before = comma_after(index - 1)
+      starts = np.where(before >= 0, before + 1, line_ends)   # missing field -> empty
+    after = comma_after(index)
+    ends = np.where(after >= 0, after, line_ends)
+    ends = np.maximum(ends, starts)
+
+    filled = (ends > starts) & ~quoted
+    scan.filled += int(np.count_nonzero(filled))
+    if scan.count_only:
+      continue
+    values, valid = _parse_fields(buf, starts, np.where(ends - starts > MAX_DIGITS, starts, ends))
+    slow = filled & ~valid   # exponents, very long numbers, text: let float() decide
+    for i in np.flatnonzero(slow):
+      values[i] = _to_number(buf[starts[i]:ends[i]].tobytes())
+    scan.values[row:row + count] = values
+
+  for i, cells in zip(np.flatnonzero(quoted), quoted_rows):
+    for index, name in slots:
+      cell = cells[index] if index < len(cells) else ''
+      scans[name].filled += bool(cell)
+      if not scans[name].count_only:
+        scans[name].values[row + i] = _to_number(cell) if cell else NAN
+  return count
+
+
+# --- pure Python path ---------------------------------------------------------------------
+
+def _scan_python(mm: mmap.mmap, data_start: int, slots: list, count_only: tuple, min_fields: int) -> dict:
+  end = len(mm)
+  capacity = 1
+  for start in range(data_start, end, CHUNK):
+    capacity += mm[start:start + CHUNK].count(b'\n')
+  scans = {name: ColumnScan(name, capacity, use_numpy=False, count_only=name in count_only)
+           for _, name in slots}
+  wanted = [(index, scans[name]) for index, name in slots]
+  last_index = slots[-1][0]
+
+  row = 0
+  pos = data_start
+  find = mm.find
+  while pos < end:
+    line_end = find(b'\n', pos)
+    if line_end == -1:
+      line_end = end
+    stop = line_end - 1 if line_end > pos and mm[line_end - 1] == 13 else line_end   # drop '\r'
+    if stop <= pos:
+      pass   # blank line
+    elif find(b'"', pos, stop) != -1:
+      cells = next(csv.reader([mm[pos:stop].decode('utf-8')]))
+      if len(cells) >= min_fields:
+        for index, scan in wanted:
+          cell = cells[index] if index < len(cells) else ''
+          if cell:
+            scan.filled += 1
+            if not scan.count_only:
+              scan.values[row] = _to_number(cell)
+        row += 1
+    elif min_fields <= 1 or mm[pos:stop].count(b',') + 1 >= min_fields:
+      field_start = pos
+      field = 0
+      for index, scan in wanted:
+        while field < index and field_start <= stop:   # skip the unused columns before this one
+          comma = find(b',', field_start, stop)
+          field_start = stop + 1 if comma == -1 else comma + 1
+          field += 1
+        if field_start > stop:
+          break   # short row, the remaining wanted columns are empty
+        comma = find(b',', field_start, stop)
+        field_end = stop if comma == -1 else comma
+        if field_end > field_start:
+          scan.filled += 1
+          if not scan.count_only:
+            scan.values[row] = _to_number(mm[field_start:field_end])
+        field_start = field_end + 1
+        field += 1
+        if field > last_index:
+          break
+      row += 1
+    pos = line_end + 1
+
+  for scan in scans.values():
+    if not scan.count_only:
+      del scan.values[row:]
+  return scans
+
+
+def analyze_csv(file_path: str, use_numpy: bool = True) -> tuple:
+  """Same answer as main_v6.analyze_csv, computed from a column scan."""
+  use_numpy = use_numpy and np is not None
+  scans = scan_columns(file_path, ["name", "age", "score"], count_only=("name",), use_numpy=use_numpy,
+                       skip_short=True)
+  participants = scans["name"].filled
+  ages, scores = scans["age"].values, scans["score"].values
+  if use_numpy:
+    total_age = float(np.nansum(ages))
+    scores = scores[~np.isnan(scores)]
+    total_score = float(scores.sum())
+  else:
+    total_age = sum(age for age in ages if age == age)   # NaN != NaN
+    scores = [score for score in scores if score == score]
+    total_score = sum(scores)
+  average_age = total_age / participants if participants > 0 else 0
+  average_score = total_score / participants if participants > 0 else 0
+  if use_numpy:
+    no_above_average_scores = int(np.count_nonzero(scores > average_score))
+  else:
+    no_above_average_scores = sum(1 for score in scores if score > average_score)
+  return participants, average_age, average_score, no_above_average_scores
@@ -0,0 +1,290 @@
+# Streaming sketches used by the --approx mode of main_v6.py
+# Every sketch reads each value once, keeps a fixed amount of memory and can be merged with
+# another sketch of the same shape, so chunks of a file can be sketched separately and combined.
+import hashlib
+import heapq
+import math
+import random
+
+
+def hash64(value: str) -> int:
+  digest = hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest()
+  return int.from_bytes(digest, "little")
+
+
+class KLL:
+  """Quantile sketch (Karnin, Lang & Liberty). Rank error is about `rank_error()` * n."""
+
+  def __init__(self, k: int = 200, c: float = 2 / 3):
+    self.k = k
+    self.c = c
+    self.compactors = []
+    self.n = 0
+    self.size = 0
+    self.max_size = 0
+    self._grow()
+
+  def _grow(self):
+    self.compactors.append([])
+    self.max_size = sum(self._capacity(h) for h in range(len(self.compactors)))
+
+  def _capacity(self, height: int) -> int:
+    depth = len(self.compactors) - height - 1
+    return int(math.ceil(self.k * self.c ** depth)) + 1
+
+  def update(self, value: float):
+    self.compactors[0].append(value)
+    self.n += 1
+    self.size += 1
+    if self.size >= self.max_size:
+      self._compress()
+
+  def _compress(self):
+    for h in range(len(self.compactors)):
+      if len(self.compactors[h]) >= self._capacity(h):
+        if h + 1 >= len(self.compactors):
+          self._grow()
+        level = self.compactors[h]
+        level.sort()
+        # keep every other item (random offset) and promote it with double the weight
+        leftover = [level.pop()] if len(level) % 2 else []
+        self.compactors[h + 1].extend(level[random.getrandbits(1)::2])
+        self.compactors[h] = leftover
+        self.size = sum(len(level) for level in self.compactors)
+        break
+
+  def merge(self, other: "KLL"):
+    while len(self.compactors) < len(other.compactors):
+      self._grow()
+    for h, level in enumerate(other.compactors):
+      self.compactors[h].extend(level)
+    self.n += other.n
+    self.size = sum(len(level) for level in self.compactors)
+    while self.size >= self.max_size:
+      self._compress()
+
+  def _weighted_items(self) -> list:
+    items = [(value, 2 ** h) for h, level in enumerate(self.compactors) for value in level]
+    items.sort()
+    return items
+
+  def rank(self, value: float) -> int:
+    """Approximate number of items <= value."""
+    return sum(2 ** h for h, level in enumerate(self.compactors) for item in level if item <= value)
+
+  def quantiles(self, fractions: list) -> list:
+    items = self._weighted_items()
+    if not items:
+      return [None for _ in fractions]
+    total = sum(weight for _, weight in items)
+    results = []
+    for q in fractions:
+      target = q * total
+      cumulative = 0
+      answer = items[-1][0]
+      for value, weight in items:
+        cumulative += weight
+        if cumulative >= target:
+          answer = value
+          break
+      results.append(answer)
+    return results
+
+  def quantile(self, q: float):
+    return self.quantiles([q])[0]
+
+  def rank_error(self) -> float:
+    """Normalised rank error at ~99% confidence (0 while the sketch is still exact)."""
+    if len(self.compactors) == 1:
+      return 0.0
+    return 2.296 / self.k ** 0.9723
+
+
+class HyperLogLog:
+  """Distinct-count sketch with 2**p registers; relative standard error is 1.04 / sqrt(2**p)."""
+
+  def __init__(self, p: int = 12):
+    self.p = p
+    self.m = 1 << p
+    self.registers = bytearray(self.m)
+
+  def update(self, value: str, x: int | None = None):
+    x = hash64(value) if x is None else x
+    index = x >> (64 - self.p)
+    rest = x & ((1 << (64 - self.p)) - 1)
+    rho = (64 - self.p) - rest.bit_length() + 1   # position of the first 1-bit after the index
+    if rho > self.registers[index]:
+      self.registers[index] = rho
+
+  def merge(self, other: "HyperLogLog"):
+    if other.p != self.p:
+      raise ValueError("Cannot merge HyperLogLog sketches with different precision")
+    self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+  def count(self) -> float:
+    alpha = 0.7213 / (1 + 1.079 / self.m)
+    estimate = alpha * self.m * self.m / sum(2.0 ** -r for r in self.registers)
+    zeros = self.registers.count(0)
+    if estimate <= 2.5 * self.m and zeros:
+      estimate = self.m * math.log(self.m / zeros)   # linear counting for small cardinalities
+    return estimate
+
+  def relative_error(self) -> float:
+    return 1.04 / math.sqrt(self.m)
+
+
+class CountMin:
+  """Frequency sketch plus a bounded list of heavy-hitter candidates.
+
+  Estimates never undercount and overcount by at most eps * n with probability 1 - delta.
+  """
+
+  def __init__(self, eps: float = 0.001, delta: float = 0.01, top_k: int = 10):
+    self.eps = eps
+    self.delta = delta
+    self.width = int(math.ceil(math.e / eps))
+    self.depth = int(math.ceil(math.log(1 / delta)))
+    self.table = [[0] * self.width for _ in range(self.depth)]
+    self.n = 0
+    self.top_k = top_k
+    self.candidates = {}
+    self.floor = 0   # smallest candidate estimate once the candidate list is full
+
+  def _columns(self, x: int) -> list:
+    h1, h2 = x & 0xFFFFFFFF, x >> 32
+    return [(h1 + row * h2) % self.width for row in range(self.depth)]
+
+  def estimate(self, value: str, x: int | None = None) -> int:
+    x = hash64(value) if x is None else x
+    return min(row[col] for row, col in zip(self.table, self._columns(x)))
+
+  def update(self, value: str, count: int = 1, x: int | None = None):
+    x = hash64(value) if x is None else x
+    self.n += count
+    estimate = None
+    for row, col in zip(self.table, self._columns(x)):
+      row[col] += count
+      if estimate is None or row[col] < estimate:
+        estimate = row[col]
+    if value in self.candidates or estimate > self.floor:
+      self._track(value, estimate)
+
+  def _track(self, value: str, estimate: int):
+    self.candidates[value] = estimate
+    if len(self.candidates) > 2 * self.top_k:
+      smallest = min(self.candidates, key=self.candidates.get)
+      del self.candidates[smallest]
+      self.floor = min(self.candidates.values())
+
+  def merge(self, other: "CountMin"):
+    if (other.width, other.depth) != (self.width, self.depth):
+      raise ValueError("Cannot merge Count-Min sketches with different shapes")
+    for row in range(self.depth):
+      mine, theirs = self.table[row], other.table[row]
+      for col in range(self.width):
+        mine[col] += theirs[col]
+    self.n += other.n
+    for value in set(self.candidates) | set(other.candidates):
+      self._track(value, self.estimate(value))
+
+  def top(self, k: int | None = None) -> list:
+    k = k or self.top_k
+    return heapq.nlargest(k, ((self.estimate(value), value) for value in self.candidates))
+
+  def error_bound(self) -> float:
+    return self.eps * self.n
+
+
+class Reservoir:
+  """Uniform random sample of up to `size` items (Algorithm R)."""
+
+  def __init__(self, size: int = 10):
+    self.size = size
+    self.items = []
+    self.n = 0
+
+  def update(self, item):
+    self.n += 1
+    if len(self.items) < self.size:
+      self.items.append(item)
+    else:
+      j = random.randrange(self.n)
+      if j < self.size:
+        self.items[j] = item
+
+  def merge(self, other: "Reservoir"):
+    # draw from each side in proportion to how many items it has seen
+    mine, theirs = self.items[:], other.items[:]
+    random.shuffle(mine)
+    random.shuffle(theirs)
+    seen_mine, seen_theirs = self.n, other.n
+    merged = []
+    while len(merged) < self.size and (mine or theirs):
+      if theirs and (not mine or random.random() < seen_theirs / (seen_mine + seen_theirs)):
+        merged.append(theirs.pop())
+        seen_theirs -= 1
+      else:
+        merged.append(mine.pop())
+        seen_mine -= 1
+    self.items = merged
+    self.n += other.n
+
+
+class ColumnSketch:
+  """All sketches kept for one CSV column."""
+
+  def __init__(self, name: str):
+    self.name = name
+    self.count = 0
+    self.missing = 0
+    self.numeric = 0
+    self.total = 0.0
+    self.minimum = None
+    self.maximum = None
+    self.quantiles = KLL()
+    self.distinct = HyperLogLog()
+    self.frequent = CountMin()
+
+  def update(self, value: str):
+    self.count += 1
+    value = value.strip()
+    if not value:
+      self.missing += 1
+      return
+    try:
+      number = float(value)
+    except ValueError:
+      number = None
+    if number is not None and not math.isfinite(number):
+      self.missing += 1   # float() takes "nan" and "inf", but they would poison the totals and quantiles
+      return
+    x = hash64(value)
+    self.distinct.update(value, x)
+    self.frequent.update(value, x=x)
+    if number is None:
+      return
+    self.numeric += 1
+    self.total += number
+    self.minimum = number if self.minimum is None else min(self.minimum, number)
+    self.maximum = number if self.maximum is None else max(self.maximum, number)
+    self.quantiles.update(number)
+
+  def merge(self, other: "ColumnSketch"):
+    self.count += other.count
+    self.missing += other.missing
+    self.numeric += other.numeric
+    self.total += other.total
+    for attr, pick in (("minimum", min), ("maximum", max)):
+      values = [v for v in (getattr(self, attr), getattr(other, attr)) if v is not None]
+      setattr(self, attr, pick(values) if values else None)
+    self.quantiles.merge(other.quantiles)
+    self.distinct.merge(other.distinct)
+    self.frequent.merge(other.frequent)
+
+  def is_numeric(self) -> bool:
+    # treat the column as numeric when most filled cells parse as numbers
+    filled = self.count - self.missing
+    return filled > 0 and self.numeric >= 0.9 * filled
+
+  def mean(self) -> float:
+    return self.total / self.numeric if self.numeric else 0
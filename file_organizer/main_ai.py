@@ -1,12 +1,24 @@
 #!/usr/bin/env python3
 """
 File Organizer - A robust tool to organize files by type, date, or custom rules.
+
+The log file (file_organizer.jsonl, one JSON object per line) is written through a queue:
+the organizer only hands over log records and a background thread formats them (%-style
+arguments, so nothing is formatted up front) and writes them. Per-file lines are sampled
+where they are made: the first few of each kind (moved, skipped, ...) and then one in every
+so many are logged, and a count of each kind at the end. That leaves few enough lines for
+the console to be written straight away, in order with the summary.
+The full record of every file moved, skipped or failed goes to a JSON-lines results file
+(file_organizer_results.jsonl) instead. Neither file is moved when it sits in the folder
+being organized (the default is the current directory).
 """
 
 import os
 import shutil
 import argparse
 import logging
+import logging.handlers
+import queue
 from datetime import datetime
 from pathlib import Path
 from collections import defaultdict
@@ -17,17 +29,182 @@ from typing import Dict, List, Set, Optional, Tuple
 import mimetypes
 import time
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('file_organizer.log'),
-        logging.StreamHandler()
-    ]
-)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # instrument.py is shared by the tools
+from instrument import Metrics, add_arguments, instrumented
+
 logger = logging.getLogger(__name__)
 
+LOG_FILE = 'file_organizer.jsonl'
+RESULTS_FILE = 'file_organizer_results.jsonl'
+# Per-file log lines, per level: the first `first` of each kind, then one in every `every`
+# (0: none after the first ones). Warnings and errors are always logged.
+SAMPLING = {
+    logging.DEBUG: {'first': 0, 'every': 0},
+    logging.INFO: {'first': 20, 'every': 1000},
+}
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread.
+
+    The stock prepare() formats every record before queueing it; the arguments here are
+    strings, numbers and paths, which are safe to format later on another thread.
+    """
+
+    def prepare(self, record):
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None   # tracebacks hold frames, don't keep them alive in the queue
+        return record
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record: time, level, message and any extra fields."""
+
+    def format(self, record):
+        entry = {
+            'time': round(record.created, 3),
+            'level': record.levelname,
+            'message': record.getMessage(),
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class BufferedFileHandler(logging.FileHandler):
+    """FileHandler that doesn't flush after every line; it flushes on warnings and errors,
+    when the queue runs dry (see QueueListener) and when it is closed."""
+
+    def emit(self, record):
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(self.format(record) + self.terminator)
+            if record.levelno >= logging.WARNING:
+                self.stream.flush()
+        except Exception:
+            self.handleError(record)
+
+
+class FlushingQueueListener(logging.handlers.QueueListener):
+    """QueueListener that flushes its handlers whenever it has caught up with the queue, so
+    the log file is written in chunks but never lags behind while the organizer is idle."""
+
+    def handle(self, record):
+        super().handle(record)
+        if self.queue.empty():
+            for handler in self.handlers:
+                handler.flush()
+
+
+class EventSampler:
+    """Decides which per-file events are logged (see SAMPLING) and counts all of them."""
+
+    def __init__(self, sampling=SAMPLING):
+        self.sampling = sampling
+        self.counts = defaultdict(int)
+
+    def keep(self, level: int, event: str) -> bool:
+        self.counts[event] += 1
+        rule = self.sampling.get(level)
+        if rule is None:
+            return True
+        seen = self.counts[event]
+        return seen <= rule['first'] or bool(rule['every'] and seen % rule['every'] == 0)
+
+    def log_totals(self):
+        for event, count in sorted(self.counts.items()):
+            logger.info("%s: %s files in total", event, count, extra={'fields': {'event': event, 'count': count}})
+
+
+class FileResult:
+    """What happened to one file: status ('moved', 'would_move', 'skipped' or 'error'), its
+    path and the destination or the reason. Paths are kept as plain strings."""
+
+    __slots__ = ('status', 'path', 'detail')
+
+    def __init__(self, status: str, path: str, detail: Optional[str] = None):
+        self.status = status
+        self.path = path
+        self.detail = detail
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.path)
+
+    def to_json(self) -> str:
+        entry = {'status': self.status, 'path': self.path}
+        if self.detail is not None:
+            entry['dest' if self.status in ('moved', 'would_move') else 'reason'] = self.detail
+        return json.dumps(entry)
+
+
+class ResultRecorder:
+    """Keeps a count per status and the first `sample_size` results of each, so memory stays
+    the same however many files there are; with `spill_path` every result is also written to
+    that file as a JSON line as it comes in."""
+
+    def __init__(self, spill_path: Optional[str] = None, sample_size: int = 10):
+        self.sample_size = sample_size
+        self.counts = defaultdict(int)
+        self.samples = defaultdict(list)
+        self.spill = open(spill_path, 'w', encoding='utf-8', buffering=1 << 16) if spill_path else None
+
+    def add(self, status: str, path: Path, detail=None) -> None:
+        self.counts[status] += 1
+        if self.spill is None and self.counts[status] > self.sample_size:
+            return
+        result = FileResult(status, str(path), None if detail is None else str(detail))
+        if self.counts[status] <= self.sample_size:
+            self.samples[status].append(result)
+        if self.spill is not None:
+            self.spill.write(result.to_json() + '\n')
+
+    def count(self, *statuses: str) -> int:
+        return sum(self.counts[status] for status in statuses)
+
+    def sample(self, status: str) -> List[FileResult]:
+        """The first results with `status` (at most `sample_size`)."""
+        return self.samples[status]
+
+    def close(self) -> None:
+        if self.spill is not None:
+            self.spill.close()
+            self.spill = None
+
+
+class LogPipeline:
+    """Root logger -> console, and -> queue -> background thread -> JSON-lines file."""
+
+    def __init__(self, log_file=LOG_FILE, verbose=False):
+        # Neither output shows the caller, thread or process, so don't collect them for every
+        # record (see "Optimization" in the logging HOWTO).
+        logging._srcfile = None
+        logging.logThreads = False
+        logging.logProcesses = False
+        logging.logMultiprocessing = False
+        self.queue = queue.SimpleQueue()
+        self.file_handler = BufferedFileHandler(log_file, encoding='utf-8')
+        self.file_handler.setFormatter(JsonLinesFormatter())
+        self.console = logging.StreamHandler()
+        self.console.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        self.listener = FlushingQueueListener(self.queue, self.file_handler)
+        root = logging.getLogger()
+        root.handlers[:] = [self.console, DeferredQueueHandler(self.queue)]   # console first: prepare() drops exc_info
+        root.setLevel(logging.DEBUG if verbose else logging.INFO)
+        self.listener.start()
+
+    def stop(self):
+        """Write out whatever is still queued."""
+        self.listener.stop()
+        self.file_handler.close()
+        logging.getLogger().handlers[:] = []
+
+
 class FileOrganizer:
     """Main file organizer class with multiple organization strategies."""
     
@@ -47,8 +224,11 @@ class FileOrganizer:
         'torrents': {'.torrent'},
     }
     
+    SUMMARY_SAMPLE = 10  # skipped files and errors listed by name in the summary
+    
     def __init__(self, source_dir: str, dest_dir: Optional[str] = None, 
-                 dry_run: bool = False, strategy: str = 'type'):
+                 dry_run: bool = False, strategy: str = 'type', metrics: Optional[Metrics] = None,
+                 results_path: Optional[str] = None, exclude: Optional[List[str]] = None):
         """
         Initialize the organizer.
         
@@ -57,28 +237,36 @@ class FileOrganizer:
             dest_dir: Destination directory (optional, defaults to source_dir)
             dry_run: If True, only show what would be done
             strategy: Organization strategy ('type', 'date', 'extension', 'custom')
+            metrics: Where timings (scan, classify, hash, move) and counters are recorded
+            results_path: JSON-lines file to write every moved, skipped or failed file to
+                (otherwise only counts and the first few of each are kept)
+            exclude: Other files never to move, e.g. the log file when it is in source_dir
         """
         self.source_dir = Path(source_dir).expanduser().resolve()
         self.dest_dir = Path(dest_dir).expanduser().resolve() if dest_dir else self.source_dir
         self.dry_run = dry_run
         self.strategy = strategy
+        self.metrics = metrics or Metrics('file_organizer', strategy=strategy)
         
         # Ensure directories exist
         self.source_dir.mkdir(parents=True, exist_ok=True)
         self.dest_dir.mkdir(parents=True, exist_ok=True)
         
+        # The organizer's own output files are written while it runs, leave them where they are
+        self.exclude = {Path(path).expanduser().resolve() for path in (results_path, *(exclude or [])) if path}
+        
         # Load custom rules if they exist
         self.custom_rules = self._load_custom_rules()
         
-        # Track moved files for summary
-        self.moved_files = []
-        self.skipped_files = []
-        self.error_files = []
+        # Track moved files for summary: counts and the first few of each kind
+        # (create_summary shows SUMMARY_SAMPLE), the full list goes to results_path
+        self.results = ResultRecorder(results_path, sample_size=self.SUMMARY_SAMPLE)
+        self.sampler = EventSampler()
         
-        logger.info(f"Initialized organizer with strategy: {strategy}")
-        logger.info(f"Source: {self.source_dir}")
-        logger.info(f"Destination: {self.dest_dir}")
-        logger.info(f"Dry run: {dry_run}")
+        logger.info("Initialized organizer with strategy: %s", strategy)
+        logger.info("Source: %s", self.source_dir)
+        logger.info("Destination: %s", self.dest_dir)
+        logger.info("Dry run: %s", dry_run)
     
     def _load_custom_rules(self) -> Dict[str, str]:
         """Load custom organization rules from JSON file."""
@@ -88,32 +276,33 @@ class FileOrganizer:
                 with open(rules_file, 'r') as f:
                     return json.load(f)
             except json.JSONDecodeError as e:
-                logger.error(f"Error loading custom rules: {e}")
+                logger.error("Error loading custom rules: %s", e)
         return {}
     
     def _get_file_category(self, file_path: Path) -> str:
         """Determine the category of a file based on its extension."""
-        suffix = file_path.suffix.lower()
+        with self.metrics.span('classify'):
+            suffix = file_path.suffix.lower()
         
-        # Check custom rules first
-        for category, extensions in self.custom_rules.items():
-            if suffix in extensions:
-                return category
+            # Check custom rules first
+            for category, extensions in self.custom_rules.items():
+                if suffix in extensions:
+                    return category
         
-        # Check predefined categories
-        for category, extensions in self.FILE_CATEGORIES.items():
-            if suffix in extensions:
-                return category
+            # Check predefined categories
+            for category, extensions in self.FILE_CATEGORIES.items():
+                if suffix in extensions:
+                    return category
         
-        # Try to determine from MIME type
-        mime_type, _ = mimetypes.guess_type(str(file_path))
-        if mime_type:
-            main_type = mime_type.split('/')[0]
-            if main_type in ['image', 'audio', 'video']:
-                return main_type + 's'
+            # Try to determine from MIME type
+            mime_type, _ = mimetypes.guess_type(str(file_path))
+            if mime_type:
+                main_type = mime_type.split('/')[0]
+                if main_type in ['image', 'audio', 'video']:
+                    return main_type + 's'
         
-        # Default category
-        return 'other'
+            # Default category
+            return 'other'
     
     def _get_date_folder(self, file_path: Path) -> str:
         """Get folder name based on file modification date."""
@@ -122,7 +311,7 @@ class FileOrganizer:
             date_obj = datetime.fromtimestamp(mod_time)
             return date_obj.strftime('%Y-%m')
         except (OSError, AttributeError) as e:
-            logger.warning(f"Could not get date for {file_path}: {e}")
+            logger.warning("Could not get date for %s: %s", file_path, e)
             return 'unknown_date'
     
     def _create_safe_filename(self, original_path: Path, target_dir: Path) -> Path:
@@ -143,12 +332,13 @@ class FileOrganizer:
         """Calculate MD5 hash of a file."""
         hash_md5 = hashlib.md5()
         try:
-            with open(file_path, "rb") as f:
+            with self.metrics.span('hash'), open(file_path, "rb") as f:
                 for chunk in iter(lambda: f.read(4096), b""):
                     hash_md5.update(chunk)
+                self.metrics.count('bytes_hashed', f.tell())
             return hash_md5.hexdigest()
         except (IOError, OSError) as e:
-            logger.error(f"Error calculating hash for {file_path}: {e}")
+            logger.error("Error calculating hash for %s: %s", file_path, e)
             return ""
     
     def _is_duplicate(self, source_file: Path, target_file: Path) -> bool:
@@ -161,6 +351,28 @@ class FileOrganizer:
         
         return source_hash == target_hash
     
+    def _log_file(self, level: int, event: str, message: str, *args, **fields) -> None:
+        """Log a per-file line, if the sampler keeps this one (see SAMPLING)."""
+        if self.sampler.keep(level, event) and logger.isEnabledFor(level):
+            logger.log(level, message, *args, extra={'fields': {'event': event, **fields}})
+    
+    def _record_moved(self, file_path: Path, dest_path: Path) -> None:
+        self.results.add('would_move' if self.dry_run else 'moved', file_path, dest_path)
+    
+    def _record_skipped(self, file_path: Path, reason: str) -> None:
+        self.results.add('skipped', file_path, reason)
+    
+    def _record_error(self, file_path: Path, error: str) -> None:
+        self.results.add('error', file_path, error)
+    
+    def _move(self, file_path: Path, dest_path: Path) -> None:
+        """Move one file, timing it and counting the bytes moved."""
+        size = file_path.stat().st_size
+        with self.metrics.span('move'):
+            shutil.move(str(file_path), str(dest_path))
+        self.metrics.count('files_moved')
+        self.metrics.count('bytes_moved', size)
+    
     def organize_by_type(self) -> None:
         """Organize files by their type/category."""
         logger.info("Starting organization by type...")
@@ -175,21 +387,25 @@ class FileOrganizer:
                 
                 # Check for duplicates
                 if dest_path.exists() and self._is_duplicate(file_path, dest_path):
-                    logger.info(f"Skipping duplicate file: {file_path.name}")
-                    self.skipped_files.append((file_path, "Duplicate file"))
+                    self._log_file(logging.INFO, 'skipped', "Skipping duplicate file: %s", file_path.name,
+                                   path=file_path, reason="Duplicate file")
+                    self._record_skipped(file_path, "Duplicate file")
                     continue
                 
                 if not self.dry_run:
-                    shutil.move(str(file_path), str(dest_path))
-                    logger.info(f"Moved {file_path.name} -> {dest_folder.name}/")
+                    self._move(file_path, dest_path)
+                    self._log_file(logging.INFO, 'moved', "Moved %s -> %s/", file_path.name, dest_folder.name,
+                                   path=file_path, dest=dest_path)
                 else:
-                    logger.info(f"[DRY RUN] Would move {file_path.name} -> {dest_folder.name}/")
+                    self._log_file(logging.INFO, 'would_move', "[DRY RUN] Would move %s -> %s/", file_path.name, dest_folder.name,
+                                   path=file_path, dest=dest_path)
                 
-                self.moved_files.append((file_path, dest_path))
+                self._record_moved(file_path, dest_path)
                 
             except (OSError, shutil.Error, PermissionError) as e:
-                logger.error(f"Error moving {file_path}: {e}")
-                self.error_files.append((file_path, str(e)))
+                self._log_file(logging.ERROR, 'error', "Error moving %s: %s", file_path, e,
+                               path=file_path, error=str(e))
+                self._record_error(file_path, str(e))
     
     def organize_by_date(self) -> None:
         """Organize files by modification date."""
@@ -204,16 +420,19 @@ class FileOrganizer:
                 dest_path = self._create_safe_filename(file_path, dest_folder)
                 
                 if not self.dry_run:
-                    shutil.move(str(file_path), str(dest_path))
-                    logger.info(f"Moved {file_path.name} -> {date_folder}/")
+                    self._move(file_path, dest_path)
+                    self._log_file(logging.INFO, 'moved', "Moved %s -> %s/", file_path.name, date_folder,
+                                   path=file_path, dest=dest_path)
                 else:
-                    logger.info(f"[DRY RUN] Would move {file_path.name} -> {date_folder}/")
+                    self._log_file(logging.INFO, 'would_move', "[DRY RUN] Would move %s -> %s/", file_path.name, date_folder,
+                                   path=file_path, dest=dest_path)
                 
-                self.moved_files.append((file_path, dest_path))
+                self._record_moved(file_path, dest_path)
                 
             except (OSError, shutil.Error, PermissionError) as e:
-                logger.error(f"Error moving {file_path}: {e}")
-                self.error_files.append((file_path, str(e)))
+                self._log_file(logging.ERROR, 'error', "Error moving %s: %s", file_path, e,
+                               path=file_path, error=str(e))
+                self._record_error(file_path, str(e))
     
     def organize_by_extension(self) -> None:
         """Organize files by their extension."""
@@ -223,7 +442,9 @@ class FileOrganizer:
             try:
                 # Skip files without extensions
                 if not file_path.suffix:
-                    self.skipped_files.append((file_path, "No extension"))
+                    self._log_file(logging.INFO, 'skipped', "Skipping %s: no extension", file_path.name,
+                                   path=file_path, reason="No extension")
+                    self._record_skipped(file_path, "No extension")
                     continue
                 
                 ext_folder = file_path.suffix.lower().lstrip('.')
@@ -236,16 +457,19 @@ class FileOrganizer:
                 dest_path = self._create_safe_filename(file_path, dest_folder)
                 
                 if not self.dry_run:
-                    shutil.move(str(file_path), str(dest_path))
-                    logger.info(f"Moved {file_path.name} -> {ext_folder}/")
+                    self._move(file_path, dest_path)
+                    self._log_file(logging.INFO, 'moved', "Moved %s -> %s/", file_path.name, ext_folder,
+                                   path=file_path, dest=dest_path)
                 else:
-                    logger.info(f"[DRY RUN] Would move {file_path.name} -> {ext_folder}/")
+                    self._log_file(logging.INFO, 'would_move', "[DRY RUN] Would move %s -> %s/", file_path.name, ext_folder,
+                                   path=file_path, dest=dest_path)
                 
-                self.moved_files.append((file_path, dest_path))
+                self._record_moved(file_path, dest_path)
                 
             except (OSError, shutil.Error, PermissionError) as e:
-                logger.error(f"Error moving {file_path}: {e}")
-                self.error_files.append((file_path, str(e)))
+                self._log_file(logging.ERROR, 'error', "Error moving %s: %s", file_path, e,
+                               path=file_path, error=str(e))
+                self._record_error(file_path, str(e))
     
     def organize_custom(self) -> None:
         """Organize files using custom rules."""
@@ -265,29 +489,34 @@ class FileOrganizer:
                 dest_path = self._create_safe_filename(file_path, dest_folder)
                 
                 if not self.dry_run:
-                    shutil.move(str(file_path), str(dest_path))
-                    logger.info(f"Moved {file_path.name} -> {category}/")
+                    self._move(file_path, dest_path)
+                    self._log_file(logging.INFO, 'moved', "Moved %s -> %s/", file_path.name, category,
+                                   path=file_path, dest=dest_path)
                 else:
-                    logger.info(f"[DRY RUN] Would move {file_path.name} -> {category}/")
+                    self._log_file(logging.INFO, 'would_move', "[DRY RUN] Would move %s -> %s/", file_path.name, category,
+                                   path=file_path, dest=dest_path)
                 
-                self.moved_files.append((file_path, dest_path))
+                self._record_moved(file_path, dest_path)
                 
             except (OSError, shutil.Error, PermissionError) as e:
-                logger.error(f"Error moving {file_path}: {e}")
-                self.error_files.append((file_path, str(e)))
+                self._log_file(logging.ERROR, 'error', "Error moving %s: %s", file_path, e,
+                               path=file_path, error=str(e))
+                self._record_error(file_path, str(e))
     
     def _get_files_to_organize(self) -> List[Path]:
         """Get list of files to organize, excluding hidden files and directories."""
         files = []
         
         try:
-            for item in self.source_dir.iterdir():
-                if item.is_file() and not item.name.startswith('.'):
-                    files.append(item)
+            with self.metrics.span('scan'):
+                for item in self.source_dir.iterdir():
+                    if item.is_file() and not item.name.startswith('.') and item.resolve() not in self.exclude:
+                        files.append(item)
         except (OSError, PermissionError) as e:
-            logger.error(f"Error reading directory {self.source_dir}: {e}")
+            logger.error("Error reading directory %s: %s", self.source_dir, e)
+        self.metrics.count('files_scanned', len(files))
         
-        logger.info(f"Found {len(files)} files to organize")
+        logger.info("Found %s files to organize", len(files))
         return files
     
     def create_summary(self) -> str:
@@ -301,24 +530,19 @@ class FileOrganizer:
             f"Strategy: {self.strategy}",
             f"Dry Run: {self.dry_run}",
             "-"*60,
-            f"Files Moved: {len(self.moved_files)}",
-            f"Files Skipped: {len(self.skipped_files)}",
-            f"Files with Errors: {len(self.error_files)}",
+            f"Files Moved: {self.results.count('moved', 'would_move')}",
+            f"Files Skipped: {self.results.count('skipped')}",
+            f"Files with Errors: {self.results.count('error')}",
         ]
         
-        if self.skipped_files:
-            summary.append("\nSkipped Files:")
-            for file, reason in self.skipped_files[:10]:  # Show first 10
-                summary.append(f"  - {file.name}: {reason}")
-            if len(self.skipped_files) > 10:
-                summary.append(f"  ... and {len(self.skipped_files) - 10} more")
-        
-        if self.error_files:
-            summary.append("\nFiles with Errors:")
-            for file, error in self.error_files[:10]:  # Show first 10
-                summary.append(f"  - {file.name}: {error}")
-            if len(self.error_files) > 10:
-                summary.append(f"  ... and {len(self.error_files) - 10} more")
+        for status, title in (('skipped', "Skipped Files"), ('error', "Files with Errors")):
+            total = self.results.count(status)
+            if total:
+                summary.append(f"\n{title}:")
+                for result in self.results.sample(status)[:self.SUMMARY_SAMPLE]:
+                    summary.append(f"  - {result.name}: {result.detail}")
+                if total > self.SUMMARY_SAMPLE:
+                    summary.append(f"  ... and {total - self.SUMMARY_SAMPLE} more")
         
         summary.append("="*60)
         
@@ -326,31 +550,37 @@ class FileOrganizer:
     
     def organize(self) -> bool:
         """Main organization method."""
-        logger.info(f"Starting organization process...")
+        logger.info("Starting organization process...")
         
         try:
-            if self.strategy == 'type':
-                self.organize_by_type()
-            elif self.strategy == 'date':
-                self.organize_by_date()
-            elif self.strategy == 'extension':
-                self.organize_by_extension()
-            elif self.strategy == 'custom':
-                self.organize_custom()
-            else:
-                logger.error(f"Unknown strategy: {self.strategy}")
-                return False
+            with self.metrics.span('organize'):
+                if self.strategy == 'type':
+                    self.organize_by_type()
+                elif self.strategy == 'date':
+                    self.organize_by_date()
+                elif self.strategy == 'extension':
+                    self.organize_by_extension()
+                elif self.strategy == 'custom':
+                    self.organize_custom()
+                else:
+                    logger.error("Unknown strategy: %s", self.strategy)
+                    return False
+            self.metrics.count('files_skipped', self.results.count('skipped'))
+            self.metrics.count('files_failed', self.results.count('error'))
+            self.sampler.log_totals()
             
             # Print summary
             summary = self.create_summary()
             print(summary)
             logger.info("Organization process completed")
             
-            return len(self.error_files) == 0
+            return self.results.count('error') == 0
             
         except Exception as e:
-            logger.critical(f"Critical error during organization: {e}", exc_info=True)
+            logger.critical("Critical error during organization: %s", e, exc_info=True)
             return False
+        finally:
+            self.results.close()
 
 def create_custom_rules_template(directory: str) -> None:
     """Create a template for custom organization rules."""
@@ -375,7 +605,7 @@ def create_custom_rules_template(directory: str) -> None:
         print(f"Custom rules template created at: {rules_file}")
         print("Edit this file to add your own categories and extensions.")
     except IOError as e:
-        logger.error(f"Error creating rules template: {e}")
+        logger.error("Error creating rules template: %s", e)
 
 def get_directory_size(path: Path) -> int:
     """Calculate total size of directory in bytes."""
@@ -473,9 +703,21 @@ Examples:
     parser.add_argument('--analyze',
                        metavar='DIRECTORY',
                        help='Analyze directory structure and suggest organization strategy')
+    parser.add_argument('--log-file', default=LOG_FILE,
+                       help=f'JSON-lines log file (default: {LOG_FILE})')
+    parser.add_argument('--results', default=RESULTS_FILE,
+                       help=f'JSON-lines file listing every file moved, skipped or failed (default: {RESULTS_FILE})')
+    add_arguments(parser)
     
     args = parser.parse_args()
-    
+    pipeline = LogPipeline(args.log_file, verbose=args.verbose)
+    try:
+        run(args)
+    finally:
+        pipeline.stop()
+
+def run(args):
+    """Carry out the command line (logging is set up by main)."""
     # Handle create-rules command
     if args.create_rules:
         create_custom_rules_template(args.create_rules)
@@ -486,10 +728,6 @@ Examples:
         analyze_directory(args.analyze)
         return
     
-    # Set logging level
-    if args.verbose:
-        logging.getLogger().setLevel(logging.DEBUG)
-    
     # Validate source directory
     source_path = Path(args.directory).expanduser().resolve()
     if not source_path.exists():
@@ -501,14 +739,19 @@ Examples:
         sys.exit(1)
     
     # Create and run organizer
+    metrics = Metrics('file_organizer', strategy=args.strategy, dry_run=args.dry_run)
     organizer = FileOrganizer(
         source_dir=args.directory,
         dest_dir=args.dest,
         dry_run=args.dry_run,
-        strategy=args.strategy
+        strategy=args.strategy,
+        metrics=metrics,
+        results_path=args.results,
+        exclude=[args.log_file, args.metrics, 'file_organizer.prof']
     )
     
-    success = organizer.organize()
+    with instrumented(args, metrics, 'file_organizer.prof'):
+        success = organizer.organize()
     
     if not success:
         sys.exit(1)
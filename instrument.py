@@ -0,0 +1,152 @@
+# instrument.py
+# Where the time goes in the tools, in a file that can be collected and trended.
+# A Metrics object keeps, per named span (scan, classify, hash, move, copy, compress, parse, ...),
+# how often it ran, the total and the longest time, plus counters (files, bytes, ...) and gauges:
+#
+#   metrics = Metrics("backup_script")
+#   with metrics.span("copy"):
+#       ...
+#   metrics.count("bytes_copied", size)
+#   metrics.write("backup.prom")     # Prometheus text format; any other name is written as JSON
+#
+# A span costs about a microsecond, so they go around whole steps (a file, a phase), not
+# around inner loops. profiled() runs a block under cProfile and tracemalloc for --profile:
+# the stats are saved next to the metrics file and the top entries printed to stderr.
+# The tools are plain script folders; the ones using this module add the repository folder
+# to sys.path before importing it.
+import json
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+
+PROFILE_TOP = 15   # functions and allocation sites printed by profiled()
+
+
+def metric_name(text: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", text)
+
+
+class Metrics:
+    def __init__(self, tool: str, **labels):
+        self.tool = metric_name(tool)
+        self.labels = {"tool": tool, **{key: str(value) for key, value in labels.items()}}
+        self.started = time.time()
+        self.spans = {}      # name -> [calls, total seconds, longest]
+        self.counters = {}
+        self.gauges = {}
+
+    @contextmanager
+    def span(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stats = self.spans.get(name)
+            if stats is None:
+                self.spans[name] = [1, elapsed, elapsed]
+            else:
+                stats[0] += 1
+                stats[1] += elapsed
+                if elapsed > stats[2]:
+                    stats[2] = elapsed
+
+    def count(self, name: str, amount: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def gauge(self, name: str, value: float):
+        self.gauges[name] = value
+
+    # --- output ----------------------------------------------------------------------------
+
+    def snapshot(self) -> dict:
+        return {
+            "labels": self.labels,
+            "started": round(self.started, 3),
+            "wall_seconds": round(time.time() - self.started, 6),
+            "spans": {name: {"calls": calls, "seconds": round(total, 6), "max_seconds": round(longest, 6)}
+                      for name, (calls, total, longest) in self.spans.items()},
+            "counters": dict(self.counters),
+            "gauges": dict(self.gauges),
+        }
+
+    def prometheus(self) -> str:
+        """The metrics in the Prometheus text exposition format."""
+        labels = ",".join(f'{key}="{value}"' for key, value in self.labels.items())
+        prefix = self.tool
+        lines = [f"# TYPE {prefix}_wall_seconds gauge",
+                 f"{prefix}_wall_seconds{{{labels}}} {time.time() - self.started:.6f}"]
+        for metric, kind, column in (("span_calls_total", "counter", 0), ("span_seconds_total", "counter", 1),
+                                     ("span_max_seconds", "gauge", 2)):
+            if self.spans:
+                lines.append(f"# TYPE {prefix}_{metric} {kind}")
+            for name, stats in self.spans.items():
+                lines.append(f'{prefix}_{metric}{{{labels},span="{name}"}} {stats[column]:.6g}')
+        for name, value in self.counters.items():
+            lines.append(f"# TYPE {prefix}_{metric_name(name)}_total counter")
+            lines.append(f"{prefix}_{metric_name(name)}_total{{{labels}}} {value}")
+        for name, value in self.gauges.items():
+            lines.append(f"# TYPE {prefix}_{metric_name(name)} gauge")
+            lines.append(f"{prefix}_{metric_name(name)}{{{labels}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """Write the metrics to `path`: Prometheus text for .prom files, JSON otherwise."""
+        data = self.prometheus() if path.endswith(".prom") else json.dumps(self.snapshot(), indent=2) + "\n"
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, path)   # a collector never sees half a file
+
+
+@contextmanager
+def profiled(enabled: bool, stats_path: str, metrics: Metrics | None = None):
+    """Run the block under cProfile and tracemalloc when `enabled`; the profile is saved to
+    `stats_path` (open it with pstats or snakeviz) and the peak memory goes to `metrics`."""
+    if not enabled:
+        yield
+        return
+    import cProfile
+    import pstats
+    import tracemalloc
+    tracemalloc.start()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        profiler.dump_stats(stats_path)
+        if metrics is not None:
+            metrics.gauge("peak_traced_bytes", peak)
+        print(f"\nProfile saved to {stats_path}; peak traced memory {peak / 1024 ** 2:.1f} MB", file=sys.stderr)
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(PROFILE_TOP)
+        print("Largest allocations still held:", file=sys.stderr)
+        for stat in snapshot.statistics("lineno")[:PROFILE_TOP]:
+            print(f"  {stat}", file=sys.stderr)
+
+
+def add_arguments(parser):
+    """The --metrics and --profile flags every instrumented tool accepts."""
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="Write timings and counters to FILE (Prometheus text if it ends in .prom, else JSON)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Run under cProfile and tracemalloc and print where time and memory went")
+
+
+@contextmanager
+def instrumented(args, metrics: Metrics, default_stats: str):
+    """Profile (with --profile) and write the metrics file (with --metrics) around a tool's run.
+    The profile goes next to the metrics file, or to `default_stats` without one."""
+    stats_path = os.path.splitext(args.metrics)[0] + ".prof" if args.metrics else default_stats
+    try:
+        with profiled(args.profile, stats_path, metrics):
+            yield metrics
+    finally:
+        if args.metrics:
+            metrics.write(args.metrics)
@@ -0,0 +1,219 @@
+# Bulk import and export for the note manager
+# add_note asks for one note at a time; this moves thousands of notes in or out in one go.
+# Sources are read as streams (one file / line / row at a time) and handed to the store's
+# add_many(), which writes the whole batch as a single compaction (journal store) or a single
+# transaction (SQLite). The search indexes take the new notes in memory and are saved once at
+# the end. Imported notes get new ids. Exports stream the notes
+# out of the store the same way.
+#
+#   python bulk.py import ~/vault/                  # a folder of .md files (searched recursively)
+#   python bulk.py import notes.jsonl               # one JSON note per line (v1/v2/v3 layouts)
+#   python bulk.py import notes.json                # the JSON array main_v1/main_v2 keep
+#   python bulk.py import notes.csv                 # title,content,tags[,created_at] columns
+#   python bulk.py export backup.jsonl --backend sqlite
+#
+# Markdown files may start with a front matter block (title:, tags:, created_at: or date:);
+# without one the first '# heading' or the file name becomes the title.
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import textwrap
+import time
+from pathlib import Path
+
+from main_v3 import open_store
+from storage import normalize_note
+
+FORMATS = ("md", "jsonl", "json", "csv")
+CSV_FIELDS = ["id", "title", "content", "tags", "created_at"]
+SLUG = re.compile(r"[^\w-]+")
+
+
+class Meter:
+  """Counts notes and content bytes passing through an iterator."""
+
+  def __init__(self, notes):
+    self.notes = notes
+    self.count = 0
+    self.bytes = 0
+    self.start = time.perf_counter()
+
+  def __iter__(self):
+    for note in self.notes:
+      self.count += 1
+      self.bytes += len(note.get("content", "").encode('utf-8'))
+      yield note
+
+  def report(self, verb: str) -> str:
+    elapsed = max(time.perf_counter() - self.start, 1e-9)
+    return (f"{verb} {self.count} notes ({self.bytes / 1024 ** 2:.1f} MB) in {elapsed:.2f} s: "
+            f"{self.count / elapsed:.0f} notes/s, {self.bytes / 1024 ** 2 / elapsed:.1f} MB/s")
+
+
+def guess_format(path: str) -> str:
+  if os.path.isdir(path):
+    return "md"
+  suffix = Path(path).suffix.lower().lstrip(".")
+  if suffix in ("jsonl", "ndjson"):
+    return "jsonl"
+  if suffix in FORMATS:
+    return suffix
+  raise ValueError(f"Can't tell the format of {path}, use --format")
+
+
+def split_tags(text: str) -> list:
+  return [tag.strip() for tag in text.strip().strip("[]").split(",") if tag.strip()]
+
+
+# --- reading ---------------------------------------------------------------------------------
+
+def parse_markdown(path: Path) -> dict:
+  text = path.read_text(encoding='utf-8')
+  note = {"title": "", "tags": [], "created_at": None}
+  if text.startswith("---\n"):
+    end = text.find("\n---", 4)
+    if end != -1:
+      for line in text[4:end].splitlines():
+        key, _, value = line.partition(":")
+        key, value = key.strip().lower(), value.strip().strip('"\'')
+        if key == "title":
+          note["title"] = value
+        elif key == "tags":
+          note["tags"] = split_tags(value)
+        elif key in ("created_at", "date"):
+          note["created_at"] = value
+      text = text[end + 4:].lstrip("\n")
+  if not note["title"]:
+    first, _, rest = text.partition("\n")
+    if first.startswith("# "):
+      note["title"], text = first[2:].strip(), rest.lstrip("\n")
+    else:
+      note["title"] = path.stem
+  note["content"] = text.rstrip("\n")
+  return note
+
+
+def read_markdown(directory: str):
+  for path in sorted(Path(directory).rglob("*.md")):
+    yield parse_markdown(path)
+
+
+def read_jsonl(path: str):
+  with open(path, 'r', encoding='utf-8') as f:
+    for i, line in enumerate(f, start=1):
+      if line.strip():
+        yield normalize_note(json.loads(line), i)
+
+
+def read_json(path: str):
+  """A JSON array of notes, as main_v1/main_v2 write notes.json; JSON lines are accepted too."""
+  with open(path, 'r', encoding='utf-8') as f:
+    first = f.read(1)
+    while first.isspace():
+      first = f.read(1)
+    if first != "[":
+      f.close()
+      yield from read_jsonl(path)
+      return
+    f.seek(0)
+    notes = json.load(f)   # an array has to be parsed whole
+  for i, note in enumerate(notes, start=1):
+    yield normalize_note(note, i)
+
+
+def read_csv(path: str):
+  with open(path, 'r', encoding='utf-8', newline='') as f:
+    for row in csv.DictReader(f):
+      yield {"title": row.get("title", ""), "content": row.get("content", ""),
+             "tags": split_tags(row.get("tags", "")), "created_at": row.get("created_at")}
+
+
+READERS = {"md": read_markdown, "jsonl": read_jsonl, "json": read_json, "csv": read_csv}
+
+
+# --- writing ---------------------------------------------------------------------------------
+
+def write_markdown(notes, directory: str):
+  out = Path(directory)
+  out.mkdir(parents=True, exist_ok=True)
+  for note in notes:
+    slug = SLUG.sub("-", note["title"]).strip("-")[:60] or "note"
+    front = f"---\ntitle: {note['title']}\ntags: [{', '.join(note['tags'])}]\ncreated_at: {note['created_at']}\n---\n"
+    (out / f"{note['id']}-{slug}.md").write_text(front + note["content"] + "\n", encoding='utf-8')
+
+
+def write_jsonl(notes, path: str):
+  with open(path, 'w', encoding='utf-8') as f:
+    for note in notes:
+      f.write(json.dumps(note, ensure_ascii=False) + '\n')
+
+
+def write_json(notes, path: str):
+  """Same layout as json.dump(notes, f, indent=4), written one note at a time."""
+  with open(path, 'w', encoding='utf-8') as f:
+    separator = "[\n"
+    for note in notes:
+      f.write(separator + textwrap.indent(json.dumps(note, ensure_ascii=False, indent=4), "    "))
+      separator = ",\n"
+    f.write("[]" if separator == "[\n" else "\n]")
+
+
+def write_csv(notes, path: str):
+  with open(path, 'w', encoding='utf-8', newline='') as f:
+    csv_writer = csv.DictWriter(f, CSV_FIELDS, extrasaction='ignore')
+    csv_writer.writeheader()
+    for note in notes:
+      csv_writer.writerow(dict(note, tags=",".join(note["tags"])))
+
+
+WRITERS = {"md": write_markdown, "jsonl": write_jsonl, "json": write_json, "csv": write_csv}
+
+
+# --- commands --------------------------------------------------------------------------------
+
+def import_notes(store, path: str, fmt: str | None = None) -> Meter:
+  meter = Meter(READERS[fmt or guess_format(path)](path))
+  store.add_many(meter)
+  return meter
+
+
+def export_notes(store, path: str, fmt: str | None = None) -> Meter:
+  fmt = fmt or ("md" if not Path(path).suffix else guess_format(path))
+  meter = Meter(store.iter_notes())
+  WRITERS[fmt](meter, path)
+  return meter
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Import or export notes in bulk.")
+  parser.add_argument('command', choices=['import', 'export'])
+  parser.add_argument('path', help="Markdown folder, .jsonl, .json or .csv file")
+  parser.add_argument('--format', choices=FORMATS, help="Default: from the path (a folder means Markdown)")
+  parser.add_argument('--backend', choices=['journal', 'sqlite'], default='journal',
+                      help="Where notes are kept: journal files (default) or an SQLite database")
+  args = parser.parse_args()
+
+  store, *indexes = open_store(args.backend)   # the search indexes listen to the store
+  try:
+    if args.command == 'import':
+      print(import_notes(store, args.path, args.format).report("Imported"))
+    else:
+      print(export_notes(store, args.path, args.format).report("Exported"))
+  except FileNotFoundError:
+    print(f"File not Found: {args.path}")
+    sys.exit(1)
+  except (ValueError, KeyError, csv.Error) as err:
+    print(f"Error Found: {err}")
+    sys.exit(1)
+  finally:
+    store.close()
+    for index in indexes:
+      if index is not None:
+        index.save()
+
+
+if __name__ == "__main__":
+  main()
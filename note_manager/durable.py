@@ -0,0 +1,111 @@
+# Crash- and process-safe file helpers shared by the note stores, the search index and the
+# revision history
+import json
+import os
+
+try:
+  import fcntl
+except ImportError:   # Windows
+  fcntl = None
+  import msvcrt
+
+
+def atomic_write(path: str, lines):
+  """Write `lines` to `path` so readers see either the old or the new file, never a mix."""
+  temp_path = f"{path}.{os.getpid()}.tmp"   # per process, several may save the same file
+  with open(temp_path, 'w', encoding='utf-8') as f:
+    for line in lines:
+      f.write(line)
+      f.write('\n')
+    f.flush()
+    os.fsync(f.fileno())
+  os.replace(temp_path, path)
+  _fsync_dir(os.path.dirname(os.path.abspath(path)))
+
+
+def _fsync_dir(directory: str):
+  try:
+    fd = os.open(directory, os.O_RDONLY)
+  except OSError:
+    return   # not supported on this platform (Windows)
+  try:
+    os.fsync(fd)
+  except OSError:
+    pass
+  finally:
+    os.close(fd)
+
+
+def tail_log(path: str, offset: int = 0) -> tuple:
+  """(entries, end offset) for the complete JSON lines of an append-only file after `offset`.
+  A last line without its newline is left alone: another process may still be writing it, or
+  a crash tore it, in which case the next writer cuts it off with truncate_log()."""
+  with open(path, 'rb') as f:
+    return read_log(f, offset)
+
+
+def read_log(f, offset: int = 0) -> tuple:
+  """tail_log() on a log file that is already open in binary mode."""
+  entries = []
+  f.seek(offset)
+  for line in f:
+    if not line.endswith(b'\n'):
+      break
+    try:
+      entries.append(json.loads(line))
+    except json.JSONDecodeError:
+      break   # torn write from a crash, everything after it is garbage
+    offset += len(line)
+  return entries, offset
+
+
+def read_header(f) -> tuple:
+  """(first line as a dict, its length) of a log file open in binary mode; ({}, 0) when the file
+  is empty or does not start with a complete JSON object."""
+  f.seek(0)
+  line = f.readline()
+  if not line.endswith(b'\n'):
+    return {}, 0
+  try:
+    header = json.loads(line)
+  except json.JSONDecodeError:
+    return {}, 0
+  return (header, len(line)) if isinstance(header, dict) else ({}, 0)
+
+
+def truncate_log(path: str, offset: int):
+  """Drop whatever follows the last complete entry; only safe while holding the writers' lock."""
+  if os.path.getsize(path) > offset:
+    with open(path, 'r+b') as f:
+      f.truncate(offset)
+
+
+class FileLock:
+  """Exclusive lock shared by all processes using `path`; re-entrant within one process."""
+
+  def __init__(self, path: str):
+    self.path = path
+    self.file = None
+    self.depth = 0
+
+  def __enter__(self):
+    if self.depth == 0:
+      self.file = open(self.path, 'a+b')
+      if fcntl:
+        fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+      else:
+        self.file.seek(0)
+        msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK, 1)
+    self.depth += 1
+    return self
+
+  def __exit__(self, *exc_info):
+    self.depth -= 1
+    if self.depth == 0:
+      if fcntl:
+        fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+      else:
+        self.file.seek(0)
+        msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+      self.file.close()
+      self.file = None
@@ -0,0 +1,131 @@
+# Typo-tolerant search over note titles and tags
+# SearchIndex only finds words spelled exactly as in the note, and with_tag needs the exact tag.
+# FuzzyIndex keeps the words of every title and tag (and each whole tag, as "#tag") together
+# with their trigrams ("  pyt", " py", "pyt", ... of the padded word). A query word is compared
+# only against the terms sharing enough trigrams with it (an edit changes at most three of
+# them, a swap four), and those candidates are checked with a bounded edit distance:
+#   pyhton      -> python           (a swap of neighbours counts as one edit)
+#   machne lern -> "Machine learning"  (the last word is matched as a prefix while typing)
+# Results are ranked by how close each query word came to a title word (tags count a bit
+# less), so it answers fast enough to run on every keystroke.
+# Like SearchIndex it follows the store and is saved to <base>.fuzzy.json on compaction.
+import sys
+from collections import Counter
+from heapq import nlargest
+from pathlib import Path
+
+from search_index import StoreIndex, tokenize
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # textmatch.py is shared by the tools
+from textmatch import edit_distance, max_edits, trigrams
+
+TITLE = 1.0
+TAG = 0.8
+PREFIX = 0.9   # a term that only starts with the word ranks below one that is the word
+TAG_MARK = "#"
+
+
+def note_terms(note: dict) -> dict:
+  """term -> weight for a note's title words, tag words and whole tags."""
+  terms = {}
+  for token in tokenize(" ".join(note["tags"])):
+    terms[token] = TAG
+  for tag in note["tags"]:
+    terms[TAG_MARK + tag] = TAG
+  for token in tokenize(note["title"]):
+    terms[token] = TITLE
+  return terms
+
+
+class FuzzyIndex(StoreIndex):
+  SUFFIX = "fuzzy.json"
+
+  def clear(self):
+    self.postings = {}     # term -> {note id: weight}
+    self.grams = {}        # trigram -> terms containing it
+    self.doc_terms = {}    # note id -> its terms
+
+  # --- maintenance -----------------------------------------------------------------------
+
+  def _add_term(self, term: str):
+    for gram in trigrams(term.lower()):
+      self.grams.setdefault(gram, set()).add(term)
+
+  def add(self, note: dict):
+    self.remove(note["id"])
+    terms = note_terms(note)
+    for term, weight in terms.items():
+      if term not in self.postings:
+        self.postings[term] = {}
+        self._add_term(term)
+      self.postings[term][note["id"]] = weight
+    self.doc_terms[note["id"]] = list(terms)
+
+  def remove(self, note_id: int):
+    for term in self.doc_terms.pop(note_id, ()):
+      docs = self.postings[term]
+      del docs[note_id]
+      if not docs:
+        del self.postings[term]
+        for gram in trigrams(term.lower()):
+          self.grams[gram].discard(term)
+          if not self.grams[gram]:
+            del self.grams[gram]
+
+  # --- persistence -----------------------------------------------------------------------
+
+  def dump(self) -> dict:
+    return {"postings": self.postings}
+
+  def restore(self, data: dict):
+    for term, docs in data["postings"].items():
+      self.postings[term] = {int(note_id): weight for note_id, weight in docs.items()}
+      self._add_term(term)
+      for note_id in self.postings[term]:
+        self.doc_terms.setdefault(note_id, []).append(term)
+
+  # --- querying --------------------------------------------------------------------------
+
+  def match(self, word: str, prefix: bool = False) -> dict:
+    """term -> similarity (0..1] for the terms within max_edits(word) of `word`. Words match
+    title and tag words; a word starting with TAG_MARK matches whole tags."""
+    limit = max_edits(word.lstrip(TAG_MARK))
+    grams = trigrams(word, prefix)
+    shared = Counter()
+    for gram in grams:
+      shared.update(self.grams.get(gram, ()))
+    needed = max(len(grams) - 4 * limit, 1)   # an edit changes at most 3 trigrams, a swap 4
+    tags = word.startswith(TAG_MARK)
+    matches = {}
+    for term, count in shared.items():
+      if count < needed or term.startswith(TAG_MARK) != tags:
+        continue
+      distance = edit_distance(word, term.lower(), limit, prefix)
+      if distance <= limit:
+        similarity = 1 - distance / (len(word) + 1)
+        matches[term] = similarity * PREFIX if prefix and len(term) > len(word) + distance else similarity
+    return matches
+
+  def search(self, query: str, limit: int = 20) -> list:
+    """[(score, note id), ...] best first; every query word must come close to a title or tag
+    word. Unless the query ends with a space, its last word is matched as a prefix."""
+    words = tokenize(query)
+    scores = None
+    for i, word in enumerate(words):
+      best = {}
+      last = i == len(words) - 1
+      for term, similarity in self.match(word, prefix=last and not query[-1:].isspace()).items():
+        for note_id, weight in self.postings[term].items():
+          if similarity * weight > best.get(note_id, 0):
+            best[note_id] = similarity * weight
+      scores = best if scores is None else {note_id: scores[note_id] + score
+                                            for note_id, score in best.items() if note_id in scores}
+      if not scores:
+        return []
+    return nlargest(limit, ((score, note_id) for note_id, score in (scores or {}).items()))
+
+  def suggest_tags(self, tag: str, limit: int = 5) -> list:
+    """Existing tags closest to `tag`, most used first among equally close ones."""
+    matches = self.match(TAG_MARK + tag.lower())
+    ranked = sorted(matches, key=lambda term: (-matches[term], -len(self.postings[term]), term))
+    return [term[len(TAG_MARK):] for term in ranked[:limit]]
@@ -0,0 +1,353 @@
+# Revision history for notes
+# Every edit keeps the previous version of a note, but not as a full copy: a revision is stored
+# as a delta against the revision before it, i.e. a list of [start, end] ranges copied from the
+# older text and strings inserted in between, found with difflib on lines (or words) and then
+# zlib-compressed. Like a revlog, a chain of deltas is cut by a full copy once the deltas since
+# the last full copy would be bigger than a compressed full copy (or after MAX_CHAIN deltas),
+# so reading any revision applies at most MAX_CHAIN deltas and the history of a long,
+# frequently edited note stays a small multiple of its compressed size.
+#
+# NoteHistory is the file-based history used by storage.NoteStore:
+#   <base>.history.jsonl     header line + one line per revision (note id, rev, title, tags,
+#                            saved_at, full or delta, offset/length in the data file)
+#   <base>.history.<gen>.dat the compressed full copies and deltas
+# Both are append-only; collect() drops the revisions of deleted notes and all but the newest
+# KEEP_REVISIONS revisions of each note by writing the next generation. Writers hold the store's
+# lock; readers in other processes pick up appended revisions, or a new generation (told by the
+# generation in the index header), by looking at the index file again.
+# SQLiteNoteStore keeps the same records in its note_revisions table.
+# merge_notes() combines two edits made from the same revision, for concurrent sessions.
+import difflib
+import json
+import os
+import re
+import zlib
+from itertools import chain
+
+from durable import atomic_write, read_header, read_log, truncate_log
+
+FORMAT = 1
+KEEP_REVISIONS = 20   # revisions kept per note by collect()
+MAX_CHAIN = 32        # deltas between two full copies at most
+MAX_DIFF = 1 << 22    # above this many token pairs the changed middle is stored as it is
+WORDS = re.compile(r"\s+|\S+")
+
+
+# --- deltas --------------------------------------------------------------------------------
+
+def pack(value) -> bytes:
+  return zlib.compress(json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+
+def unpack(data: bytes):
+  return json.loads(zlib.decompress(data))
+
+
+def _common_prefix(a: str, b: str) -> int:
+  low, high = 0, min(len(a), len(b))
+  while low < high:   # binary search on slice comparisons, which run at C speed
+    middle = (low + high + 1) // 2
+    if a[:middle] == b[:middle]:
+      low = middle
+    else:
+      high = middle - 1
+  return low
+
+
+def _tokens(text: str) -> list:
+  lines = text.splitlines(keepends=True)
+  return lines if len(lines) > 1 else WORDS.findall(text)
+
+
+def make_delta(old: str, new: str) -> list:
+  """Ranges of `old` to copy ([start, end]) and strings to insert that together spell `new`.
+  The common prefix and suffix are cut off first; the rest is diffed by lines, or by words
+  when it is a single line."""
+  prefix = _common_prefix(old, new)
+  suffix = _common_prefix(old[prefix:][::-1], new[prefix:][::-1])
+  old_tokens = _tokens(old[prefix:len(old) - suffix])
+  new_tokens = _tokens(new[prefix:len(new) - suffix])
+  starts = [prefix]
+  for token in old_tokens:
+    starts.append(starts[-1] + len(token))
+  delta = [[0, prefix]] if prefix else []
+  if len(old_tokens) * len(new_tokens) > MAX_DIFF:   # difflib is quadratic, don't stall the edit
+    opcodes = [('replace', 0, len(old_tokens), 0, len(new_tokens))]
+  else:
+    opcodes = difflib.SequenceMatcher(None, old_tokens, new_tokens, autojunk=False).get_opcodes()
+  for tag, i1, i2, j1, j2 in opcodes:
+    if tag == 'equal':
+      delta.append([starts[i1], starts[i2]])
+    elif j2 > j1:
+      delta.append("".join(new_tokens[j1:j2]))
+  if suffix:
+    delta.append([len(old) - suffix, len(old)])
+  return delta
+
+
+def apply_delta(old: str, delta: list) -> str:
+  return "".join(old[part[0]:part[1]] if isinstance(part, list) else part for part in delta)
+
+
+def encode_revision(old: str, new: str, chain_bytes: int, chain_length: int) -> tuple:
+  """(full, data) for storing `new`; `chain_*` describe the deltas since the last full copy."""
+  full_data = pack(new)
+  if chain_length >= MAX_CHAIN:
+    return True, full_data
+  delta_data = pack(make_delta(old, new))
+  if chain_bytes + len(delta_data) > len(full_data):
+    return True, full_data
+  return False, delta_data
+
+
+def decode_revision(records) -> str:
+  """Text of the last of `records` ((full, data) pairs, starting at a full copy)."""
+  text = None
+  for full, data in records:
+    text = unpack(data) if full else apply_delta(text, unpack(data))
+  return text
+
+
+# --- merging -------------------------------------------------------------------------------
+
+def _changes(base: list, tokens: list) -> list:
+  matcher = difflib.SequenceMatcher(None, base, tokens, autojunk=False)
+  return [(i1, i2, tokens[j1:j2]) for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != 'equal']
+
+
+def merge_text(base: str, ours: str, theirs: str) -> str | None:
+  """Three-way merge of two edits of `base`; None when both change the same lines (words)."""
+  if ours == theirs or theirs == base:
+    return ours
+  if ours == base:
+    return theirs
+  split = _tokens if "\n" not in base + ours + theirs else (lambda text: text.splitlines(keepends=True))
+  base_tokens, our_tokens, their_tokens = split(base), split(ours), split(theirs)
+  if len(base_tokens) * max(len(our_tokens), len(their_tokens)) > MAX_DIFF:
+    return None
+  changes = sorted(_changes(base_tokens, our_tokens) + _changes(base_tokens, their_tokens),
+                   key=lambda change: (change[0], change[1]))
+  merged = []
+  position = 0
+  previous = None
+  for change in changes:
+    i1, i2, tokens = change
+    if previous is not None and (i1 < position or i1 == previous[0]):
+      if change == previous:
+        continue   # both made the same change
+      return None
+    merged.extend(base_tokens[position:i1])
+    merged.extend(tokens)
+    position = i2
+    previous = change
+  merged.extend(base_tokens[position:])
+  return "".join(merged)
+
+
+def merge_notes(base: dict, ours: dict, theirs: dict) -> dict | None:
+  """Title, content and tags after combining `ours` and `theirs`, or None on a conflict."""
+  merged = {}
+  for field in ("title", "tags"):
+    if ours[field] == base[field] or ours[field] == theirs[field]:
+      merged[field] = theirs[field]
+    elif theirs[field] == base[field]:
+      merged[field] = ours[field]
+    else:
+      return None
+  merged["content"] = merge_text(base["content"], ours["content"], theirs["content"])
+  return merged if merged["content"] is not None else None
+
+
+# --- file-based history --------------------------------------------------------------------
+
+class NoteHistory:
+  def __init__(self, base_path: str, sync: bool = True):
+    self.base_path = base_path
+    self.index_path = f"{base_path}.history.jsonl"
+    self.sync = sync
+    self.revisions = None   # note id -> [revision metadata, ...] oldest first, loaded on first use
+    self.generation = 0
+    self.index_offset = 0   # bytes of the index file read so far
+    self.data = None
+
+  @property
+  def data_path(self) -> str:
+    return f"{self.base_path}.history.{self.generation}.dat"
+
+  def exists(self) -> bool:
+    return os.path.exists(self.index_path)
+
+  def _refresh(self):
+    """Load the index, or only the revisions appended since the last look."""
+    if not self.exists():
+      self.revisions = {}
+      return
+    while not self._read_index():
+      self.revisions = None   # collect() removed the generation being opened: read the new index
+
+  def _read_index(self) -> bool:
+    with open(self.index_path, 'rb') as index:
+      header, header_length = read_header(index)
+      if header.get("format") != FORMAT:
+        raise ValueError(f"Unsupported history format in {self.index_path}")
+      if self.revisions is None or header["generation"] != self.generation:   # first look, or collect() ran
+        self.close()
+        self.revisions = {}
+        self.generation = header["generation"]
+        self.index_offset = header_length
+        try:
+          self.data = open(self.data_path, 'rb')   # only the writer creates data files
+        except FileNotFoundError:
+          if self._generation_on_disk() != self.generation:
+            return False
+          # nothing written to this generation yet: record() creates the file
+      if os.fstat(index.fileno()).st_size <= self.index_offset:
+        return True
+      entries, self.index_offset = read_log(index, self.index_offset)
+    for meta in entries:
+      self._remember(meta)
+    return True
+
+  def _generation_on_disk(self) -> int | None:
+    with open(self.index_path, 'rb') as index:
+      return read_header(index)[0].get("generation")
+
+  def _remember(self, meta: dict):
+    revisions = self.revisions.setdefault(meta["id"], [])
+    # an edit that crashed before reaching the journal left revisions that never became current
+    while revisions and revisions[-1]["rev"] >= meta["rev"]:
+      revisions.pop()
+    revisions.append(meta)
+
+  def _read(self, meta: dict, data_file=None) -> tuple:
+    data_file = data_file or self.data
+    data_file.seek(meta["offset"])
+    return meta["full"], data_file.read(meta["length"])
+
+  def _text(self, revisions: list, position: int, data_file=None) -> str:
+    """Content at revisions[position], from the full copy before it and the deltas after that."""
+    start = position
+    while not revisions[start]["full"]:
+      start -= 1
+    return decode_revision(self._read(meta, data_file) for meta in revisions[start:position + 1])
+
+  def _write(self, out, note: dict, full: bool, data: bytes) -> dict:
+    out.seek(0, os.SEEK_END)
+    meta = {"id": note["id"], "rev": note.get("rev", 1), "title": note["title"], "tags": note["tags"],
+            "saved_at": note.get("updated_at", note["created_at"]), "full": full,
+            "offset": out.tell(), "length": len(data)}
+    out.write(data)
+    return meta
+
+  def _chain(self, revisions: list) -> tuple:
+    """(bytes, length) of the deltas after the last full copy."""
+    size = length = 0
+    for meta in reversed(revisions):
+      if meta["full"]:
+        break
+      size += meta["length"]
+      length += 1
+    return size, length
+
+  def record(self, old: dict, new: dict):
+    """Store the edit of a note from `old` to `new` (both full notes with 'rev').
+    The caller holds the store's lock."""
+    if not self.exists():
+      atomic_write(self.index_path, [json.dumps({"format": FORMAT, "generation": 0})])
+    self._refresh()
+    truncate_log(self.index_path, self.index_offset)
+    revisions = [meta for meta in self.revisions.get(old["id"], []) if meta["rev"] <= old.get("rev", 1)]
+    metas = []
+    with open(self.data_path, 'ab') as out:
+      if not revisions or revisions[-1]["rev"] != old.get("rev", 1):
+        metas.append(self._write(out, old, True, pack(old["content"])))
+        revisions = [metas[-1]]
+      full, data = encode_revision(old["content"], new["content"], *self._chain(revisions))
+      metas.append(self._write(out, new, full, data))
+      out.flush()
+      if self.sync:
+        os.fsync(out.fileno())
+    if self.data is None:
+      self.data = open(self.data_path, 'rb')
+    lines = "".join(json.dumps(meta, ensure_ascii=False) + '\n' for meta in metas).encode('utf-8')
+    with open(self.index_path, 'ab') as index:
+      index.write(lines)
+      index.flush()
+      if self.sync:
+        os.fsync(index.fileno())
+    self.index_offset += len(lines)
+    for meta in metas:
+      self._remember(meta)
+
+  def list(self, note_id: int, current_rev: int | None = None) -> list:
+    """Metadata of the stored revisions of a note, oldest first."""
+    self._refresh()
+    revisions = self.revisions.get(note_id, [])
+    if current_rev is not None:
+      revisions = [meta for meta in revisions if meta["rev"] <= current_rev]
+    return revisions
+
+  def get(self, note_id: int, rev: int) -> dict | None:
+    """The note as it was at revision `rev`."""
+    revisions = self.list(note_id)
+    position = next((i for i, meta in enumerate(revisions) if meta["rev"] == rev), None)
+    if position is None:
+      return None
+    meta = revisions[position]
+    return {"id": note_id, "rev": rev, "title": meta["title"], "content": self._text(revisions, position),
+            "tags": meta["tags"], "saved_at": meta["saved_at"]}
+
+  # --- retention -------------------------------------------------------------------------
+
+  def _kept(self, notes: dict, keep: int) -> dict:
+    kept = {}
+    for note_id, revisions in self.revisions.items():
+      if note_id in notes:
+        current = [meta for meta in revisions if meta["rev"] <= notes[note_id].get("rev", 1)]
+        if len(current) > 1:
+          kept[note_id] = current[-keep:]
+    return kept
+
+  def garbage(self, notes: dict, keep: int = KEEP_REVISIONS) -> int:
+    """Number of stored revisions collect() would drop."""
+    self._refresh()
+    kept = sum(len(revisions) for revisions in self._kept(notes, keep).values())
+    return sum(len(revisions) for revisions in self.revisions.values()) - kept
+
+  def collect(self, notes: dict, keep: int = KEEP_REVISIONS):
+    """Keep only the newest `keep` revisions of the notes in `notes` (note id -> note with 'rev').
+    The caller holds the store's lock."""
+    self._refresh()
+    kept = self._kept(notes, keep)
+    old_data, old_path = self.data, self.data_path
+    self.generation += 1
+    new_data = open(self.data_path, 'w+b')
+    metas = []
+    for note_id, revisions in kept.items():
+      for i, meta in enumerate(revisions):
+        if i == 0 and not meta["full"]:
+          # the revision it was a delta against is dropped, so it becomes a full copy
+          everything = self.revisions[note_id]
+          full, data = True, pack(self._text(everything, everything.index(meta)))
+        else:
+          full, data = self._read(meta)
+        metas.append(dict(meta, full=full, offset=new_data.tell(), length=len(data)))
+        new_data.write(data)
+    new_data.flush()
+    os.fsync(new_data.fileno())
+    new_data.close()
+    header = json.dumps({"format": FORMAT, "generation": self.generation})
+    atomic_write(self.index_path, chain([header], (json.dumps(meta, ensure_ascii=False) for meta in metas)))
+    if old_data:
+      old_data.close()
+    self.data = None
+    self.revisions = None
+    try:
+      os.remove(old_path)   # nothing refers to it any more
+    except OSError:
+      pass   # still open in another process on Windows; it is left behind
+
+  def close(self):
+    if self.data:
+      self.data.close()
+      self.data = None
@@ -0,0 +1,278 @@
+# Version 3: notes live in a NoteStore (storage.py) instead of one big notes.json
+# Each add/delete appends a single line to a journal instead of rewriting every note,
+# and the existing notes.json is migrated the first time this version runs.
+# Search goes through a persistent inverted index (search_index.py) with ranked results.
+# `--backend sqlite` keeps the notes in notes.db instead (sqlite_store.py), with indexes on
+# tags, dates and titles and FTS5 for search; listings are streamed page by page.
+# Note contents are only read when a note is shown, and listings are shown PAGE_SIZE notes at
+# a time instead of printing the whole archive at once.
+# Notes can be edited; earlier versions are kept as compressed deltas (history.py) and can be
+# shown or compared from 'Note History'.
+# Several sessions can run on the same notes at once; an edit that overlaps with one saved by
+# another session in the meantime is refused instead of overwriting it.
+# Searches and tag filters that find nothing fall back to typo-tolerant matching on titles and
+# tags (fuzzy_index.py), e.g. "pyhton" finds notes titled Python.
+import argparse
+import difflib
+import sys
+from itertools import islice
+
+from fuzzy_index import FuzzyIndex
+from search_index import SearchIndex
+from storage import ConflictError, NoteStore
+
+PAGE_SIZE = 5
+
+
+def display_actions(actions):
+  print('\n---Note Manager---\n')
+  for i, action in enumerate(actions, start=1):
+    print(f"{i}. {action}")
+  print('\n')
+
+
+def print_note(note, show_content=True):
+  print("-" * 40)
+  print(f"[{note['id']}] {note['title']}")
+  print(f"Tags: {', '.join(note['tags'])}")
+  print(f"Created: {note['created_at']}")
+  if show_content:
+    print(note['content'])
+
+
+def show_pages(notes, show=print_note, page_size=PAGE_SIZE) -> int:
+  """Show `notes` (any iterable) a page at a time; returns how many were shown."""
+  notes = iter(notes)
+  shown = 0
+  page = list(islice(notes, page_size))
+  while page:
+    for note in page:
+      show(note)
+    shown += len(page)
+    page = list(islice(notes, page_size))
+    if page and input(f"-- {shown} shown, Enter for more, q to stop: ").strip().lower() == 'q':
+      break
+  return shown
+
+
+def add_note(store):
+  title = input("What is the Title of the note: ")
+  content = input("THE NOTE:\n")
+  tags = input("Tags (comma-separated): ").split(",")
+  note = store.add(title, content, tags)
+  print(f"Note {note['id']} added successfully!")
+
+
+def view_notes(store):
+  if not len(store):
+    print('No notes available.')
+    return
+  show_pages(store.iter_notes())
+  print('-' * 40)
+
+
+def pick_note(store, prompt):
+  while True:
+    try:
+      note = store.get(int(input(prompt)))
+      if note:
+        return note
+      print("Select an ID from the listed notes")
+    except ValueError:
+      print("Select a number from the notes\n")
+
+
+def edit_note(store):
+  if not len(store):
+    print("No note to edit")
+    return
+
+  note = pick_note(store, "Pick the ID of the note you want to edit: ")
+  print_note(note)
+  title = input("New title (Enter to keep): ") or note['title']
+  content = input("New content (Enter to keep):\n") or note['content']
+  tags = input("New tags, comma-separated (Enter to keep): ")
+  tags = tags.split(",") if tags else note['tags']
+  try:
+    saved = store.edit(note['id'], title, content, tags, base_rev=note.get('rev', 1))
+  except ConflictError as err:
+    print(f"{err}; your changes were not saved.")
+    return
+  if saved is None:
+    print(f"Note {note['id']} was deleted in another session")
+  else:
+    print(f"Note {saved['id']} saved as revision {saved['rev']}")
+
+
+def print_diff(old, new):
+  if old['title'] != new['title']:
+    print(f"Title: {old['title']} -> {new['title']}")
+  if old['tags'] != new['tags']:
+    print(f"Tags: {', '.join(old['tags'])} -> {', '.join(new['tags'])}")
+  lines = difflib.unified_diff(old['content'].splitlines(), new['content'].splitlines(),
+                               f"revision {old['rev']}", f"revision {new['rev']}", lineterm='')
+  for line in lines:
+    print(line)
+
+
+def note_history(store):
+  if not len(store):
+    print("No note available.")
+    return
+
+  note = pick_note(store, "Pick the ID of the note: ")
+  for revision in store.revisions(note['id']):
+    print(f"  revision {revision['rev']}  {revision['saved_at']}  {revision['title']}")
+  choice = input("Revision to show, or two revisions to compare (e.g. 2 5), Enter to go back: ").split()
+  try:
+    revisions = [store.revision(note['id'], int(rev)) for rev in choice[:2]]
+  except ValueError:
+    print("Revisions are numbers")
+    return
+  if None in revisions:
+    print("That revision is not kept any more")
+  elif len(revisions) == 1:
+    print("-" * 40)
+    print(f"[{note['id']}] {revisions[0]['title']}  (revision {revisions[0]['rev']}, {revisions[0]['saved_at']})")
+    print(f"Tags: {', '.join(revisions[0]['tags'])}")
+    print(revisions[0]['content'])
+  elif len(revisions) == 2:
+    print_diff(*revisions)
+
+
+def delete_notes(store):
+  if not len(store):
+    print("No note to delete")
+    return
+
+  view_notes(store)
+  while True:
+    try:
+      note_id = int(input("Pick the ID of the note you want to delete: "))
+      removed = store.delete(note_id)
+      if removed:
+        print(f"Note {removed['id']}, has been deleted")
+        break
+      print("Select an ID from the listed notes")
+    except ValueError:
+      print("Select a number from the notes\n")
+
+
+def search_notes(store, index, fuzzy):
+  if not len(store):
+    print("No Notes available.")
+    return
+
+  print('Tip: use "quotes" for a phrase and word* for a prefix')
+  query = input("Search keyword: ")
+  results = (index or store).search(query)
+  if not results and query.strip():
+    results = fuzzy.search(query)
+    if results:
+      print(f"Nothing matched '{query}' exactly; closest titles and tags:")
+
+  def show_result(result):
+    score, note = result
+    print('-'*40)
+    print(f"[{note['id']}] {note['title']}  (score {score:.2f})")
+    print(f"\t{note['content']}")
+
+  notes = ((score, store.get(note_id)) for score, note_id in results)
+  show_pages(((score, note) for score, note in notes if note), show_result)
+  print('')
+
+  if not results:
+    print("No note with the keyword(s) was found")
+
+
+def filter_notes(store, fuzzy):
+  if not len(store):
+    print("No note available.")
+    return
+  keyword = input("Enter the tag name: ")
+
+  if show_pages(store.with_tag(keyword)):
+    return
+  suggestions = fuzzy.suggest_tags(keyword)
+  if not suggestions:
+    print(f"No Note was tagged: {keyword}")
+    return
+  print(f"No Note was tagged: {keyword}, showing '{suggestions[0]}'")
+  show_pages(store.with_tag(suggestions[0]))
+  if len(suggestions) > 1:
+    print(f"Other close tags: {', '.join(suggestions[1:])}")
+
+
+def sort_by_title(store):
+  if not len(store):
+    print("No note available.")
+    return
+  show_pages(store.iter_notes("title"))
+
+
+def sort_by_date(store):
+  if not len(store):
+    print("No note available.")
+    return
+  show_pages(store.iter_notes("date"))
+
+
+def exit(store, index, fuzzy):
+  store.close()
+  for saved in (index, fuzzy):
+    if saved is not None:
+      saved.save()
+  print('\n👋(^ _ ^)\tGoodbye!\n ')
+  sys.exit(0)
+
+
+def main(store, index, fuzzy):
+  actions = ['Add Note', 'View All Notes', 'Delete Note', 'Search Notes', 'Filter Notes by Tags', 'Sort by Title', 'Sort by Date', 'Edit Note', 'Note History', 'Exit']
+  total_actions = len(actions)
+  actions_mapping = {
+                1: lambda: add_note(store),
+                2: lambda: view_notes(store),
+                3: lambda: delete_notes(store),
+                4: lambda: search_notes(store, index, fuzzy),
+                5: lambda: filter_notes(store, fuzzy),
+                6: lambda: sort_by_title(store),
+                7: lambda: sort_by_date(store),
+                8: lambda: edit_note(store),
+                9: lambda: note_history(store),
+                10: lambda: exit(store, index, fuzzy),
+  }
+
+  display_actions(actions)
+
+  while True:
+    try:
+      action_selected = int(input(f"Select any of the options 1-{total_actions}: "))
+      if 1 <= action_selected <= len(actions):
+        break
+      else:
+        display_actions(actions)
+    except ValueError:
+      print(f"Select an integer from 1 to {total_actions}.")
+
+  action = actions_mapping[action_selected]
+  action()
+
+
+def open_store(backend):
+  """The note store, its search index (None for SQLite, which searches itself) and its fuzzy index."""
+  if backend == 'sqlite':
+    from sqlite_store import SQLiteNoteStore   # sqlite3 is only loaded for this backend
+    store = SQLiteNoteStore('notes.db', legacy_path='notes.json')
+    return store, None, FuzzyIndex.open(store, 'notes.db.fuzzy.json')
+  store = NoteStore('notes', legacy_path='notes.json')
+  return store, SearchIndex.open(store), FuzzyIndex.open(store)
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Note Manager")
+  parser.add_argument('--backend', choices=['journal', 'sqlite'], default='journal',
+                      help="Where notes are kept: journal files (default) or an SQLite database")
+  args = parser.parse_args()
+  store, index, fuzzy = open_store(args.backend)
+  while True:
+    main(store, index, fuzzy)
@@ -0,0 +1,228 @@
+# Persistent inverted index for searching notes
+# search_notes in main_v2 lowercases and scans every note on every query. SearchIndex keeps
+# token -> {note id: [positions]} instead, so a query only touches the notes that contain its
+# words. It supports:
+#   python notes        every word must appear, results ranked with BM25
+#   "exact phrase"      the words must appear next to each other
+#   pyth*               any word starting with "pyth" (sorted term list + bisect)
+# The index follows a NoteStore: it listens for add/edit/delete entries, saves itself to
+# <base>.index.json whenever the store compacts, and on startup replays the journal entries it
+# has not seen yet (or rebuilds from scratch if those entries were already compacted away).
+import json
+import math
+import os
+import re
+from bisect import bisect_left, insort
+
+from durable import atomic_write
+
+TOKEN = re.compile(r"\w+")
+QUERY = re.compile(r'"([^"]*)"|(\S+)')
+FIELD_GAP = 100   # position gap between title, content and tags so phrases can't span fields
+MAX_EXPANSIONS = 50
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text: str) -> list:
+  return TOKEN.findall(text.lower())
+
+
+def note_tokens(note: dict) -> list:
+  """(token, position) pairs for a note's title, content and tags."""
+  pairs = []
+  position = 0
+  for text in (note["title"], note["content"], " ".join(note["tags"])):
+    for token in tokenize(text):
+      pairs.append((token, position))
+      position += 1
+    position += FIELD_GAP
+  return pairs
+
+
+class StoreIndex:
+  """Base for indexes that follow a note store and persist themselves to <base>.<SUFFIX>.
+  Subclasses implement clear(), add(), remove(), dump() and restore()."""
+  SUFFIX = None
+
+  def __init__(self, path: str | None = None):
+    self.path = path
+    self.seq = 0
+    self.clear()
+
+  def on_change(self, entry: dict):
+    """Store listener."""
+    if entry["op"] in ("add", "edit"):
+      self.add(entry["note"])
+    elif entry["op"] == "delete":
+      self.remove(entry["id"])
+    elif entry["op"] == "compact":
+      self.seq = entry["seq"]
+      self.save()
+      return
+    self.seq = entry["seq"]
+
+  def rebuild(self, store):
+    self.clear()
+    for note in store.iter_notes():
+      self.add(note)
+    self.seq = store.seq
+
+  def save(self):
+    if not self.path:
+      return
+    atomic_write(self.path, [json.dumps(dict(self.dump(), seq=self.seq), separators=(',', ':'))])
+
+  def load(self) -> bool:
+    if not self.path or not os.path.exists(self.path):
+      return False
+    try:
+      with open(self.path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    except (json.JSONDecodeError, IOError):
+      return False
+    self.clear()
+    self.seq = data["seq"]
+    self.restore(data)
+    return True
+
+  @classmethod
+  def open(cls, store, path: str | None = None) -> "StoreIndex":
+    """Load the saved index for `store`, bring it up to date and subscribe it to changes."""
+    index = cls(path if path is not None else f"{store.base_path}.{cls.SUFFIX}")
+    if not index.load() or index.seq < store.snapshot_seq() or index.seq > store.seq:
+      index.rebuild(store)
+      index.save()
+    else:
+      for entry in store.entries_since(index.seq):
+        index.on_change(entry)
+    store.listeners.append(index.on_change)
+    return index
+
+
+class SearchIndex(StoreIndex):
+  SUFFIX = "index.json"
+
+  def clear(self):
+    self.postings = {}     # token -> {note id: [positions]}
+    self.terms = []        # sorted tokens, for prefix queries
+    self.doc_lengths = {}  # note id -> number of tokens
+    self.doc_terms = {}    # note id -> its distinct tokens, so a delete only touches those postings
+    self.total_length = 0
+
+  # --- maintenance -----------------------------------------------------------------------
+
+  def add(self, note: dict):
+    note_id = note["id"]
+    if note_id in self.doc_lengths:
+      self.remove(note_id)
+    pairs = note_tokens(note)
+    for token, position in pairs:
+      docs = self.postings.get(token)
+      if docs is None:
+        docs = self.postings[token] = {}
+        insort(self.terms, token)
+      docs.setdefault(note_id, []).append(position)
+    self.doc_lengths[note_id] = len(pairs)
+    self.doc_terms[note_id] = list({token for token, _ in pairs})
+    self.total_length += len(pairs)
+
+  def remove(self, note_id: int):
+    length = self.doc_lengths.pop(note_id, None)
+    if length is None:
+      return
+    self.total_length -= length
+    for token in self.doc_terms.pop(note_id):
+      docs = self.postings[token]
+      del docs[note_id]
+      if not docs:
+        del self.postings[token]
+        del self.terms[bisect_left(self.terms, token)]
+
+  # --- persistence -----------------------------------------------------------------------
+
+  def dump(self) -> dict:
+    return {"doc_lengths": self.doc_lengths, "postings": self.postings}
+
+  def restore(self, data: dict):
+    self.doc_lengths = {int(note_id): length for note_id, length in data["doc_lengths"].items()}
+    self.total_length = sum(self.doc_lengths.values())
+    self.postings = {token: {int(note_id): positions for note_id, positions in docs.items()}
+                     for token, docs in data["postings"].items()}
+    self.terms = sorted(self.postings)
+    self.doc_terms = {note_id: [] for note_id in self.doc_lengths}
+    for token, docs in self.postings.items():
+      for note_id in docs:
+        self.doc_terms[note_id].append(token)
+
+  # --- querying --------------------------------------------------------------------------
+
+  def _idf(self, token: str) -> float:
+    docs = len(self.doc_lengths)
+    df = len(self.postings[token])
+    return math.log(1 + (docs - df + 0.5) / (df + 0.5))
+
+  def _bm25(self, idf: float, note_id: int, frequency: int) -> float:
+    average = self.total_length / len(self.doc_lengths)
+    norm = K1 * (1 - B + B * self.doc_lengths[note_id] / average)
+    return idf * frequency * (K1 + 1) / (frequency + norm)
+
+  def expand(self, prefix: str) -> list:
+    start = bisect_left(self.terms, prefix)
+    matches = []
+    for token in self.terms[start:start + MAX_EXPANSIONS]:
+      if not token.startswith(prefix):
+        break
+      matches.append(token)
+    return matches
+
+  def _match_term(self, term: str) -> dict:
+    """note id -> score for a single word or prefix* part of a query."""
+    tokens = self.expand(term[:-1]) if term.endswith("*") else [term]
+    scores = {}
+    for token in tokens:
+      if token not in self.postings:
+        continue
+      idf = self._idf(token)
+      for note_id, positions in self.postings[token].items():
+        scores[note_id] = scores.get(note_id, 0) + self._bm25(idf, note_id, len(positions))
+    return scores
+
+  def _match_phrase(self, words: list) -> dict:
+    if any(word not in self.postings for word in words):
+      return {}
+    candidates = set(self.postings[words[0]])
+    for word in words[1:]:
+      candidates &= self.postings[word].keys()
+    idfs = [self._idf(word) for word in words]
+    scores = {}
+    for note_id in candidates:
+      following = [set(self.postings[word][note_id]) for word in words[1:]]
+      hits = sum(1 for start in self.postings[words[0]][note_id]
+                 if all(start + offset in positions for offset, positions in enumerate(following, start=1)))
+      if hits:
+        scores[note_id] = sum(self._bm25(idf, note_id, hits) for idf in idfs)
+    return scores
+
+  def search(self, query: str, limit: int = 20) -> list:
+    """[(score, note id), ...] best first; every part of the query has to match."""
+    parts = []
+    for phrase, word in QUERY.findall(query):
+      if phrase:
+        words = tokenize(phrase)
+        if words:
+          parts.append(self._match_phrase(words) if len(words) > 1 else self._match_term(words[0]))
+      else:
+        prefix = word.endswith("*")
+        words = tokenize(word)
+        for i, token in enumerate(words):
+          parts.append(self._match_term(token + "*" if prefix and i == len(words) - 1 else token))
+    if not parts:
+      return []
+    parts.sort(key=len)
+    results = parts[0]
+    for part in parts[1:]:
+      results = {note_id: score + part[note_id] for note_id, score in results.items() if note_id in part}
+      if not results:
+        return []
+    return sorted(((score, note_id) for note_id, score in results.items()), reverse=True)[:limit]
@@ -0,0 +1,356 @@
+# Optional SQLite backend for the note manager
+# Same interface as storage.NoteStore, but the notes live in an SQLite database:
+#   notes      id INTEGER PRIMARY KEY (ids come from SQLite, no max() over every note),
+#              indexes on created_at and on title (case-insensitive)
+#   note_tags  (tag, note_id) join table, so "notes tagged X" is an index range scan
+#   notes_fts  FTS5 table over title, content and tags for ranked full-text search
+#   note_revisions  earlier versions of edited notes, as compressed deltas (see history.py),
+#              trimmed to the newest KEEP_REVISIONS per note on every edit
+# Listing functions are generators that page through the indexes with keyset pagination
+# (WHERE (key, id) > (last key, last id) LIMIT n), so a view never loads the full set.
+# migrate_json() imports the existing notes.json (v1 or v2 layout) once.
+# Several processes can share notes.db: WAL mode lets readers run next to a writer, writers
+# wait up to BUSY_TIMEOUT seconds for each other, and edits merge with (or refuse to overwrite)
+# a version saved by another session since the edit started, like NoteStore.edit.
+# Every write bumps a change counter in meta ('seq') and is passed to `listeners`, so indexes
+# kept outside the database (fuzzy_index.py) stay current and can tell when they are stale.
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+from history import KEEP_REVISIONS, decode_revision, encode_revision, merge_notes, pack
+from storage import ConflictError, normalize_note
+
+PAGE_SIZE = 100
+BUSY_TIMEOUT = 30
+TAG_SEPARATOR = '\x1f'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  title TEXT NOT NULL,
+  content TEXT NOT NULL,
+  created_at TEXT NOT NULL,
+  rev INTEGER NOT NULL DEFAULT 1,
+  updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS notes_created_at ON notes (created_at, id);
+CREATE INDEX IF NOT EXISTS notes_title ON notes (title COLLATE NOCASE, id);
+CREATE TABLE IF NOT EXISTS note_tags (
+  tag TEXT NOT NULL,
+  note_id INTEGER NOT NULL REFERENCES notes (id) ON DELETE CASCADE,
+  PRIMARY KEY (tag, note_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS note_tags_note ON note_tags (note_id);
+CREATE TABLE IF NOT EXISTS note_revisions (
+  note_id INTEGER NOT NULL REFERENCES notes (id) ON DELETE CASCADE,
+  rev INTEGER NOT NULL,
+  title TEXT NOT NULL,
+  tags TEXT NOT NULL,
+  saved_at TEXT NOT NULL,
+  full INTEGER NOT NULL,
+  data BLOB NOT NULL,
+  PRIMARY KEY (note_id, rev)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+FTS_SCHEMA = "CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(title, content, tags)"
+
+SELECT_NOTE = f"""
+SELECT id, title, content, created_at, rev, updated_at,
+       (SELECT group_concat(tag, '{TAG_SEPARATOR}') FROM note_tags WHERE note_id = notes.id)
+FROM notes
+"""
+
+# order name -> (ORDER BY columns, "after the last row" condition, sort key column)
+# The conditions are written as `key >= ? AND (key > ? OR id > ?)` so SQLite seeks into the
+# index instead of scanning it; they take the parameters (key, key, id).
+ORDERS = {
+  "id": ("id", "id > ?", None),
+  "title": ("title COLLATE NOCASE, id",
+            "title >= ? COLLATE NOCASE AND (title > ? COLLATE NOCASE OR id > ?)", "title"),
+  "date": ("created_at DESC, id DESC", "created_at <= ? AND (created_at < ? OR id < ?)", "created_at"),
+}
+
+
+class SQLiteNoteStore:
+  def __init__(self, db_path: str = 'notes.db', legacy_path: str | None = 'notes.json',
+               keep_revisions: int = KEEP_REVISIONS):
+    self.base_path = os.path.splitext(db_path)[0]
+    self.keep_revisions = keep_revisions
+    self.listeners = []   # callables taking {"op": "add"/"edit"/"delete", "seq": ..., ...}
+    self.db = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT)
+    self.db.execute("PRAGMA foreign_keys = ON")
+    self.db.execute("PRAGMA journal_mode = WAL")
+    columns = {row[1] for row in self.db.execute("PRAGMA table_info(notes)")}
+    if columns and "rev" not in columns:   # database created before notes could be edited
+      self.db.execute("ALTER TABLE notes ADD COLUMN rev INTEGER NOT NULL DEFAULT 1")
+      self.db.execute("ALTER TABLE notes ADD COLUMN updated_at TEXT")
+    self.db.executescript(SCHEMA)
+    try:
+      self.db.execute(FTS_SCHEMA)
+      self.has_fts = True
+    except sqlite3.OperationalError:   # SQLite built without FTS5
+      self.has_fts = False
+    self.db.commit()
+    if legacy_path and os.path.exists(legacy_path):
+      self.migrate_json(legacy_path)
+
+  # --- migration -------------------------------------------------------------------------
+
+  def migrate_json(self, json_path: str) -> int:
+    """Import notes.json once; returns how many notes were imported."""
+    key = f"migrated:{os.path.abspath(json_path)}"
+    if self.db.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+      return 0
+    try:
+      with open(json_path, 'r', encoding='utf-8') as f:
+        legacy = json.load(f)
+    except (json.JSONDecodeError, IOError):
+      legacy = []
+    with self.db:
+      for i, note in enumerate(legacy, start=1):
+        note = normalize_note(note, i)
+        self._insert(note["title"], note["content"], note["tags"], note["created_at"])
+      self._bump()
+      self.db.execute("INSERT INTO meta (key, value) VALUES (?, ?)", (key, str(len(legacy))))
+    return len(legacy)
+
+  # --- writing ---------------------------------------------------------------------------
+
+  def _bump(self) -> int:
+    self.db.execute("INSERT OR REPLACE INTO meta (key, value) "
+                    "VALUES ('seq', COALESCE((SELECT value FROM meta WHERE key = 'seq'), 0) + 1)")
+    return self.seq
+
+  def _notify(self, entry: dict):
+    for listener in self.listeners:
+      listener(entry)
+
+  def _insert(self, title: str, content: str, tags: list, created_at: str) -> int:
+    cursor = self.db.execute("INSERT INTO notes (title, content, created_at) VALUES (?, ?, ?)",
+                             (title, content, created_at))
+    note_id = cursor.lastrowid
+    self.db.executemany("INSERT OR IGNORE INTO note_tags (tag, note_id) VALUES (?, ?)",
+                        [(tag, note_id) for tag in tags])
+    if self.has_fts:
+      self.db.execute("INSERT INTO notes_fts (rowid, title, content, tags) VALUES (?, ?, ?, ?)",
+                      (note_id, title, content, " ".join(tags)))
+    return note_id
+
+  def add(self, title: str, content: str, tags: list) -> dict:
+    tags = [tag.strip() for tag in tags if tag.strip()]
+    created_at = datetime.now().strftime('%Y-%m-%d %H:%M')
+    with self.db:
+      note_id = self._insert(title, content, tags, created_at)
+      seq = self._bump()
+    note = {"id": note_id, "title": title, "content": content, "tags": tags, "created_at": created_at, "rev": 1}
+    self._notify({"op": "add", "seq": seq, "note": note})
+    return note
+
+  def add_many(self, notes) -> int:
+    """Add notes (dicts with title, content, tags and maybe created_at) in one transaction."""
+    added = 0
+    new_notes = []   # kept for the listeners until the transaction has committed
+    with self.db:
+      for note in notes:
+        title, content = note.get("title", ""), note.get("content", "")
+        tags = [tag.strip() for tag in note.get("tags", []) if tag.strip()]
+        created_at = note.get("created_at") or datetime.now().strftime('%Y-%m-%d %H:%M')
+        note_id = self._insert(title, content, tags, created_at)
+        added += 1
+        if self.listeners:
+          new_notes.append({"id": note_id, "title": title, "content": content, "tags": tags,
+                            "created_at": created_at, "rev": 1})
+      seq = self._bump()
+    for note in new_notes:
+      self._notify({"op": "add", "seq": seq, "note": note})
+    return added
+
+  def _save_revision(self, note: dict, full: bool, data: bytes):
+    self.db.execute("INSERT OR REPLACE INTO note_revisions (note_id, rev, title, tags, saved_at, full, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (note["id"], note["rev"], note["title"], TAG_SEPARATOR.join(note["tags"]),
+                     note.get("updated_at") or note["created_at"], full, data))
+
+  def _chain(self, note_id: int) -> tuple:
+    """(bytes, length) of the deltas stored after the note's last full copy."""
+    size = length = 0
+    for full, data_length in self.db.execute("SELECT full, length(data) FROM note_revisions WHERE note_id = ? "
+                                             "ORDER BY rev DESC", (note_id,)):
+      if full:
+        break
+      size += data_length
+      length += 1
+    return size, length
+
+  def _trim_revisions(self, note_id: int, current_rev: int):
+    oldest = current_rev - self.keep_revisions + 1
+    row = self.db.execute("SELECT full FROM note_revisions WHERE note_id = ? AND rev = ?", (note_id, oldest)).fetchone()
+    if row is None:
+      return
+    if not row[0]:
+      # the revision it is a delta against is about to go, so it becomes a full copy
+      content = self.revision(note_id, oldest)["content"]
+      self.db.execute("UPDATE note_revisions SET full = 1, data = ? WHERE note_id = ? AND rev = ?",
+                      (pack(content), note_id, oldest))
+    self.db.execute("DELETE FROM note_revisions WHERE note_id = ? AND rev < ?", (note_id, oldest))
+
+  def edit(self, note_id: int, title: str, content: str, tags: list, base_rev: int | None = None) -> dict | None:
+    """Replace a note's title, content and tags; the old version goes to note_revisions.
+    See NoteStore.edit for `base_rev`."""
+    with self.db:
+      self.db.execute("BEGIN IMMEDIATE")   # take the write lock before reading the current version
+      old = self.get(note_id)
+      if old is None:
+        return None
+      ours = {"title": title, "content": content, "tags": [tag.strip() for tag in tags if tag.strip()]}
+      if base_rev is not None and base_rev != old["rev"]:
+        base = self.revision(note_id, base_rev)
+        ours = merge_notes(base, ours, old) if base else None
+        if ours is None:
+          raise ConflictError(f"Note {note_id} was changed in another session (now revision {old['rev']})")
+      note = dict(old, **ours, rev=old["rev"] + 1, updated_at=datetime.now().strftime('%Y-%m-%d %H:%M'))
+      title, content = note["title"], note["content"]
+      if not self.db.execute("SELECT 1 FROM note_revisions WHERE note_id = ? AND rev = ?",
+                             (note_id, old["rev"])).fetchone():
+        self._save_revision(old, True, pack(old["content"]))
+      self._save_revision(note, *encode_revision(old["content"], content, *self._chain(note_id)))
+      self.db.execute("UPDATE notes SET title = ?, content = ?, rev = ?, updated_at = ? WHERE id = ?",
+                      (title, content, note["rev"], note["updated_at"], note_id))
+      self.db.execute("DELETE FROM note_tags WHERE note_id = ?", (note_id,))
+      self.db.executemany("INSERT OR IGNORE INTO note_tags (tag, note_id) VALUES (?, ?)",
+                          [(tag, note_id) for tag in note["tags"]])
+      if self.has_fts:
+        self.db.execute("UPDATE notes_fts SET title = ?, content = ?, tags = ? WHERE rowid = ?",
+                        (title, content, " ".join(note["tags"]), note_id))
+      self._trim_revisions(note_id, note["rev"])
+      seq = self._bump()
+    self._notify({"op": "edit", "seq": seq, "note": note})
+    return note
+
+  def delete(self, note_id: int) -> dict | None:
+    note = self.get(note_id)
+    if note is None:
+      return None
+    with self.db:
+      self.db.execute("DELETE FROM notes WHERE id = ?", (note_id,))
+      if self.has_fts:
+        self.db.execute("DELETE FROM notes_fts WHERE rowid = ?", (note_id,))
+      seq = self._bump()
+    self._notify({"op": "delete", "seq": seq, "id": note_id})
+    return note
+
+  # --- reading ---------------------------------------------------------------------------
+
+  @staticmethod
+  def _row_to_note(row) -> dict:
+    note_id, title, content, created_at, rev, updated_at, tags = row
+    note = {"id": note_id, "title": title, "content": content,
+            "tags": tags.split(TAG_SEPARATOR) if tags else [], "created_at": created_at, "rev": rev}
+    if updated_at:
+      note["updated_at"] = updated_at
+    return note
+
+  def get(self, note_id: int) -> dict | None:
+    row = self.db.execute(f"{SELECT_NOTE} WHERE id = ?", (note_id,)).fetchone()
+    return self._row_to_note(row) if row else None
+
+  def iter_notes(self, order: str = "id", page_size: int = PAGE_SIZE):
+    """Yield notes in `order` ('id', 'title' or 'date'), one indexed page query at a time."""
+    order_by, after, key = ORDERS[order]
+    last = None
+    while True:
+      if last is None:
+        rows = self.db.execute(f"{SELECT_NOTE} ORDER BY {order_by} LIMIT ?", (page_size,)).fetchall()
+      else:
+        params = (last["id"],) if key is None else (last[key], last[key], last["id"])
+        rows = self.db.execute(f"{SELECT_NOTE} WHERE {after} ORDER BY {order_by} LIMIT ?",
+                               (*params, page_size)).fetchall()
+      for row in rows:
+        last = self._row_to_note(row)
+        yield last
+      if len(rows) < page_size:
+        return
+
+  def with_tag(self, tag: str, page_size: int = PAGE_SIZE):
+    """Yield the notes tagged `tag`, walking the (tag, note_id) primary key."""
+    last_id = 0
+    while True:
+      rows = self.db.execute(
+        f"{SELECT_NOTE} WHERE id IN (SELECT note_id FROM note_tags WHERE tag = ? AND note_id > ? "
+        f"ORDER BY note_id LIMIT ?) ORDER BY id", (tag, last_id, page_size)).fetchall()
+      for row in rows:
+        note = self._row_to_note(row)
+        last_id = note["id"]
+        yield note
+      if len(rows) < page_size:
+        return
+
+  def search(self, query: str, limit: int = 20) -> list:
+    """[(score, note id), ...] best first, ranked by FTS5's bm25 (LIKE scan without FTS5)."""
+    if self.has_fts:
+      words = [word.replace('"', '""') for word in query.split()]
+      match = " ".join(f'"{word[:-1]}"*' if word.endswith("*") else f'"{word}"' for word in words)
+      if query.count('"') >= 2:
+        match = query   # the user wrote an FTS5 phrase query themselves
+      try:
+        rows = self.db.execute("SELECT -bm25(notes_fts), rowid FROM notes_fts WHERE notes_fts MATCH ? "
+                               "ORDER BY bm25(notes_fts) LIMIT ?", (match, limit)).fetchall()
+        return [(score, note_id) for score, note_id in rows]
+      except sqlite3.OperationalError:
+        return []
+    pattern = f"%{query.lower()}%"
+    rows = self.db.execute("SELECT id FROM notes WHERE lower(title) LIKE ? OR lower(content) LIKE ? LIMIT ?",
+                           (pattern, pattern, limit)).fetchall()
+    return [(1.0, note_id) for (note_id,) in rows]
+
+  def revisions(self, note_id: int) -> list:
+    """[{'rev', 'title', 'tags', 'saved_at'}, ...] oldest first, including the current version."""
+    rows = self.db.execute("SELECT rev, title, tags, saved_at FROM note_revisions WHERE note_id = ? ORDER BY rev",
+                           (note_id,)).fetchall()
+    if not rows:
+      note = self.get(note_id)
+      if note is None:
+        return []
+      rows = [(note["rev"], note["title"], TAG_SEPARATOR.join(note["tags"]), note["created_at"])]
+    return [{"rev": rev, "title": title, "tags": tags.split(TAG_SEPARATOR) if tags else [], "saved_at": saved_at}
+            for rev, title, tags, saved_at in rows]
+
+  def revision(self, note_id: int, rev: int) -> dict | None:
+    """A note as it was at revision `rev`: the full copy before it plus the deltas up to it."""
+    rows = self.db.execute(
+      "SELECT rev, title, tags, saved_at, full, data FROM note_revisions WHERE note_id = ? AND rev <= ? AND "
+      "rev >= (SELECT max(rev) FROM note_revisions WHERE note_id = ? AND rev <= ? AND full) ORDER BY rev",
+      (note_id, rev, note_id, rev)).fetchall()
+    if not rows or rows[-1][0] != rev:
+      note = self.get(note_id)
+      if note is None or note["rev"] != rev:
+        return None
+      return dict(note, saved_at=note.get("updated_at", note["created_at"]))
+    title, tags, saved_at = rows[-1][1:4]
+    return {"id": note_id, "rev": rev, "title": title,
+            "content": decode_revision((full, data) for *_, full, data in rows),
+            "tags": tags.split(TAG_SEPARATOR) if tags else [], "saved_at": saved_at}
+
+  @property
+  def seq(self) -> int:
+    row = self.db.execute("SELECT value FROM meta WHERE key = 'seq'").fetchone()
+    return int(row[0]) if row else 0
+
+  def snapshot_seq(self) -> int:
+    return self.seq   # the database is always a complete snapshot...
+
+  def entries_since(self, seq: int) -> list:
+    return []         # ...so there is never a journal to replay
+
+  def all(self) -> list:
+    return list(self.iter_notes())
+
+  def __len__(self) -> int:
+    return self.db.execute("SELECT count(*) FROM notes").fetchone()[0]
+
+  def close(self):
+    self.db.close()
@@ -0,0 +1,456 @@
+# Append-only journaled storage for the note manager
+# main_v1/main_v2 rewrite the whole notes.json on every change, which is O(N) per edit and
+# leaves a half-written file if the program dies mid-write. NoteStore instead keeps:
+#   <base>.snapshot.jsonl     header line + one line of metadata per note (id, title, tags,
+#                             created_at and the offset/length of its content), replaced atomically
+#   <base>.journal.jsonl      header line with a random id + one line per change since the
+#                             snapshot, appended and fsynced
+#   <base>.content.<gen>.dat  note contents, appended one after another
+# Only the metadata is loaded at startup and a note's content is read from the content file when
+# the note is actually asked for, so opening the store does not depend on how long the notes are.
+# Every change gets a sequence number. Once the journal holds more changes than there are notes
+# it is folded into a new snapshot, so the cost per edit stays constant on average. When more
+# than half of the content file belongs to deleted notes, compaction also copies the live
+# contents into the next generation of the content file.
+# Edits keep the previous versions of a note as compressed deltas in a NoteHistory
+# (history.py), which compaction trims to the newest KEEP_REVISIONS revisions per note.
+# A torn last journal line (crash mid-append) is dropped by the next writer.
+#
+# Several processes (CLI sessions, scripts) can use the same store at once:
+#   - writers take <base>.lock only for the few appends of one change, after first applying
+#     whatever other processes appended to the journal since they last looked, so ids are never
+#     handed out twice and no change is lost
+#   - readers never lock: before answering they check the journal's id and size and apply the
+#     new entries, or reload everything when another process compacted (the journal then has a
+#     new id; inode numbers are not used for this, the file system reuses them); contents are
+#     read through a shared read-only mmap of the content file
+#   - edits say which revision they started from; if someone else saved the note in between,
+#     both edits are merged (history.merge_notes) or ConflictError is raised
+import json
+import mmap
+import os
+from datetime import datetime
+from itertools import chain
+
+from durable import FileLock, atomic_write, read_header, read_log, tail_log, truncate_log
+from history import KEEP_REVISIONS, NoteHistory, merge_notes
+
+FORMAT = 2
+MIN_COMPACT = 1000       # never compact for fewer journal entries than this
+MIN_GARBAGE = 1 << 20    # never rewrite the content file to reclaim less than this many bytes
+
+
+class ConflictError(Exception):
+  """Two sessions changed the same part of a note."""
+
+
+def normalize_note(note: dict, fallback_id: int) -> dict:
+  """Bring v1 ({'index', ...}) and v2 notes to the v3 shape."""
+  return {
+    "id": note.get("id", note.get("index", fallback_id)),
+    "title": note.get("title", ""),
+    "content": note.get("content", ""),
+    "tags": [tag for tag in note.get("tags", []) if tag],
+    "created_at": note.get("created_at", datetime.now().strftime('%Y-%m-%d %H:%M')),
+  }
+
+
+class NoteStore:
+  def __init__(self, base_path: str = 'notes', legacy_path: str | None = 'notes.json', sync: bool = True,
+               keep_revisions: int = KEEP_REVISIONS):
+    self.base_path = base_path
+    self.snapshot_path = f"{base_path}.snapshot.jsonl"
+    self.journal_path = f"{base_path}.journal.jsonl"
+    self.sync = sync
+    self.lock = FileLock(f"{base_path}.lock")
+    self.listeners = []
+    self.history = NoteHistory(base_path, sync)
+    self.keep_revisions = keep_revisions
+    self.content = None
+    self.content_map = None
+
+    with self.lock:
+      fresh = not os.path.exists(self.snapshot_path)
+      self._load()
+      if fresh and legacy_path and os.path.exists(legacy_path):
+        self._migrate(legacy_path)
+      # notes migrated from notes.json or left by a format 1 store still carry their content
+      inline = [note for note in self.notes.values() if "content" in note]
+      for note in inline:
+        self.notes[note["id"]] = self._store_content(note)
+      if fresh or inline:
+        self.compact()
+
+  @property
+  def content_path(self) -> str:
+    return f"{self.base_path}.content.{self.generation}.dat"
+
+  # --- loading ---------------------------------------------------------------------------
+
+  def _migrate(self, legacy_path: str):
+    try:
+      with open(legacy_path, 'r', encoding='utf-8') as f:
+        legacy = json.load(f)
+    except (json.JSONDecodeError, IOError):
+      legacy = []
+    for i, note in enumerate(legacy, start=1):
+      note = normalize_note(note, i)
+      self.notes[note["id"]] = note
+    self.next_id = max(self.notes, default=0) + 1
+
+  def _load(self):
+    """(Re)read the snapshot and the whole journal."""
+    if not os.path.exists(self.journal_path):
+      open(self.journal_path, 'ab').close()
+    while True:
+      # readers don't lock: if another process compacted while the snapshot was read, the
+      # journal has a new id by now and the snapshot may be the older one; read it again
+      journal_id = self._journal_id()
+      self.notes = {}   # note id -> metadata (everything but the content, plus offset and length)
+      self.seq = 0
+      self.next_id = 1
+      self.generation = 0
+      self.journal_entries = 0
+      self.journal_offset = 0
+      self._load_snapshot()
+      if self.content:
+        self.content.close()
+      self._unmap()
+      self.content = open(self.content_path, 'a+b')
+      if self._journal_id() == journal_id:
+        break
+    self.journal_id = journal_id
+    self._catch_up(notify=False)
+
+  def _journal_id(self) -> str | None:
+    with open(self.journal_path, 'rb') as journal:
+      return read_header(journal)[0].get("journal")   # None for a journal from before ids
+
+  def _load_snapshot(self):
+    if not os.path.exists(self.snapshot_path):
+      return
+    with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+      header = json.loads(f.readline())
+      if header.get("format") not in (1, FORMAT):
+        raise ValueError(f"Unsupported snapshot format in {self.snapshot_path}")
+      self.seq = header["seq"]
+      self.next_id = header["next_id"]
+      self.generation = header.get("generation", 0)
+      for line in f:
+        note = json.loads(line)
+        self.notes[note["id"]] = note
+
+  def _catch_up(self, notify: bool = True):
+    """Apply the journal entries written since we last looked, by this or any other process."""
+    with open(self.journal_path, 'rb') as journal:
+      if read_header(journal)[0].get("journal") != self.journal_id:
+        self._reload()   # another process compacted: its snapshot has everything up to now
+        return
+      if os.fstat(journal.fileno()).st_size <= self.journal_offset:
+        return
+      entries, self.journal_offset = read_log(journal, self.journal_offset)
+    for entry in entries:
+      if entry.get("seq", 0) <= self.seq:
+        continue   # the header, or already part of the snapshot (crash between snapshot and journal reset)
+      self._apply(entry)
+      self.journal_entries += 1
+      if notify and self.listeners:
+        if entry["op"] in ("add", "edit"):
+          entry = dict(entry, note=self._load_content(entry["note"]))
+        self._notify(entry)
+
+  def _reload(self):
+    """Start over from the files and tell the listeners what changed."""
+    old_notes = self.notes
+    self._load()
+    if not self.listeners:
+      return
+    for note_id in old_notes.keys() - self.notes.keys():
+      self._notify({"op": "delete", "id": note_id, "seq": self.seq})
+    for note_id, meta in self.notes.items():
+      old = old_notes.get(note_id)
+      if old is None or old.get("rev", 1) != meta.get("rev", 1):
+        self._notify({"op": "edit" if old else "add", "note": self._load_content(meta), "seq": self.seq})
+
+  def refresh(self):
+    """Pick up changes made by other processes; cheap (one stat) when there are none."""
+    self._catch_up()
+
+  def _apply(self, entry: dict):
+    self.seq = entry["seq"]
+    if entry["op"] in ("add", "edit"):
+      note = entry["note"]
+      self.notes[note["id"]] = note
+      self.next_id = max(self.next_id, note["id"] + 1)
+    elif entry["op"] == "delete":
+      self.notes.pop(entry["id"], None)
+
+  def _notify(self, entry: dict):
+    for listener in self.listeners:
+      listener(entry)
+
+  # --- content file ----------------------------------------------------------------------
+
+  def _store_content(self, note: dict) -> dict:
+    """Append a note's content to the content file and return the note's metadata."""
+    data = note["content"].encode('utf-8')
+    self.content.seek(0, os.SEEK_END)
+    meta = {key: value for key, value in note.items() if key != "content"}
+    meta["offset"] = self.content.tell()
+    meta["length"] = len(data)
+    self.content.write(data)
+    return meta
+
+  def _unmap(self):
+    if self.content_map is not None:
+      self.content_map.close()
+      self.content_map = None
+
+  def _read(self, offset: int, length: int) -> bytes:
+    if not length:
+      return b""
+    if self.content_map is None or offset + length > len(self.content_map):
+      self.content.flush()   # the file grew (here or in another process): map it again
+      self._unmap()
+      self.content_map = mmap.mmap(self.content.fileno(), 0, access=mmap.ACCESS_READ)
+    return self.content_map[offset:offset + length]
+
+  def _load_content(self, meta: dict) -> dict:
+    """The full note for a metadata entry."""
+    note = {key: value for key, value in meta.items() if key not in ("offset", "length")}
+    note["content"] = self._read(meta["offset"], meta["length"]).decode('utf-8')
+    return note
+
+  def _content_size(self) -> int:
+    self.content.seek(0, os.SEEK_END)
+    return self.content.tell()
+
+  def _rewrite_content(self) -> str:
+    """Copy the live contents into the next content file generation; returns the old path."""
+    old_path = self.content_path
+    self.generation += 1
+    with open(self.content_path, 'wb') as new_content:
+      for meta in self.notes.values():
+        data = self._read(meta["offset"], meta["length"])
+        meta["offset"] = new_content.tell()
+        new_content.write(data)
+      new_content.flush()
+      os.fsync(new_content.fileno())
+    self._unmap()
+    self.content.close()
+    self.content = open(self.content_path, 'a+b')
+    return old_path
+
+  # --- writing ---------------------------------------------------------------------------
+  # Every change runs under self.lock, after _catch_up(), so it is applied on top of the
+  # latest state and appended right after the last entry.
+
+  def _append(self, entry: dict, note: dict | None = None):
+    self.seq += 1
+    entry["seq"] = self.seq
+    self.content.flush()
+    if self.sync:
+      os.fsync(self.content.fileno())   # the content must be on disk before the entry pointing at it
+    truncate_log(self.journal_path, self.journal_offset)
+    line = (json.dumps(entry, ensure_ascii=False) + '\n').encode('utf-8')
+    with open(self.journal_path, 'ab') as journal:
+      journal.write(line)
+      journal.flush()
+      if self.sync:
+        os.fsync(journal.fileno())
+    self.journal_offset += len(line)
+    self._apply(entry)
+    self.journal_entries += 1
+    # listeners (the search index) get the full note, not the metadata
+    self._notify(dict(entry, note=note) if note is not None else entry)
+    if self.journal_entries > max(MIN_COMPACT, len(self.notes)):
+      self.compact()
+
+  def add(self, title: str, content: str, tags: list) -> dict:
+    with self.lock:
+      self._catch_up()
+      note = {
+        "id": self.next_id,
+        "title": title,
+        "content": content,
+        "tags": [tag.strip() for tag in tags if tag.strip()],
+        "created_at": datetime.now().strftime('%Y-%m-%d %H:%M'),
+        "rev": 1,
+      }
+      self._append({"op": "add", "note": self._store_content(note)}, note)
+    return note
+
+  def add_many(self, notes) -> int:
+    """Add notes (dicts with title, content, tags and maybe created_at) from any iterable as one
+    change: their contents are appended and then a single snapshot is written, so a bulk import
+    costs one compaction instead of a journal entry and fsync per note, and is all or nothing."""
+    added = 0
+    with self.lock:
+      self._catch_up()
+      seq = self.seq + 1
+      try:
+        for note in notes:
+          note = {
+            "id": self.next_id,
+            "title": note.get("title", ""),
+            "content": note.get("content", ""),
+            "tags": [tag.strip() for tag in note.get("tags", []) if tag.strip()],
+            "created_at": note.get("created_at") or datetime.now().strftime('%Y-%m-%d %H:%M'),
+            "rev": 1,
+          }
+          self.notes[note["id"]] = self._store_content(note)
+          self.next_id += 1
+          added += 1
+          self._notify({"op": "add", "note": note, "seq": seq})
+      except BaseException:
+        self._reload()   # nothing reached the snapshot: forget the partial batch
+        raise
+      if added:
+        self.seq = seq
+        self.compact()
+    return added
+
+  def edit(self, note_id: int, title: str, content: str, tags: list, base_rev: int | None = None) -> dict | None:
+    """Replace a note's title, content and tags; the old version goes to the history.
+    `base_rev` is the revision the edit started from: if the note was saved again since then
+    (by another session), the two edits are merged, or ConflictError is raised when they
+    change the same part of the note."""
+    with self.lock:
+      self._catch_up()
+      old = self.get(note_id)
+      if old is None:
+        return None
+      ours = {"title": title, "content": content, "tags": [tag.strip() for tag in tags if tag.strip()]}
+      if base_rev is not None and base_rev != old.get("rev", 1):
+        base = self.revision(note_id, base_rev)
+        ours = merge_notes(base, ours, old) if base else None
+        if ours is None:
+          raise ConflictError(f"Note {note_id} was changed in another session (now revision {old['rev']})")
+      note = dict(old, **ours, rev=old.get("rev", 1) + 1, updated_at=datetime.now().strftime('%Y-%m-%d %H:%M'))
+      self.history.record(old, note)
+      self._append({"op": "edit", "note": self._store_content(note)}, note)
+    return note
+
+  def delete(self, note_id: int) -> dict | None:
+    with self.lock:
+      self._catch_up()
+      note = self.get(note_id)
+      if note is None:
+        return None
+      self._append({"op": "delete", "id": note_id})
+    return note
+
+  def _write_snapshot(self):
+    header = json.dumps({"format": FORMAT, "seq": self.seq, "next_id": self.next_id,
+                         "generation": self.generation})
+    notes = (json.dumps(meta, ensure_ascii=False) for meta in self.notes.values())
+    atomic_write(self.snapshot_path, chain([header], notes))
+
+  def compact(self):
+    """Fold the journal into a fresh snapshot and start an empty journal."""
+    with self.lock:
+      self._catch_up()
+      size = self._content_size()
+      garbage = size - sum(meta["length"] for meta in self.notes.values())
+      old_path = None
+      if garbage > MIN_GARBAGE and garbage * 2 > size:
+        old_path = self._rewrite_content()
+      self.content.flush()
+      os.fsync(self.content.fileno())
+      if self.history.exists() and self.history.garbage(self.notes, self.keep_revisions):
+        self.history.collect(self.notes, self.keep_revisions)
+      self._write_snapshot()
+      self.journal_id = os.urandom(16).hex()
+      header = json.dumps({"journal": self.journal_id})
+      atomic_write(self.journal_path, [header])   # a new id, which tells other processes to reload
+      self.journal_offset = len(header) + 1
+      self.journal_entries = 0
+      if old_path:
+        try:
+          os.remove(old_path)   # only now does nothing refer to it any more
+        except OSError:
+          pass   # still mapped by another process on Windows; it is left behind
+    self._notify({"op": "compact", "seq": self.seq})
+
+  # --- reading ---------------------------------------------------------------------------
+
+  def snapshot_seq(self) -> int:
+    """Sequence number the snapshot on disk was written at."""
+    if not os.path.exists(self.snapshot_path):
+      return 0
+    with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+      return json.loads(f.readline())["seq"]
+
+  def entries_since(self, seq: int):
+    """Journal entries newer than `seq` (only those since the last compaction are available)."""
+    self.refresh()
+    entries, _ = tail_log(self.journal_path, 0)
+    for entry in entries:
+      if entry.get("seq", 0) <= seq or entry["seq"] > self.seq:   # no seq: the header
+        continue
+      if entry["op"] in ("add", "edit"):
+        entry["note"] = self._load_content(entry["note"])
+      yield entry
+
+  def get(self, note_id: int) -> dict | None:
+    self.refresh()
+    meta = self.notes.get(note_id)
+    return self._load_content(meta) if meta else None
+
+  def revisions(self, note_id: int) -> list:
+    """[{'rev', 'title', 'tags', 'saved_at'}, ...] oldest first, including the current version."""
+    self.refresh()
+    note = self.notes.get(note_id)
+    if note is None:
+      return []
+    revisions = self.history.list(note_id, note.get("rev", 1))
+    if not revisions:
+      return [{"rev": note.get("rev", 1), "title": note["title"], "tags": note["tags"],
+               "saved_at": note.get("updated_at", note["created_at"])}]
+    return [{key: meta[key] for key in ("rev", "title", "tags", "saved_at")} for meta in revisions]
+
+  def revision(self, note_id: int, rev: int) -> dict | None:
+    """A note as it was at revision `rev`."""
+    self.refresh()
+    note = self.notes.get(note_id)
+    if note is None or rev > note.get("rev", 1):
+      return None
+    if rev == note.get("rev", 1):
+      return dict(self.get(note_id), rev=rev, saved_at=note.get("updated_at", note["created_at"]))
+    return self.history.get(note_id, rev)
+
+  def all(self) -> list:
+    return list(self.iter_notes())
+
+  def _full_notes(self, metas: list):
+    for meta in metas:
+      if self.notes.get(meta["id"]) is not meta:
+        # changed or reloaded since the listing started: show the current version, if any
+        meta = self.notes.get(meta["id"])
+        if meta is None:
+          continue
+      yield self._load_content(meta)
+
+  def iter_notes(self, order: str = "id"):
+    """Notes in `order` ('id', 'title' or 'date'), same as SQLiteNoteStore.iter_notes.
+    Sorting only looks at the metadata; each note's content is read when it is reached."""
+    self.refresh()
+    metas = list(self.notes.values())
+    if order == "title":
+      metas.sort(key=lambda n: (n['title'].lower(), n['id']))
+    elif order == "date":
+      metas.sort(key=lambda n: (n['created_at'], n['id']), reverse=True)
+    return self._full_notes(metas)
+
+  def with_tag(self, tag: str):
+    self.refresh()
+    return self._full_notes([meta for meta in self.notes.values() if tag in meta['tags']])
+
+  def __len__(self) -> int:
+    self.refresh()
+    return len(self.notes)
+
+  def close(self):
+    self._unmap()
+    self.content.close()
+    self.history.close()
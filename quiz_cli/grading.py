@@ -0,0 +1,192 @@
+# Batch grading of answer sheets
+# run_quiz grades one student at the keyboard. grade_sheets grades a whole class from a file:
+#   CSV    student,1,2,3,...      one row per student, one letter per question (blank = skipped)
+#   JSONL  {"student": "ada", "answers": "abdc-a"}   or "answers": ["a", "b", ...]
+# Each sheet becomes a string with one letter per question ('-' for skipped). With numpy
+# (optional) a chunk of CHUNK sheets is turned into one matrix of option indexes and compared
+# with the answer key all at once; without numpy the same sums are taken sheet by sheet.
+# Scores are written out as each chunk is graded, and the per-question statistics come from
+# running sums collected in the same pass:
+#   difficulty       share of students who got the question right (p-value)
+#   discrimination   correlation between getting the question right and the score on the
+#                    rest of the quiz; near 0 or negative means the question doesn't tell
+#                    strong students from weak ones
+#
+#   python grading.py sheets.csv --key questions.json -o scores.csv --stats questions_stats.csv
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+from itertools import islice
+
+from question_bank import open_questions
+from quiz_engine import OPTION_INDEX, answer_key
+
+try:
+  import numpy as np
+except ImportError:
+  np = None
+
+CHUNK = 4096
+SKIPPED = "-"
+
+
+def load_key(path: str) -> list:
+  """Answer key (right option index per question) from questions.json/.jsonl/.py or a .qbank,
+  whose questions are numbered by id."""
+  questions = open_questions(path)
+  key = answer_key(sorted(questions, key=lambda question: question["id"]))
+  questions.close()
+  return key
+
+
+def read_sheets(path: str):
+  """(student, answers) pairs; answers is one lowercase letter (or '-') per question."""
+  if path.endswith(".csv"):
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+      rows = csv.reader(f)
+      next(rows, None)   # header
+      for row in rows:
+        if row:
+          yield row[0], "".join(cell.strip()[:1] or SKIPPED for cell in row[1:]).lower()
+  else:
+    with open(path, 'r', encoding='utf-8') as f:
+      for line in f:
+        if line.strip():
+          sheet = json.loads(line)
+          answers = sheet["answers"]
+          if not isinstance(answers, str):
+            answers = "".join((answer or SKIPPED)[:1] for answer in answers)
+          yield str(sheet["student"]), answers.lower()
+
+
+class Grader:
+  def __init__(self, key: list, use_numpy: bool = True):
+    self.key = key
+    self.use_numpy = use_numpy and np is not None
+    questions = len(key)
+    self.students = 0
+    self.score_sum = 0
+    self.score_squares = 0
+    if self.use_numpy:
+      self.key_array = np.array(key, dtype=np.int8)
+      self.lookup = np.full(256, -1, dtype=np.int8)   # byte -> option index
+      for letter, index in OPTION_INDEX.items():
+        self.lookup[ord(letter)] = index
+      self.correct = np.zeros(questions, dtype=np.int64)          # students right, per question
+      self.correct_scores = np.zeros(questions, dtype=np.int64)   # sum of their scores
+    else:
+      self.correct = [0] * questions
+      self.correct_scores = [0] * questions
+
+  def _grade_numpy(self, answers: list) -> list:
+    data = "".join(answers).encode('ascii', 'replace')
+    right = self.lookup[np.frombuffer(data, dtype=np.uint8).reshape(len(answers), len(self.key))] == self.key_array
+    scores = right.sum(axis=1, dtype=np.int64)
+    self.correct += right.sum(axis=0)
+    self.correct_scores += scores @ right
+    self.score_squares += int(scores @ scores)
+    return scores.tolist()
+
+  def _grade_python(self, answers: list) -> list:
+    scores = []
+    for sheet in answers:
+      right = [i for i, (answer, key) in enumerate(zip(sheet, self.key)) if OPTION_INDEX.get(answer) == key]
+      score = len(right)
+      for i in right:
+        self.correct[i] += 1
+        self.correct_scores[i] += score
+      self.score_squares += score * score
+      scores.append(score)
+    return scores
+
+  def grade(self, sheets):
+    """Yield (student, score) for every (student, answers) sheet, CHUNK sheets at a time."""
+    questions = len(self.key)
+    sheets = iter(sheets)
+    while True:
+      chunk = list(islice(sheets, CHUNK))
+      if not chunk:
+        return
+      answers = [sheet[:questions].ljust(questions, SKIPPED) for _, sheet in chunk]
+      scores = self._grade_numpy(answers) if self.use_numpy else self._grade_python(answers)
+      self.students += len(chunk)
+      self.score_sum += sum(scores)
+      yield from zip((student for student, _ in chunk), scores)
+
+  def question_stats(self) -> list:
+    """Difficulty and discrimination (corrected item-total correlation, None when a question
+    or the rest of the quiz has no spread) of every question."""
+    n = self.students
+    stats = []
+    for i in range(len(self.key)):
+      right, right_scores = int(self.correct[i]), int(self.correct_scores[i])
+      p = right / n if n else 0.0
+      # the score without this question: rest = score - right
+      rest_mean = (self.score_sum - right) / n if n else 0.0
+      rest_variance = (self.score_squares - 2 * right_scores + right) / n - rest_mean ** 2 if n else 0.0
+      covariance = (right_scores - right) / n - p * rest_mean if n else 0.0
+      spread = p * (1 - p) * rest_variance
+      stats.append({"question": i + 1, "difficulty": round(p, 4),
+                    "discrimination": round(covariance / math.sqrt(spread), 4) if spread > 1e-12 else None})
+    return stats
+
+  def summary(self) -> dict:
+    n = self.students
+    mean = self.score_sum / n if n else 0.0
+    sd = math.sqrt(max(self.score_squares / n - mean ** 2, 0.0)) if n else 0.0
+    return {"students": n, "questions": len(self.key), "mean": round(mean, 2), "sd": round(sd, 2)}
+
+
+def grade_sheets(sheets_path: str, key: list, scores_out, use_numpy: bool = True) -> Grader:
+  """Grade every sheet in `sheets_path`, writing student,score,percent rows to `scores_out`."""
+  grader = Grader(key, use_numpy)
+  csv_writer = csv.writer(scores_out)
+  csv_writer.writerow(["student", "score", "percent"])
+  for student, score in grader.grade(read_sheets(sheets_path)):
+    csv_writer.writerow([student, score, round(100 * score / len(key), 1) if key else 0])
+  return grader
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Grade a file of answer sheets.")
+  parser.add_argument('sheets', help="Answer sheets (.csv or .jsonl)")
+  parser.add_argument('--key', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "questions.json"),
+                      help="questions.json, .jsonl, questions.py or a .qbank (default: questions.json)")
+  parser.add_argument('-o', '--output', default="scores.csv", help="Where the scores go ('-' for the screen)")
+  parser.add_argument('--stats', help="Also write the per-question statistics to this CSV file")
+  args = parser.parse_args()
+
+  try:
+    key = load_key(args.key)
+    if args.output == "-":
+      grader = grade_sheets(args.sheets, key, sys.stdout)
+    else:
+      with open(args.output, 'w', encoding='utf-8', newline='') as f:
+        grader = grade_sheets(args.sheets, key, f)
+  except FileNotFoundError as err:
+    print(f"File not Found: {err.filename}")
+    sys.exit(1)
+  except (ValueError, KeyError, csv.Error) as err:
+    print(f"Error Found: {err}")
+    sys.exit(1)
+
+  stats = grader.question_stats()
+  summary = grader.summary()
+  print(f"\n{summary['students']} students, {summary['questions']} questions: "
+        f"mean {summary['mean']}, sd {summary['sd']}")
+  print(f"{'Q':>4}  {'difficulty':>10}  {'discrimination':>14}")
+  for row in stats:
+    discrimination = "-" if row["discrimination"] is None else f"{row['discrimination']:.2f}"
+    print(f"{row['question']:>4}  {row['difficulty']:>10.2f}  {discrimination:>14}")
+  if args.stats:
+    with open(args.stats, 'w', encoding='utf-8', newline='') as f:
+      csv_writer = csv.DictWriter(f, ["question", "difficulty", "discrimination"])
+      csv_writer.writeheader()
+      csv_writer.writerows(stats)
+
+
+if __name__ == "__main__":
+  main()
@@ -1,10 +1,45 @@
+import argparse
 import json
+import os
+import random
+from adaptive import AdaptiveQuiz, index_path
+from question_bank import DIFFICULTIES, QuestionBank, open_questions
 from quiz_engine import run_quiz
 
-json_file = r"C:\Users\USER\Desktop\VS Codes\Code_Folder\PROJECT!\quiz_cli\questions.json"
-with open(json_file, 'r', encoding='utf-8') as f:
-  questions = json.load(f)
+HERE = os.path.dirname(os.path.abspath(__file__))
+json_file = os.path.join(HERE, "questions.json")
+bank_file = os.path.join(HERE, "questions.qbank")   # built with question_bank.py; used when it exists
+
+def load_questions(count, topic=None, difficulty=None):
+  """`count` random questions, from the compiled bank if there is one, else from questions.json"""
+  if os.path.exists(bank_file):
+    bank = QuestionBank(bank_file)
+    questions = bank.sample(count, topic, difficulty)
+    bank.close()
+    return questions
+  with open(json_file, 'r', encoding='utf-8') as f:
+    questions = json.load(f)
+  return random.sample(questions, min(count, len(questions)))
+
+def adaptive_quiz(count):
+  """Pick each question from the answers so far (adaptive.py); the difficulties learnt are saved for next time"""
+  path = bank_file if os.path.exists(bank_file) else json_file
+  questions = open_questions(path)
+  quiz = AdaptiveQuiz(questions, count, index_path(path), source_path=path)
+  run_quiz(quiz, quiz.record)
+  quiz.save()
+  questions.close()
+  print(f"Estimated level: {quiz.ability:+.2f} (± {quiz.standard_error():.2f}; 0 is a medium question)")
 
 # print(questions)
 if __name__ == "__main__":
-  run_quiz(questions)
+  parser = argparse.ArgumentParser(description="Quiz")
+  parser.add_argument('-n', '--count', type=int, default=10, help="How many questions to ask")
+  parser.add_argument('--topic', help="Only ask questions of this topic (needs questions.qbank)")
+  parser.add_argument('--difficulty', choices=DIFFICULTIES, help="Only ask questions of this difficulty (needs questions.qbank)")
+  parser.add_argument('--adaptive', action='store_true', help="Pick each question by how the previous ones went")
+  args = parser.parse_args()
+  if args.adaptive:
+    adaptive_quiz(args.count)
+  else:
+    run_quiz(load_questions(args.count, args.topic, args.difficulty))
@@ -0,0 +1,263 @@
+# Compiled question bank
+# questions.json has to be parsed completely before the first question can be asked, and
+# run_quiz walks it in order. A .qbank file is built once from the JSON (or the QUESTIONS
+# list in questions.py) and read through mmap:
+#   header      magic, version, where the directory is
+#   records     one per question: id, option count, answer index, then the question and
+#               option texts, each prefixed with its length
+#   offsets     per (topic, difficulty) group, an array of 8-byte record offsets
+#   directory   small JSON: total count and each group's topic, difficulty, count and offsets
+# Sampling k questions picks k positions in the matching groups and decodes only those k
+# records, so it costs O(k) however big the bank is.
+#
+#   python question_bank.py questions.json questions.py -o questions.qbank
+#   python question_bank.py big.jsonl --topic networks --difficulty hard -o questions.qbank
+import argparse
+import json
+import mmap
+import os
+import random
+import runpy
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+
+MAGIC = b"QBANK\x00"
+VERSION = 1
+HEADER = struct.Struct("<6sBQQ")    # magic, version, directory offset, directory length
+RECORD = struct.Struct("<IBB")      # id, option count, answer index
+TEXT = struct.Struct("<H")          # length of one text
+DIFFICULTIES = ("easy", "medium", "hard")
+DEFAULT_TOPIC = "general"
+DEFAULT_DIFFICULTY = "medium"
+
+
+def encode_question(question_id: int, question: dict) -> bytes:
+  options = question["options"]
+  if question["ans"] not in options:
+    raise ValueError(f"The answer of question {question_id + 1} is not one of its options")
+  parts = [RECORD.pack(question_id, len(options), options.index(question["ans"]))]
+  for text in [question["question"], *options]:
+    data = text.encode('utf-8')
+    parts.append(TEXT.pack(len(data)))
+    parts.append(data)
+  return b"".join(parts)
+
+
+def decode_question(buffer, offset: int) -> dict:
+  question_id, option_count, answer = RECORD.unpack_from(buffer, offset)
+  offset += RECORD.size
+  texts = []
+  for _ in range(option_count + 1):
+    (length,) = TEXT.unpack_from(buffer, offset)
+    offset += TEXT.size
+    texts.append(bytes(buffer[offset:offset + length]).decode('utf-8'))
+    offset += length
+  return {"id": question_id, "question": texts[0], "options": texts[1:], "ans": texts[1 + answer],
+          "answer_index": answer}
+
+
+# --- building --------------------------------------------------------------------------------
+
+def read_questions(path: str):
+  """Questions from a .json list, a .jsonl file (one question per line) or a .py file with a
+  QUESTIONS list."""
+  if path.endswith(".py"):
+    yield from runpy.run_path(path)["QUESTIONS"]
+  elif path.endswith(".jsonl"):
+    with open(path, 'r', encoding='utf-8') as f:
+      for line in f:
+        if line.strip():
+          yield json.loads(line)
+  else:
+    with open(path, 'r', encoding='utf-8') as f:
+      yield from json.load(f)
+
+
+def build_bank(questions, bank_path: str, topic: str = DEFAULT_TOPIC, difficulty: str = DEFAULT_DIFFICULTY) -> int:
+  """Write `questions` (dicts with question, options, ans and maybe topic and difficulty) to
+  `bank_path`; returns how many were written. `topic` and `difficulty` are the defaults for
+  questions that don't say."""
+  groups = {}   # (topic, difficulty) -> array of record offsets
+  count = 0
+  tmp_path = f"{bank_path}.tmp"
+  with open(tmp_path, 'wb') as f:
+    f.write(HEADER.pack(MAGIC, VERSION, 0, 0))
+    for question in questions:
+      key = (question.get("topic") or topic, question.get("difficulty") or difficulty)
+      if key[1] not in DIFFICULTIES:
+        raise ValueError(f"Question {count + 1} has an unknown difficulty: {key[1]}")
+      groups.setdefault(key, array("Q")).append(f.tell())
+      f.write(encode_question(count, question))
+      count += 1
+    directory = {"count": count, "groups": []}
+    for (group_topic, group_difficulty), offsets in sorted(groups.items()):
+      directory["groups"].append({"topic": group_topic, "difficulty": group_difficulty,
+                                  "count": len(offsets), "offset": f.tell()})
+      f.write(offsets.tobytes())
+    data = json.dumps(directory).encode('utf-8')
+    directory_offset = f.tell()
+    f.write(data)
+    f.seek(0)
+    f.write(HEADER.pack(MAGIC, VERSION, directory_offset, len(data)))
+  os.replace(tmp_path, bank_path)
+  return count
+
+
+# --- reading ---------------------------------------------------------------------------------
+
+class QuestionBank:
+  def __init__(self, path: str):
+    self.path = path
+    with open(path, 'rb') as f:
+      self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, directory_offset, directory_length = HEADER.unpack_from(self.map, 0)
+    if magic != MAGIC or version != VERSION:
+      raise ValueError(f"{path} is not a version {VERSION} question bank")
+    directory = json.loads(self.map[directory_offset:directory_offset + directory_length])
+    self.count = directory["count"]
+    self.groups = directory["groups"]
+
+  def topics(self) -> dict:
+    """topic -> {difficulty: number of questions}"""
+    topics = {}
+    for group in self.groups:
+      topics.setdefault(group["topic"], {})[group["difficulty"]] = group["count"]
+    return topics
+
+  def _matching(self, topic: str | None, difficulty: str | None) -> list:
+    return [group for group in self.groups
+            if topic in (None, group["topic"]) and difficulty in (None, group["difficulty"])]
+
+  def _offset(self, group: dict, position: int) -> int:
+    (offset,) = struct.unpack_from("<Q", self.map, group["offset"] + 8 * position)
+    return offset
+
+  def _question(self, group: dict, position: int) -> dict:
+    return dict(self.question_at(self._offset(group, position)), topic=group["topic"], difficulty=group["difficulty"])
+
+  def question_at(self, offset: int) -> dict:
+    """The question whose record starts at `offset` (see sample_offsets)."""
+    return decode_question(self.map, offset)
+
+  def size(self, topic: str | None = None, difficulty: str | None = None) -> int:
+    return sum(group["count"] for group in self._matching(topic, difficulty))
+
+  def _picks(self, k: int, topic: str | None, difficulty: str | None, rng):
+    groups = self._matching(topic, difficulty)
+    ends = []
+    total = 0
+    for group in groups:
+      total += group["count"]
+      ends.append(total)
+    for pick in rng.sample(range(total), min(k, total)):
+      i = bisect_right(ends, pick)
+      yield groups[i], pick - (ends[i] - groups[i]["count"])
+
+  def sample(self, k: int, topic: str | None = None, difficulty: str | None = None, rng=random) -> list:
+    """k distinct random questions of `topic` and `difficulty` (None means any), or all of
+    them in random order if there are fewer than k."""
+    return [self._question(group, position) for group, position in self._picks(k, topic, difficulty, rng)]
+
+  def sample_offsets(self, k: int, topic: str | None = None, difficulty: str | None = None, rng=random) -> list:
+    """Like sample(), but only the record offsets, for callers that keep many samples around."""
+    return [self._offset(group, position) for group, position in self._picks(k, topic, difficulty, rng)]
+
+  def entries(self):
+    """(offset, id, difficulty) of every question, without decoding the texts."""
+    for group in self.groups:
+      for position in range(group["count"]):
+        offset = self._offset(group, position)
+        yield offset, RECORD.unpack_from(self.map, offset)[0], group["difficulty"]
+
+  def __iter__(self):
+    for group in self.groups:
+      for position in range(group["count"]):
+        yield self._question(group, position)
+
+  def __len__(self) -> int:
+    return self.count
+
+  def close(self):
+    self.map.close()
+
+
+class QuestionList:
+  """QuestionBank's reading interface over a list of question dicts (e.g. QUESTIONS), with
+  list positions standing in for record offsets."""
+
+  def __init__(self, questions: list):
+    self.questions = [dict(question, id=i, topic=question.get("topic") or DEFAULT_TOPIC,
+                           difficulty=question.get("difficulty") or DEFAULT_DIFFICULTY)
+                      for i, question in enumerate(questions)]
+    self.count = len(self.questions)
+
+  def topics(self) -> dict:
+    topics = {}
+    for question in self.questions:
+      counts = topics.setdefault(question["topic"], {})
+      counts[question["difficulty"]] = counts.get(question["difficulty"], 0) + 1
+    return topics
+
+  def _matching(self, topic: str | None, difficulty: str | None) -> list:
+    return [i for i, question in enumerate(self.questions)
+            if topic in (None, question["topic"]) and difficulty in (None, question["difficulty"])]
+
+  def size(self, topic: str | None = None, difficulty: str | None = None) -> int:
+    return len(self._matching(topic, difficulty))
+
+  def question_at(self, offset: int) -> dict:
+    return self.questions[offset]
+
+  def sample_offsets(self, k: int, topic: str | None = None, difficulty: str | None = None, rng=random) -> list:
+    matching = self._matching(topic, difficulty)
+    return rng.sample(matching, min(k, len(matching)))
+
+  def sample(self, k: int, topic: str | None = None, difficulty: str | None = None, rng=random) -> list:
+    return [self.questions[i] for i in self.sample_offsets(k, topic, difficulty, rng)]
+
+  def entries(self):
+    for i, question in enumerate(self.questions):
+      yield i, i, question["difficulty"]
+
+  def __iter__(self):
+    return iter(self.questions)
+
+  def __len__(self) -> int:
+    return self.count
+
+  def close(self):
+    pass
+
+
+def open_questions(path: str):
+  """A QuestionBank for a .qbank file, else a QuestionList of the questions read from `path`."""
+  if path.endswith(".qbank"):
+    return QuestionBank(path)
+  return QuestionList(list(read_questions(path)))
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Compile questions into a question bank.")
+  parser.add_argument('sources', nargs='+', help="questions.json, .jsonl files or questions.py")
+  parser.add_argument('-o', '--output', default='questions.qbank')
+  parser.add_argument('--topic', default=DEFAULT_TOPIC, help="Topic of questions that don't name one")
+  parser.add_argument('--difficulty', choices=DIFFICULTIES, default=DEFAULT_DIFFICULTY,
+                      help="Difficulty of questions that don't give one")
+  args = parser.parse_args()
+
+  questions = (question for source in args.sources for question in read_questions(source))
+  try:
+    count = build_bank(questions, args.output, args.topic, args.difficulty)
+  except FileNotFoundError as err:
+    print(f"File not Found: {err.filename}")
+    sys.exit(1)
+  except (ValueError, KeyError, struct.error) as err:
+    print(f"Error Found: {err}")
+    sys.exit(1)
+  print(f"{count} questions written to {args.output}")
+
+
+if __name__ == "__main__":
+  main()
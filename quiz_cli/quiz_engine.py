@@ -2,17 +2,27 @@ def print_options(options: list):  # if I put "-> dict" at the end of the functi
   for i, option in enumerate(options):
     print(f"\t{chr(65 + i)}. {option}")   #Refactor: stopped using the cap_alphabets variable and used a built in chr() method that makes use of the ASCII system
 
+OPTION_INDEX = {'a': 0, 'b': 1, 'c': 2, 'd': 3}   # built once, not on every answer
+
 def option_indexing(option: str) -> int | None:
-  mapping = {'a': 0, 'b': 1, 'c': 2, 'd': 3}
-  option_index = mapping.get(option)
-  return option_index   
+  return OPTION_INDEX.get(option)
+
+def answer_index(question: dict) -> int:
+  return question['answer_index'] if 'answer_index' in question else question['options'].index(question['ans'])
+
+def answer_key(QUESTIONS) -> list:
+  """Index of the right option of every question, so answers are compared as numbers instead of option texts"""
+  return [answer_index(question) for question in QUESTIONS]
 
-def run_quiz(QUESTIONS):
+def run_quiz(QUESTIONS, on_answer=None):
+  # QUESTIONS can also hand out one question at a time (adaptive.AdaptiveQuiz picks each question from the
+  # answers so far); on_answer(question, correct) is told about every answer
+  key = answer_key(QUESTIONS) if isinstance(QUESTIONS, list) else None
   all_user_ans = []
   score = 0
-  for i in range(len(QUESTIONS)):
-    print(f"{i + 1}. {QUESTIONS[i]['question']}\n")
-    print_options(QUESTIONS[i]['options'])
+  for i, question in enumerate(QUESTIONS):
+    print(f"{i + 1}. {question['question']}\n")
+    print_options(question['options'])
     print("\n")
     while True:
       user_ans = input("ANS ===> ").lower().strip()
@@ -20,9 +30,13 @@ def run_quiz(QUESTIONS):
         print("Invlid option. Select options A-D")
       else: break
     all_user_ans.append(user_ans)
-    if QUESTIONS[i]['options'][option_indexing(user_ans)] == QUESTIONS[i]['ans']:
+    correct = option_indexing(user_ans) == (key[i] if key is not None else answer_index(question))
+    if on_answer is not None:
+      on_answer(question, correct)
+    if correct:
       print("**CORRECT**")
       score += 1
     else:
       print("**WRONG**")
-  print(f"Your score is: {score}")
\ No newline at end of file
+  print(f"Your score is: {score}")
+  return all_user_ans, score
\ No newline at end of file
@@ -0,0 +1,319 @@
+# Quiz server for many students at once
+# run_quiz serves one student at the keyboard. This serves timed exams over HTTP on one asyncio
+# event loop (standard library only), with JSON in and out:
+#   POST /sessions                {"student": "ada", "count": 10, "topic": ..., "difficulty": ...,
+#                                  "time_limit": 600, "feedback": true}   -> session id + first question
+#   GET  /sessions/<id>/question  the current question (no answer in it)
+#   POST /sessions/<id>/answer    {"answer": "b", "number": 3} -> correct?, score, next question
+#   GET  /sessions/<id>           progress and score
+#   GET  /metrics                 requests, answers/s and p50/p90/p99 latency per route
+# Questions come from questions.qbank (question_bank.py) or from the QUESTIONS list and are
+# shared by all sessions; a session only keeps the offsets of its questions, their answer
+# indexes (one byte each) and the student's answers, so grading an answer is one byte compare.
+# Sessions past their deadline stop taking answers and are dropped SESSION_TTL seconds later.
+#
+#   python quiz_server.py serve --port 8765
+#   python quiz_server.py bench --students 500          # load test against a running server
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import secrets
+import sys
+import time
+from array import array
+from collections import deque
+
+from question_bank import DIFFICULTIES, QuestionList, open_questions
+from questions import QUESTIONS
+from quiz_engine import OPTION_INDEX, answer_key
+
+HOST = "127.0.0.1"
+PORT = 8765
+DEFAULT_COUNT = 10
+DEFAULT_TIME_LIMIT = 600
+MAX_TIME_LIMIT = 24 * 3600
+SESSION_TTL = 3600
+MAX_BODY = 1 << 16
+LATENCY_WINDOW = 10000   # latest requests per route kept for the percentiles
+UNANSWERED = 0xFF
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           409: "Conflict", 413: "Payload Too Large"}
+
+
+class HTTPError(Exception):
+  def __init__(self, status: int, message: str):
+    super().__init__(message)
+    self.status = status
+
+
+class Session:
+  __slots__ = ("student", "offsets", "key", "answers", "position", "score", "deadline", "feedback")
+
+  def __init__(self, student: str, offsets: list, key: list, time_limit: float, feedback: bool):
+    self.student = student
+    self.offsets = array("Q", offsets)     # where each question is in the question source
+    self.key = bytes(key)                  # right option index per question
+    self.answers = bytearray([UNANSWERED]) * len(key)
+    self.position = 0
+    self.score = 0
+    self.deadline = time.monotonic() + time_limit
+    self.feedback = feedback
+
+  @property
+  def finished(self) -> bool:
+    return self.position >= len(self.key) or time.monotonic() > self.deadline
+
+
+class Metrics:
+  def __init__(self):
+    self.started = time.monotonic()
+    self.requests = {}    # route -> count
+    self.latencies = {}   # route -> deque of the latest durations in seconds
+    self.answers = 0
+
+  def record(self, route: str, seconds: float):
+    self.requests[route] = self.requests.get(route, 0) + 1
+    self.latencies.setdefault(route, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+  def snapshot(self) -> dict:
+    uptime = time.monotonic() - self.started
+    routes = {}
+    for route, window in self.latencies.items():
+      routes[route] = dict(requests=self.requests[route], **latency_summary(window))
+    return {"uptime": round(uptime, 1), "answers": self.answers,
+            "answers_per_second": round(self.answers / uptime, 1) if uptime else 0.0, "routes": routes}
+
+
+def latency_summary(seconds) -> dict:
+  """p50/p90/p99/max of `seconds`, in milliseconds."""
+  ordered = sorted(seconds)
+  if not ordered:
+    return {}
+  pick = lambda q: round(1000 * ordered[min(int(q * len(ordered)), len(ordered) - 1)], 3)
+  return {"p50_ms": pick(0.5), "p90_ms": pick(0.9), "p99_ms": pick(0.99), "max_ms": round(1000 * ordered[-1], 3)}
+
+
+class QuizServer:
+  def __init__(self, questions):
+    self.questions = questions
+    self.sessions = {}
+    self.metrics = Metrics()
+
+  # --- API -------------------------------------------------------------------------------
+
+  def _question(self, session: Session) -> dict | None:
+    if session.finished:
+      return None
+    question = self.questions.question_at(session.offsets[session.position])
+    return {"number": session.position + 1, "of": len(session.key), "question": question["question"],
+            "options": question["options"],
+            "seconds_left": round(session.deadline - time.monotonic(), 1)}
+
+  def _status(self, session_id: str, session: Session) -> dict:
+    return {"session": session_id, "student": session.student, "answered": session.position,
+            "questions": len(session.key), "score": session.score, "finished": session.finished}
+
+  def create_session(self, request: dict) -> dict:
+    count = int(request.get("count", DEFAULT_COUNT))
+    difficulty = request.get("difficulty")
+    if difficulty not in (None, *DIFFICULTIES):
+      raise HTTPError(400, f"difficulty must be one of {', '.join(DIFFICULTIES)}")
+    time_limit = float(request.get("time_limit", DEFAULT_TIME_LIMIT))
+    if not (math.isfinite(time_limit) and 0 < time_limit <= MAX_TIME_LIMIT):
+      raise HTTPError(400, f"time_limit must be a number of seconds between 0 and {MAX_TIME_LIMIT}")
+    offsets = self.questions.sample_offsets(count, request.get("topic"), difficulty)
+    if not offsets:
+      raise HTTPError(404, "No questions match that topic and difficulty")
+    key = answer_key([self.questions.question_at(offset) for offset in offsets])
+    session = Session(str(request.get("student", "")), offsets, key, time_limit, bool(request.get("feedback", True)))
+    session_id = secrets.token_urlsafe(9)
+    self.sessions[session_id] = session
+    return dict(self._status(session_id, session), question=self._question(session))
+
+  def answer(self, session: Session, request: dict) -> dict:
+    if session.finished:
+      raise HTTPError(409, "The quiz is over")
+    if request.get("number", session.position + 1) != session.position + 1:
+      raise HTTPError(409, f"Question {session.position + 1} is the one being asked")
+    choice = OPTION_INDEX.get(str(request.get("answer", "")).strip().lower())
+    if choice is None:
+      raise HTTPError(400, "Invalid option. Select options A-D")
+    correct = session.key[session.position] == choice
+    session.answers[session.position] = choice
+    session.position += 1
+    session.score += correct
+    self.metrics.answers += 1
+    reply = {"next": self._question(session), "finished": session.finished}
+    if session.feedback or session.finished:
+      reply.update(correct=correct, score=session.score)
+    return reply
+
+  def dispatch(self, method: str, path: str, body: bytes) -> tuple:
+    """(status, reply, route name) for one request."""
+    parts = [part for part in path.split("?")[0].split("/") if part]
+    if parts == ["metrics"] and method == "GET":
+      return 200, self.metrics.snapshot(), "metrics"
+    if not parts or parts[0] != "sessions" or len(parts) > 3:
+      raise HTTPError(404, "Not found")
+    try:
+      request = json.loads(body) if body else {}
+    except json.JSONDecodeError:
+      raise HTTPError(400, "The body is not JSON")
+    if not isinstance(request, dict):
+      raise HTTPError(400, "The body must be a JSON object")
+    if len(parts) == 1:
+      if method != "POST":
+        raise HTTPError(405, "Use POST to start a quiz")
+      return 201, self.create_session(request), "create"
+    session = self.sessions.get(parts[1])
+    if session is None:
+      raise HTTPError(404, "No such session")
+    if len(parts) == 2 and method == "GET":
+      return 200, self._status(parts[1], session), "status"
+    if parts[2:] == ["question"] and method == "GET":
+      return 200, {"question": self._question(session), "finished": session.finished}, "question"
+    if parts[2:] == ["answer"] and method == "POST":
+      return 200, self.answer(session, request), "answer"
+    raise HTTPError(405, "Method not allowed")
+
+  # --- HTTP ------------------------------------------------------------------------------
+
+  async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """One keep-alive connection: requests are answered in order until the client closes."""
+    try:
+      while True:
+        request_line = await reader.readline()
+        if not request_line.strip():
+          break
+        method, path, _ = request_line.decode('latin-1').split(" ", 2)
+        headers = {}
+        while True:
+          line = await reader.readline()
+          if line in (b"\r\n", b"\n", b""):
+            break
+          name, _, value = line.decode('latin-1').partition(":")
+          headers[name.strip().lower()] = value.strip()
+
+        start = time.perf_counter()
+        body = None
+        try:
+          length = int(headers.get("content-length", 0))
+          if length > MAX_BODY:
+            raise HTTPError(413, "Request too large")
+          body = await reader.readexactly(length) if length > 0 else b""
+          status, reply, route = self.dispatch(method, path, body)
+        except (HTTPError, ValueError, TypeError) as err:
+          status, reply, route = getattr(err, "status", 400), {"error": str(err)}, "error"
+        data = json.dumps(reply).encode('utf-8')
+        writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(data)}\r\n\r\n".encode('latin-1') + data)
+        self.metrics.record(route, time.perf_counter() - start)
+        await writer.drain()
+        if body is None or headers.get("connection", "").lower() == "close":
+          break   # without reading the body the next request can't be found on this connection
+    except (ValueError, HTTPError, asyncio.IncompleteReadError, ConnectionError):
+      pass   # malformed request or the client went away: drop the connection
+    finally:
+      writer.close()
+
+  async def expire_sessions(self):
+    while True:
+      await asyncio.sleep(60)
+      cutoff = time.monotonic() - SESSION_TTL
+      for session_id in [session_id for session_id, session in self.sessions.items() if session.deadline < cutoff]:
+        del self.sessions[session_id]
+
+  async def serve(self, host: str = HOST, port: int = PORT):
+    server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+    expiry = asyncio.create_task(self.expire_sessions())
+    print(f"Quiz server on http://{host}:{port} with {len(self.questions)} questions")
+    try:
+      async with server:
+        await server.serve_forever()
+    finally:
+      expiry.cancel()
+
+
+# --- load test -------------------------------------------------------------------------------
+
+async def send(reader, writer, method: str, path: str, payload: dict | None = None) -> tuple:
+  body = json.dumps(payload).encode('utf-8') if payload is not None else b""
+  writer.write(f"{method} {path} HTTP/1.1\r\nHost: {HOST}\r\nContent-Type: application/json\r\n"
+               f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body)
+  status = int((await reader.readline()).split()[1])
+  length = 0
+  while True:
+    line = await reader.readline()
+    if line in (b"\r\n", b""):
+      break
+    if line.lower().startswith(b"content-length:"):
+      length = int(line.split(b":")[1])
+  return status, json.loads(await reader.readexactly(length))
+
+
+async def student(host: str, port: int, count: int, latencies: list) -> int:
+  """Take one quiz with random answers; returns how many answers were sent."""
+  reader, writer = await asyncio.open_connection(host, port)
+  try:
+    status, reply = await send(reader, writer, "POST", "/sessions", {"student": "bench", "count": count})
+    if status != 201:
+      raise RuntimeError(reply.get("error"))
+    path = f"/sessions/{reply['session']}/answer"
+    answered = 0
+    question = reply["question"]
+    while question:
+      start = time.perf_counter()
+      status, reply = await send(reader, writer, "POST", path, {"answer": random.choice("abcd"), "number": question["number"]})
+      latencies.append(time.perf_counter() - start)
+      answered += 1
+      question = reply.get("next")
+    return answered
+  finally:
+    writer.close()
+
+
+async def bench(host: str, port: int, students: int, count: int):
+  latencies = []
+  start = time.perf_counter()
+  answers = sum(await asyncio.gather(*(student(host, port, count, latencies) for _ in range(students))))
+  elapsed = time.perf_counter() - start
+  print(f"{students} students sent {answers} answers in {elapsed:.2f} s: {answers / elapsed:.0f} answers/s")
+  print("round trip:", ", ".join(f"{name} {value}" for name, value in latency_summary(latencies).items()))
+
+
+def main():
+  default_bank = os.path.join(os.path.dirname(os.path.abspath(__file__)), "questions.qbank")
+  parser = argparse.ArgumentParser(description="Quiz server for many students at once.")
+  parser.add_argument('command', choices=['serve', 'bench'])
+  parser.add_argument('--host', default=HOST)
+  parser.add_argument('--port', type=int, default=PORT)
+  parser.add_argument('--questions', default=default_bank,
+                      help="A .qbank, .json, .jsonl or .py file (default: questions.qbank, else QUESTIONS)")
+  parser.add_argument('--students', type=int, default=200, help="bench: simultaneous students")
+  parser.add_argument('--count', type=int, default=DEFAULT_COUNT, help="bench: questions per student")
+  args = parser.parse_args()
+
+  try:
+    if args.command == 'bench':
+      asyncio.run(bench(args.host, args.port, args.students, args.count))
+      return
+    if args.questions != default_bank or os.path.exists(default_bank):
+      questions = open_questions(args.questions)
+    else:
+      questions = QuestionList(QUESTIONS)
+    asyncio.run(QuizServer(questions).serve(args.host, args.port))
+  except FileNotFoundError as err:
+    print(f"File not Found: {err.filename}")
+    sys.exit(1)
+  except (ConnectionError, RuntimeError, ValueError) as err:
+    print(f"Error Found: {err}")
+    sys.exit(1)
+  except KeyboardInterrupt:
+    print('\nServer stopped')
+
+
+if __name__ == "__main__":
+  main()
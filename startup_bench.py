@@ -0,0 +1,138 @@
+# startup_bench.py
+# Cold-start cost of every command line tool in this repository.
+# Each entry point is started with `python -X importtime <script> --help` from its own folder,
+# which imports everything the script loads before it gets to work and then stops at argument
+# parsing. For every entry point the report shows:
+#   wall      time from starting the process to its exit (the fastest of --runs)
+#   imports   cumulative import time of the modules the script loads itself, leaving out the
+#             ones a bare `python -c pass` loads anyway (the fastest of --runs as well, since
+#             the slower runs mostly measure whatever else the machine was doing)
+#   modules   how many modules that is
+#   heaviest  the most expensive of those imports, to know where to look
+# Heavy modules (numpy, requests, asyncio, sqlite3, ...) should only be imported by the
+# subcommand that uses them; this catches a top-level import that creeps back in.
+#
+#   python startup_bench.py
+#   python startup_bench.py --json startup.json                # keep the numbers
+#   python startup_bench.py --baseline startup.json            # exits 1 if a tool got slower
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ENTRY_POINTS = [
+    ("csv_data_analyzer", "main_v6.py"),
+    ("csv_data_analyzer", "report.py"),
+    ("file_organizer", "main_ai.py"),
+    ("note_manager", "main_v3.py"),
+    ("note_manager", "bulk.py"),
+    ("quiz_cli", "main.py"),
+    ("quiz_cli", "question_bank.py"),
+    ("quiz_cli", "grading.py"),
+    ("quiz_cli", "quiz_server.py"),
+    ("weather_cli", "terrible_code.py"),
+    ("weather_cli", "gazetteer.py"),
+    ("weather_cli", "timeseries.py"),
+]
+SLOWER = 1.25      # an entry point regresses when its imports take this much longer...
+SLACK_MS = 5.0     # ...and at least this many milliseconds more than in the baseline
+
+
+def parse_importtime(stderr: str) -> list:
+    """(module, cumulative µs) for the top-level imports in `-X importtime` output; nested
+    imports are already counted in their parent's cumulative time."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name[1:].startswith(" "):   # nested imports are indented under their parent
+            imports.append((name.strip(), int(cumulative)))
+    return imports
+
+
+def run(folder: str, args: list) -> tuple:
+    """(wall seconds, top-level imports) of one run of python -X importtime with `args`."""
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, "-X", "importtime", *args], cwd=folder,
+                             stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                             stderr=subprocess.PIPE, text=True)
+    return time.perf_counter() - start, parse_importtime(process.stderr)
+
+
+def measure(folder: str, args: list, runs: int, interpreter: set) -> dict:
+    walls, totals = [], []
+    imports = []
+    for _ in range(runs):
+        wall, imports = run(folder, args)
+        imports = [(name, micros) for name, micros in imports if name not in interpreter]
+        walls.append(wall)
+        totals.append(sum(micros for _, micros in imports))
+    heaviest = sorted(imports, key=lambda item: -item[1])[:3]
+    return {
+        "wall_ms": round(1000 * min(walls), 1),
+        "imports_ms": round(min(totals) / 1000, 1),
+        "modules": len(imports),
+        "heaviest": [f"{name} {micros / 1000:.0f}ms" for name, micros in heaviest],
+    }
+
+
+def compare(results: dict, baseline: dict) -> list:
+    """Entry points whose imports got noticeably slower than in `baseline`."""
+    slower = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before and result["imports_ms"] > max(before["imports_ms"] * SLOWER, before["imports_ms"] + SLACK_MS):
+            slower.append(f"{name}: imports {before['imports_ms']} ms -> {result['imports_ms']} ms")
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start time of the command line tools")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per entry point (default: 5)")
+    parser.add_argument("--only", help="Only entry points whose folder/script contains this text")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--baseline", help="Results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    _, bare = run(HERE, ["-c", "pass"])
+    interpreter = {name for name, _ in bare}
+    bare_wall = min(run(HERE, ["-c", "pass"])[0] for _ in range(args.runs))
+    print(f"Interpreter alone: {1000 * bare_wall:.1f} ms\n")
+    print(f"{'entry point':34} {'wall ms':>8} {'imports ms':>11} {'modules':>8}  heaviest")
+
+    results = {}
+    for folder, script in ENTRY_POINTS:
+        name = f"{folder}/{script}"
+        if args.only and args.only not in name:
+            continue
+        result = measure(os.path.join(HERE, folder), [script, "--help"], args.runs, interpreter)
+        results[name] = result
+        print(f"{name:34} {result['wall_ms']:8.1f} {result['imports_ms']:11.1f} {result['modules']:8}  "
+              f"{', '.join(result['heaviest'])}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "interpreter_ms": round(1000 * bare_wall, 1),
+                       "entry_points": results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+    if args.baseline:
+        try:
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f)["entry_points"]
+        except FileNotFoundError:
+            print(f"File not found: {args.baseline}")
+            sys.exit(1)
+        slower = compare(results, baseline)
+        for line in slower:
+            print(f"Slower: {line}")
+        if slower:
+            sys.exit(1)
+        print("\nNo entry point got slower")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+# textmatch.py
+# Typo-tolerant matching shared by the tools: note_manager's FuzzyIndex (note titles and tags)
+# and weather_cli's Gazetteer (city names) both find candidates by shared trigrams and then
+# keep those within a small edit distance. The tools are plain script folders; the ones using
+# this module add the repository folder to sys.path before importing it.
+
+
+def max_edits(text: str) -> int:
+    """Edits allowed for a query word: none for 1-2 characters, one up to 5, else two."""
+    return 0 if len(text) <= 2 else 1 if len(text) <= 5 else 2
+
+
+def trigrams(text: str, prefix: bool = False) -> set:
+    """Trigrams of the padded text ("  py", " pyt", ...); with `prefix` the end isn't padded,
+    so a word still being typed shares its trigrams with the words it starts."""
+    padded = f"  {text}" if prefix else f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(word: str, other: str, limit: int, prefix: bool = False) -> int:
+    """Edit distance (insert, delete, substitute, swap neighbours) from `word` to `other`, or to
+    the closest prefix of `other` if `prefix`; anything over `limit` comes back as limit + 1."""
+    if not prefix and abs(len(word) - len(other)) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(other) + 1))
+    for i, a in enumerate(word, start=1):
+        current = [i] + [0] * len(other)
+        for j, b in enumerate(other, start=1):
+            distance = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a != b))
+            if i > 1 and j > 1 and a == other[j - 2] and word[i - 2] == b:
+                distance = min(distance, before[j - 2] + 1)
+            current[j] = distance
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return min(min(previous) if prefix else previous[-1], limit + 1)
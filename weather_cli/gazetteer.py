@@ -0,0 +1,229 @@
+# gazetteer.py
+# Offline city lookup: name -> country, lat/lon, population, without a geocoding request.
+# cities.csv (bundled, name,country,lat,lon,population) or a GeoNames dump such as
+# cities15000.txt is compiled into cities.gaz in the user's cache folder (utils.cache_dir),
+# which is read through mmap:
+#   header     magic, counts and where each section starts
+#   entries    one fixed-size record per city, sorted by normalized name (see utils.normalize)
+#   grams      sorted trigram table: trigram, where its postings start, how many there are
+#   postings   entry numbers, per trigram
+#   strings    the normalized names and the names as written
+# Exact and prefix lookups are binary searches over the entries; fuzzy lookups gather the
+# cities sharing enough trigrams with the query and keep those within a small edit distance.
+# cities.gaz is rebuilt automatically when cities.csv is newer.
+#
+#   python gazetteer.py build cities15000.txt        # the full GeoNames list instead of cities.csv
+#   python gazetteer.py lookup "sao paolo"
+import argparse
+import csv
+import mmap
+import os
+import struct
+import sys
+from collections import Counter, namedtuple
+from pathlib import Path
+
+from utils import cache_dir, normalize
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # textmatch.py is shared by the tools
+from textmatch import edit_distance, max_edits, trigrams
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CITIES_FILE = os.path.join(HERE, "cities.csv")
+GAZETTEER_FILE = os.path.join(cache_dir(), "cities.gaz")
+
+MAGIC = b"CITY\x00\x01"
+HEADER = struct.Struct("<6sIIIIII")     # magic, cities, entries, grams count, grams, postings, strings
+ENTRY = struct.Struct("<IHIH2sffI")     # key offset/length, name offset/length, country, lat, lon, population
+GRAM = struct.Struct("<12sII")          # trigram (utf-8, zero padded), first posting, posting count
+POSTING = struct.Struct("<I")
+PREFIX_SCAN = 5000                      # most entries a prefix lookup looks at
+
+City = namedtuple("City", ["name", "country", "lat", "lon", "population"])
+
+
+# --- building --------------------------------------------------------------------------------
+
+def read_cities(path: str):
+    """City tuples from our CSV layout or a tab-separated GeoNames dump."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.endswith(".csv"):
+            for row in csv.DictReader(f):
+                yield City(row["name"], row["country"], float(row["lat"]), float(row["lon"]), int(row["population"] or 0))
+        else:
+            for line in f:
+                fields = line.rstrip("\n").split("\t")
+                yield City(fields[1], fields[8], float(fields[4]), float(fields[5]), int(fields[14] or 0))
+
+
+def build_gazetteer(cities, path: str = GAZETTEER_FILE) -> int:
+    cities = sorted(((normalize(city.name).encode("utf-8"), -city.population, city) for city in cities),
+                    key=lambda item: item[:2])
+    strings = bytearray()
+    entries = bytearray()
+    postings = {}
+    for number, (key, _, city) in enumerate(cities):
+        name = city.name.encode("utf-8")
+        entries += ENTRY.pack(len(strings), len(key), len(strings) + len(key), len(name),
+                              city.country.encode("ascii", "replace")[:2], city.lat, city.lon, city.population)
+        strings += key + name
+        for gram in trigrams(key.decode("utf-8")):
+            postings.setdefault(gram.encode("utf-8"), []).append(number)
+    grams = bytearray()
+    posting_data = bytearray()
+    for gram in sorted(postings):
+        grams += GRAM.pack(gram, len(posting_data) // POSTING.size, len(postings[gram]))
+        posting_data += struct.pack(f"<{len(postings[gram])}I", *postings[gram])
+    entries_at = HEADER.size
+    grams_at = entries_at + len(entries)
+    postings_at = grams_at + len(grams)
+    strings_at = postings_at + len(posting_data)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(cities), entries_at, len(postings), grams_at, postings_at, strings_at))
+        for section in (entries, grams, posting_data, strings):
+            f.write(section)
+    os.replace(tmp_path, path)
+    return len(cities)
+
+
+# --- reading ---------------------------------------------------------------------------------
+
+class Gazetteer:
+    def __init__(self, path: str = GAZETTEER_FILE, source: str | None = CITIES_FILE):
+        if source and os.path.exists(source) and (not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(source)):
+            build_gazetteer(read_cities(source), path)
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.count, self.entries_at, self.gram_count,
+         self.grams_at, self.postings_at, self.strings_at) = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a city index")
+
+    def _key(self, number: int) -> bytes:
+        key_at, key_length = ENTRY.unpack_from(self.map, self.entries_at + number * ENTRY.size)[:2]
+        start = self.strings_at + key_at
+        return self.map[start:start + key_length]
+
+    def city(self, number: int) -> City:
+        _, _, name_at, name_length, country, lat, lon, population = ENTRY.unpack_from(self.map, self.entries_at + number * ENTRY.size)
+        start = self.strings_at + name_at
+        return City(self.map[start:start + name_length].decode("utf-8"), country.decode("ascii"),
+                    round(lat, 4), round(lon, 4), population)
+
+    def _first(self, key: bytes) -> int:
+        """Number of the first entry whose key is >= `key`."""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def exact(self, name: str, country: str | None = None) -> list:
+        """Cities called `name` (in `country`), most populous first."""
+        key = normalize(name).encode("utf-8")
+        cities = []
+        number = self._first(key)
+        while number < self.count and self._key(number) == key:
+            city = self.city(number)
+            if country is None or city.country == country.upper():
+                cities.append(city)
+            number += 1
+        return cities
+
+    def prefix(self, text: str, limit: int = 10) -> list:
+        """The most populous cities whose names start with `text`."""
+        key = normalize(text).encode("utf-8")
+        number = self._first(key)
+        end = min(number + PREFIX_SCAN, self.count)
+        cities = []
+        while number < end and self._key(number).startswith(key):
+            cities.append(self.city(number))
+            number += 1
+        return sorted(cities, key=lambda city: -city.population)[:limit]
+
+    def _postings(self, gram: str) -> tuple:
+        data = gram.encode("utf-8")
+        low, high = 0, self.gram_count
+        while low < high:
+            middle = (low + high) // 2
+            if GRAM.unpack_from(self.map, self.grams_at + middle * GRAM.size)[0].rstrip(b"\0") < data:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self.gram_count:
+            return ()
+        found, first, count = GRAM.unpack_from(self.map, self.grams_at + low * GRAM.size)
+        if found.rstrip(b"\0") != data:
+            return ()
+        start = self.postings_at + first * POSTING.size
+        return struct.unpack_from(f"<{count}I", self.map, start)
+
+    def fuzzy(self, text: str, limit: int = 5) -> list:
+        """(edit distance, City) for the closest names to `text`, closest and most populous first."""
+        key = normalize(text)
+        most = max_edits(key)
+        grams = trigrams(key)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._postings(gram))
+        needed = max(len(grams) - 4 * most, 1)   # one edit changes at most 3 trigrams, a swap 4
+        matches = []
+        for number, count in shared.items():
+            if count >= needed:
+                distance = edit_distance(key, self._key(number).decode("utf-8"), most)
+                if distance <= most:
+                    city = self.city(number)
+                    matches.append((distance, -city.population, city))
+        matches.sort()
+        return [(distance, city) for distance, _, city in matches[:limit]]
+
+    def resolve(self, query: str) -> City | None:
+        """The city meant by "name" or "name, CC": an exact match if there is one (the most
+        populous), otherwise the closest spelling."""
+        name, _, country = query.partition(",")
+        country = country.strip() or None
+        cities = self.exact(name, country)
+        if cities:
+            return cities[0]
+        for _, city in self.fuzzy(name, limit=20):
+            if country is None or city.country == country.upper():
+                return city
+        return None
+
+    def close(self):
+        self.map.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline city index")
+    parser.add_argument("command", choices=["build", "lookup"])
+    parser.add_argument("value", help="build: cities CSV or GeoNames dump; lookup: a city name")
+    parser.add_argument("-o", "--output", default=GAZETTEER_FILE)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        try:
+            count = build_gazetteer(read_cities(args.value), args.output)
+        except FileNotFoundError:
+            print(f"File not found: {args.value}")
+            sys.exit(1)
+        except (ValueError, KeyError, IndexError) as err:
+            print(f"Could not read {args.value}: {err}")
+            sys.exit(1)
+        print(f"{count} cities written to {args.output}")
+        return
+
+    gazetteer = Gazetteer(args.output, source=CITIES_FILE if args.output == GAZETTEER_FILE else None)
+    city = gazetteer.resolve(args.value)
+    print(city if city else f"No city like {args.value}")
+    for other in gazetteer.prefix(args.value):
+        print(f"  {other.name}, {other.country} ({other.lat}, {other.lon})")
+
+
+if __name__ == "__main__":
+    main()
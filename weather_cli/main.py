@@ -1,7 +1,14 @@
+from urllib.parse import quote
+
 import requests
 
+from gazetteer import Gazetteer
+
 city = input("What is your city: ")
-url = f"https://goweather.herokuapp.com/weather/{city}"
+place = Gazetteer().resolve(city)   # fixes typos offline before anything is sent
+if place:
+    city = place.name
+url = f"https://goweather.herokuapp.com/weather/{quote(city)}"
 
 print("Getting weather...")
 data = requests.get(url).json()
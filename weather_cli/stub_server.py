@@ -0,0 +1,83 @@
+# stub_server.py
+# A local stand-in for the OpenWeatherMap current-weather endpoint, for trying weather_api.py
+# without network access or an API key:
+#   python stub_server.py --port 8081 --delay 0.2
+#   WeatherClient(base_url="http://127.0.0.1:8081/data/2.5/weather")
+# Every city is known except those in UNKNOWN_CITIES; temperatures are made up from the name.
+# It counts the requests it serves, which makes it easy to see what the cache saved, and can
+# fail a share of them with 503 (--fail-rate) to exercise retries.
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+UNKNOWN_CITIES = {"atlantis", "nowhere"}
+CONDITIONS = ["clear sky", "few clouds", "light rain", "overcast clouds", "thunderstorm"]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, like the real API
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.server.requests += 1
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        if random.random() < self.server.fail_rate:
+            self.reply(503, {"cod": "503", "message": "try again later"})
+            return
+        query = parse_qs(urlparse(self.path).query)
+        city = query.get("q", [""])[0]
+        if not city and "lat" in query:
+            city = f"station {float(query['lat'][0]):.1f},{float(query.get('lon', ['0'])[0]):.1f}"
+        if not city or city.strip().lower() in UNKNOWN_CITIES:
+            self.reply(404, {"cod": "404", "message": "city not found"})
+            return
+        seed = zlib.crc32(city.strip().lower().encode("utf-8"))
+        self.reply(200, {"name": city.strip().title(), "main": {"temp": round(seed % 400 / 10 - 5, 1)},
+                         "weather": [{"description": CONDITIONS[seed % len(CONDITIONS)]}],
+                         "dt": int(time.time())})
+
+    def reply(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(port=0, delay=0.0, fail_rate=0.0) -> ThreadingHTTPServer:
+    """Run the stub in a background thread; its URL is f"http://127.0.0.1:{server.server_port}/data/2.5/weather"."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.delay = delay
+    server.fail_rate = fail_rate
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenWeatherMap API")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds to wait before each answer")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    args = parser.parse_args()
+    server = start_stub(args.port, args.delay, args.fail_rate)
+    print(f"Stub weather API on http://127.0.0.1:{server.server_port}/data/2.5/weather")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
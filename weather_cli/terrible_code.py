@@ -1,45 +1,97 @@
 # weather_cli_v1.py
+# python terrible_code.py --cities-file cities.txt   looks up every city in the file (one per line) at once
+import argparse
+import time
+
 import requests
 
-API_KEY = "a5c4587eb7d0fea4393168e756d914d3"
-BASE_URL = "https://api.openweathermap.org/data/2.5/weather"
+from gazetteer import Gazetteer
+from utils import normalize
+from weather_api import BASE_URL, BURST, POOL_SIZE, RATE, WeatherClient, default_client, fetch_many, summarize
+
+_gazetteer = None
 
-def fetch_weather(city: str):
-    params = {
-        "q": city,
-        "appid": API_KEY,
-        "units": "metric"  # Celsius
-    }
 
-    response = requests.get(BASE_URL, params=params, timeout=10)
-    response.raise_for_status()
-    data = response.json()
+def resolve(city: str):
+    """(name to show, place to ask the API for): the offline gazetteer fixes typos and gives
+    coordinates; names it doesn't know are passed on to the API as typed."""
+    global _gazetteer
+    if _gazetteer is None:
+        _gazetteer = Gazetteer()
+    place = _gazetteer.resolve(city)
+    if place is None:
+        return city, city
+    return place.name, (place.lat, place.lon)
 
-    temperature = data["main"]["temp"]  #cuurent was "main"
-    condition = data["weather"][0]["description"]
-    city_name = data["name"]
 
-    return city_name, temperature, condition
+def fetch_weather(city: str, client: WeatherClient | None = None):
+    # goes through a cached client (weather_api.py) instead of a new request every time
+    city_name, place = resolve(city)
+    weather = (client or default_client()).get(place, units="metric")  # Celsius
+    return city_name, weather.temperature, weather.condition
 
 
 def pretty_print(city, temp, condition):
     print(f"Weather for {city}: {temp}°C — {condition.capitalize()}")
 
 
+async def print_many(cities, client, concurrency, rate):
+    """Print each city's weather as soon as it arrives, then the totals."""
+    names = {}
+    for city in cities:
+        name, place = resolve(city)
+        names[place] = name
+    results = []
+    start = time.perf_counter()
+    async for result in fetch_many(names, client, concurrency=concurrency, rate=rate, burst=max(BURST, concurrency)):
+        results.append(result)
+        if result.error is None:
+            pretty_print(names[result.query], result.weather.temperature, result.weather.condition)
+        else:
+            print(f"{names[result.query]}: {result.error}")
+    totals = summarize(results, time.perf_counter() - start)
+    print(f"\n{totals['ok']} of {totals['cities']} cities in {totals['elapsed']} s ({totals['per_second']}/s, "
+          f"{totals['requests']} requests), latency p50 {totals['p50_ms']} ms, p99 {totals['p99_ms']} ms")
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Current weather by city")
+    parser.add_argument("--cities-file", help="Look up every city in this file (one per line) concurrently")
+    parser.add_argument("--concurrency", type=int, default=POOL_SIZE, help="Lookups in flight at once")
+    parser.add_argument("--rate", type=float, default=RATE, help="Requests per second the API allows")
+    parser.add_argument("--base-url", default=BASE_URL, help="Weather API address (e.g. a local stub_server.py)")
+    args = parser.parse_args()
+
+    if args.cities_file:
+        try:
+            with open(args.cities_file, "r", encoding="utf-8") as f:
+                cities = [line.strip() for line in f if line.strip()]
+        except FileNotFoundError:
+            print(f"File not found: {args.cities_file}")
+            return
+        import asyncio   # only the many-cities mode runs an event loop
+        client = WeatherClient(base_url=args.base_url, pool_size=args.concurrency)
+        asyncio.run(print_many(cities, client, args.concurrency, args.rate))
+        return
+
     city_input = input("Enter city name: ").strip()
 
     if not city_input:
         print("City name cannot be empty.")
         return
 
+    client = WeatherClient(base_url=args.base_url)
     try:
-        city, temp, condition = fetch_weather(city_input)
+        city, temp, condition = fetch_weather(city_input, client)
+        if normalize(city) != normalize(city_input):
+            print(f"(showing {city})")
         pretty_print(city, temp, condition)
     except requests.exceptions.HTTPError:
         print("City not found or invalid API key.")
     except requests.exceptions.RequestException as e:
         print("Network error:", e)
+    finally:
+        client.close()
 
 
 if __name__ == "__main__":
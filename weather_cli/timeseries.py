@@ -0,0 +1,427 @@
+# timeseries.py
+# Weather history: poll some cities on a schedule and keep every reading, compactly.
+# Each city is a series of (time, temperature, condition) readings kept in a folder:
+#   <city>.head     the latest readings (fewer than BLOCK_SIZE), as fixed 12-byte records
+#   <city>.blocks   a header holding the offset of its first block, then sealed blocks of
+#                   BLOCK_SIZE readings, stored by column: times and temperatures (in 1/100
+#                   degrees) as zigzag varint deltas, conditions as (code, run length) pairs,
+#                   then zlib; a block of 10-minute readings takes about 2 bytes a reading
+#   <city>.idx      per block: first and last time, offset, length, number of readings
+#   <city>.hour     hourly rollups: bucket start, count, min, max, sum, last condition
+#   <city>.day      the same per day
+#   conditions.json condition texts, numbered in the order they were first seen
+# Rollups are updated with every reading (the newest bucket is rewritten in place), so they
+# are always current. Range queries bisect the block index (or the fixed-size rollup records)
+# and only decode what overlaps the range. Raw readings older than RAW_DAYS and hourly rollups
+# older than HOUR_DAYS are dropped when a block is sealed; daily rollups are kept for good.
+# Block offsets count from the first block ever written, so dropping old blocks rewrites
+# .blocks with a new base offset and leaves the kept index entries as they are; if the index
+# isn't trimmed afterwards (a crash), entries below the base are ignored on the next load.
+# Buckets are UTC hours and days, and `show` prints every time in UTC.
+# One process writes a folder at a time (the poller); any number can read. The poller stores
+# each reading at the time the provider observed it (the API's "dt"), not when it asked, and
+# an observation it already has is skipped.
+#
+# The folder defaults to history/ in the user's data folder (utils.data_dir).
+#
+#   python timeseries.py poll --cities-file cities.txt --every 600
+#   python timeseries.py show Lagos --days 7 --resolution hour
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+
+from utils import data_dir, normalize
+
+HISTORY_DIR = os.path.join(data_dir(), "history")
+BLOCK_SIZE = 1024
+RAW_DAYS = 35
+HOUR_DAYS = 2 * 366
+RESOLUTIONS = {"hour": 3600, "day": 86400}
+
+READING = struct.Struct("<qhH")          # time, temperature (1/100 degree), condition code
+INDEX = struct.Struct("<qqQII")          # first time, last time, offset, length, readings
+ROLLUP = struct.Struct("<qIhhqH")        # bucket start, count, min, max, sum, last condition
+BLOCKS_HEADER = struct.Struct("<4s4xQ")  # magic, offset of the first block in the file
+BLOCKS_MAGIC = b"WXB1"
+
+
+def zigzag_varints(values) -> bytearray:
+    """Deltas between consecutive values, zigzag-mapped to unsigned and written as varints."""
+    out = bytearray()
+    previous = 0
+    for value in values:
+        delta = value - previous
+        previous = value
+        number = (delta << 1) ^ (delta >> 63)
+        while number >= 0x80:
+            out.append((number & 0x7F) | 0x80)
+            number >>= 7
+        out.append(number)
+    return out
+
+
+def read_varints(data, count: int, position: int = 0) -> tuple:
+    """(values, position after them) for `count` zigzag varint deltas starting at `position`."""
+    values = []
+    previous = 0
+    for _ in range(count):
+        number = shift = 0
+        while True:
+            byte = data[position]
+            position += 1
+            number |= (byte & 0x7F) << shift
+            shift += 7
+            if byte < 0x80:
+                break
+        previous += (number >> 1) ^ -(number & 1)
+        values.append(previous)
+    return values, position
+
+
+def encode_block(times, temperatures, conditions) -> bytes:
+    codes, lengths = [], []
+    for code in conditions:
+        if codes and codes[-1] == code:
+            lengths[-1] += 1
+        else:
+            codes.append(code)
+            lengths.append(1)
+    data = struct.pack("<II", len(times), len(codes))
+    data += zigzag_varints(times) + zigzag_varints(temperatures) + zigzag_varints(codes) + zigzag_varints(lengths)
+    return zlib.compress(bytes(data), 9)
+
+
+def decode_block(blob: bytes) -> list:
+    data = zlib.decompress(blob)
+    count, run_count = struct.unpack_from("<II", data)
+    times, position = read_varints(data, count, 8)
+    temperatures, position = read_varints(data, count, position)
+    codes, position = read_varints(data, run_count, position)
+    lengths, _ = read_varints(data, run_count, position)
+    conditions = []
+    for code, length in zip(codes, lengths):
+        conditions.extend([code] * length)
+    return list(zip(times, temperatures, conditions))
+
+
+class Series:
+    """One city's readings and rollups (see the module comment for the files)."""
+
+    def __init__(self, folder: str, name: str):
+        self.path = os.path.join(folder, name)
+        self.head = []
+        if os.path.exists(self.path + ".head"):
+            with open(self.path + ".head", "rb") as f:
+                data = f.read()
+            usable = len(data) - len(data) % READING.size   # ignore a torn last record
+            self.head = [READING.unpack_from(data, i) for i in range(0, usable, READING.size)]
+        self.base, self.skew = self._read_base()   # file position = offset + skew
+        self.firsts, self.lasts, self.offsets = array("q"), array("q"), array("Q")
+        self.lengths, self.counts = array("I"), array("I")
+        if os.path.exists(self.path + ".idx"):
+            with open(self.path + ".idx", "rb") as f:
+                data = f.read()
+            for i in range(0, len(data) - len(data) % INDEX.size, INDEX.size):
+                first, last, offset, length, count = INDEX.unpack_from(data, i)
+                if offset < self.base:
+                    continue   # expired, the index wasn't trimmed before a crash
+                self.firsts.append(first)
+                self.lasts.append(last)
+                self.offsets.append(offset)
+                self.lengths.append(length)
+                self.counts.append(count)
+        if self.head and self.lasts and self.head[0][0] <= self.lasts[-1]:
+            # sealing was interrupted after the block was written: it already holds these
+            self.head = [reading for reading in self.head if reading[0] > self.lasts[-1]]
+            self._replace(".head", b"".join(READING.pack(*reading) for reading in self.head))
+        self.buckets = {resolution: self._last_rollup(resolution) for resolution in RESOLUTIONS}
+
+    def _read_base(self) -> tuple:
+        """(offset of the first block in .blocks, what to add to an offset to get its position)."""
+        try:
+            with open(self.path + ".blocks", "rb") as f:
+                header = f.read(BLOCKS_HEADER.size)
+        except FileNotFoundError:
+            return 0, BLOCKS_HEADER.size
+        if len(header) == BLOCKS_HEADER.size and header[:4] == BLOCKS_MAGIC:
+            base = BLOCKS_HEADER.unpack(header)[1]
+            return base, BLOCKS_HEADER.size - base
+        return 0, 0   # written before the header existed: offsets are positions
+
+    def last_time(self) -> int | None:
+        if self.head:
+            return self.head[-1][0]
+        return self.lasts[-1] if self.lasts else None
+
+    # --- writing ---------------------------------------------------------------------------
+
+    def append(self, timestamp: int, temperature: int, condition: int):
+        last = self.last_time()
+        if last is not None and timestamp < last:
+            raise ValueError(f"Readings must be appended in time order ({timestamp} < {last})")
+        reading = (timestamp, temperature, condition)
+        with open(self.path + ".head", "ab") as f:
+            f.write(READING.pack(*reading))
+        self.head.append(reading)
+        for resolution in RESOLUTIONS:
+            self._roll_up(resolution, reading)
+        if len(self.head) >= BLOCK_SIZE:
+            self.seal()
+
+    def seal(self):
+        """Move the head readings into a compressed block."""
+        if not self.head:
+            return
+        times, temperatures, conditions = zip(*self.head)
+        blob = encode_block(times, temperatures, conditions)
+        with open(self.path + ".blocks", "ab") as f:
+            if f.tell() == 0:
+                f.write(BLOCKS_HEADER.pack(BLOCKS_MAGIC, self.base))
+                self.skew = BLOCKS_HEADER.size - self.base
+            offset = f.tell() - self.skew
+            f.write(blob)
+        with open(self.path + ".idx", "ab") as f:
+            f.write(INDEX.pack(times[0], times[-1], offset, len(blob), len(times)))
+        self.firsts.append(times[0])
+        self.lasts.append(times[-1])
+        self.offsets.append(offset)
+        self.lengths.append(len(blob))
+        self.counts.append(len(times))
+        self.head = []
+        open(self.path + ".head", "wb").close()   # only once the block and its index entry are written
+        self.expire(times[-1])
+
+    def _last_rollup(self, resolution: str) -> list | None:
+        path = f"{self.path}.{resolution}"
+        if not os.path.exists(path) or os.path.getsize(path) < ROLLUP.size:
+            return None
+        with open(path, "rb") as f:
+            f.seek((os.path.getsize(path) // ROLLUP.size - 1) * ROLLUP.size)
+            return list(ROLLUP.unpack(f.read(ROLLUP.size)))
+
+    def _roll_up(self, resolution: str, reading: tuple):
+        timestamp, temperature, condition = reading
+        bucket = timestamp - timestamp % RESOLUTIONS[resolution]
+        current = self.buckets[resolution]
+        path = f"{self.path}.{resolution}"
+        if current is not None and current[0] == bucket:
+            current[1] += 1
+            current[2] = min(current[2], temperature)
+            current[3] = max(current[3], temperature)
+            current[4] += temperature
+            current[5] = condition
+            with open(path, "r+b") as f:   # the newest bucket is the last record: rewrite it
+                f.seek(-ROLLUP.size, os.SEEK_END)
+                f.write(ROLLUP.pack(*current))
+        else:
+            current = [bucket, 1, temperature, temperature, temperature, condition]
+            with open(path, "ab") as f:
+                f.write(ROLLUP.pack(*current))
+        self.buckets[resolution] = current
+
+    def expire(self, now: int):
+        """Drop raw blocks older than RAW_DAYS and hourly rollups older than HOUR_DAYS."""
+        raw_cutoff = now - RAW_DAYS * 86400
+        keep = bisect_right(self.lasts, raw_cutoff)   # blocks ending before the cutoff go
+        if keep:
+            base = self.offsets[keep]
+            with open(self.path + ".blocks", "rb") as f:
+                f.seek(base + self.skew)
+                data = f.read()
+            # the kept entries' offsets stay valid, so the index can be trimmed second
+            self._replace(".blocks", BLOCKS_HEADER.pack(BLOCKS_MAGIC, base) + data)
+            self.base, self.skew = base, BLOCKS_HEADER.size - base
+            self.firsts, self.lasts = self.firsts[keep:], self.lasts[keep:]
+            self.offsets = self.offsets[keep:]
+            self.lengths, self.counts = self.lengths[keep:], self.counts[keep:]
+            self._replace(".idx", b"".join(INDEX.pack(*row) for row in zip(self.firsts, self.lasts, self.offsets,
+                                                                            self.lengths, self.counts)))
+        hour_cutoff = now - HOUR_DAYS * 86400
+        first = self._rollups("hour", None, None, limit=1)
+        if first and first[0][0] < hour_cutoff - 30 * 86400:   # trim about once a month
+            kept = self._rollups("hour", hour_cutoff, None)
+            self._replace(".hour", b"".join(ROLLUP.pack(*row) for row in kept))
+
+    def _replace(self, suffix: str, data: bytes):
+        tmp_path = f"{self.path}{suffix}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path + suffix)
+
+    # --- reading ---------------------------------------------------------------------------
+
+    def readings(self, start: int | None = None, end: int | None = None) -> list:
+        """Raw (time, temperature, condition) readings with start <= time < end."""
+        start = start if start is not None else -2 ** 62
+        end = end if end is not None else 2 ** 62
+        readings = []
+        first = bisect_left(self.lasts, start)
+        last = bisect_left(self.firsts, end)
+        if first < last:
+            with open(self.path + ".blocks", "rb") as f:
+                for i in range(first, last):
+                    f.seek(self.offsets[i] + self.skew)
+                    readings.extend(decode_block(f.read(self.lengths[i])))
+        readings.extend(self.head)
+        return [reading for reading in readings if start <= reading[0] < end]
+
+    def _rollups(self, resolution: str, start: int | None, end: int | None, limit: int | None = None) -> list:
+        path = f"{self.path}.{resolution}"
+        if not os.path.exists(path):
+            return []
+        with open(path, "rb") as f:
+            count = os.path.getsize(path) // ROLLUP.size
+            low, high = 0, count
+            while start is not None and low < high:   # first bucket starting at or after start
+                middle = (low + high) // 2
+                f.seek(middle * ROLLUP.size)
+                if struct.unpack("<q", f.read(8))[0] < start:
+                    low = middle + 1
+                else:
+                    high = middle
+            f.seek(low * ROLLUP.size)
+            rows = []
+            while low < count and (limit is None or len(rows) < limit):
+                row = ROLLUP.unpack(f.read(ROLLUP.size))
+                if end is not None and row[0] >= end:
+                    break
+                rows.append(row)
+                low += 1
+        return rows
+
+    def rollups(self, resolution: str, start: int | None = None, end: int | None = None) -> list:
+        """(bucket start, count, min, max, sum, last condition) per hour or day in the range."""
+        if start is not None:
+            start -= start % RESOLUTIONS[resolution]
+        return self._rollups(resolution, start, end)
+
+
+class WeatherHistory:
+    def __init__(self, folder: str = HISTORY_DIR):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self.series = {}
+        self.conditions_path = os.path.join(folder, "conditions.json")
+        self.conditions = []
+        if os.path.exists(self.conditions_path):
+            with open(self.conditions_path, "r", encoding="utf-8") as f:
+                self.conditions = json.load(f)
+        self.codes = {text: code for code, text in enumerate(self.conditions)}
+
+    def _series(self, city: str) -> Series:
+        name = normalize(city).replace(" ", "_").replace(os.sep, "_")
+        if name not in self.series:
+            self.series[name] = Series(self.folder, name)
+        return self.series[name]
+
+    def _code(self, condition: str) -> int:
+        if condition not in self.codes:
+            self.codes[condition] = len(self.conditions)
+            self.conditions.append(condition)
+            tmp_path = self.conditions_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.conditions, f)
+            os.replace(tmp_path, self.conditions_path)
+        return self.codes[condition]
+
+    def record(self, city: str, temperature: float, condition: str, timestamp: int | None = None) -> bool:
+        """Add a reading; False (nothing added) when the city already has one at or after
+        `timestamp`, e.g. the same observation answered twice."""
+        timestamp = int(timestamp if timestamp is not None else time.time())
+        series = self._series(city)
+        last = series.last_time()
+        if last is not None and timestamp <= last:
+            return False
+        series.append(timestamp, round(temperature * 100), self._code(condition))
+        return True
+
+    def cities(self) -> list:
+        return sorted(name[:-len(".day")] for name in os.listdir(self.folder) if name.endswith(".day"))
+
+    def readings(self, city: str, start: int | None = None, end: int | None = None) -> list:
+        """[(time, temperature, condition), ...] as recorded."""
+        return [(timestamp, temperature / 100, self.conditions[code])
+                for timestamp, temperature, code in self._series(city).readings(start, end)]
+
+    def rollups(self, city: str, resolution: str, start: int | None = None, end: int | None = None) -> list:
+        """[(bucket start, readings, min, max, mean, last condition), ...] per hour or day."""
+        return [(bucket, count, low / 100, high / 100, round(total / count / 100, 2), self.conditions[code])
+                for bucket, count, low, high, total, code in self._series(city).rollups(resolution, start, end)]
+
+    def flush(self):
+        """Seal every head into a block (e.g. before copying the folder elsewhere)."""
+        for series in self.series.values():
+            series.seal()
+
+
+# --- command line ----------------------------------------------------------------------------
+
+async def poll(history: WeatherHistory, cities: list, every: float, rounds: int | None, client):
+    import asyncio
+    from weather_api import fetch_many   # only the poller needs the network client
+    done = 0
+    while rounds is None or done < rounds:
+        started = time.monotonic()
+        async for result in fetch_many(cities, client):
+            if result.error is None:
+                weather = result.weather
+                history.record(result.query, weather.temperature, weather.condition, weather.observed)
+            else:
+                print(f"{result.query}: {result.error}")
+        done += 1
+        await asyncio.sleep(max(0.0, every - (time.monotonic() - started)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Weather history")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    poller = subcommands.add_parser("poll", help="Record the weather of some cities every so often")
+    poller.add_argument("--cities-file", required=True, help="One city per line")
+    poller.add_argument("--every", type=float, default=600, help="Seconds between rounds")
+    poller.add_argument("--rounds", type=int, help="Stop after this many rounds")
+    poller.add_argument("--base-url", help="Another server speaking the OpenWeatherMap API, e.g. stub_server.py")
+    show = subcommands.add_parser("show", help="Print a city's history")
+    show.add_argument("city")
+    show.add_argument("--days", type=float, default=1)
+    show.add_argument("--resolution", choices=["raw", *RESOLUTIONS], default="hour")
+    for command in (poller, show):
+        command.add_argument("--folder", default=HISTORY_DIR)
+    args = parser.parse_args()
+
+    history = WeatherHistory(args.folder)
+    if args.command == "poll":
+        try:
+            with open(args.cities_file, "r", encoding="utf-8") as f:
+                cities = [line.strip() for line in f if line.strip()]
+        except FileNotFoundError:
+            print(f"File not found: {args.cities_file}")
+            sys.exit(1)
+        from weather_api import BASE_URL, WeatherClient
+        ttl = min(args.every / 2, 600)   # each round gets a fresh reading, never a stale one
+        client = WeatherClient(base_url=args.base_url or BASE_URL, ttl=ttl, stale_ttl=ttl)
+        import asyncio
+        try:
+            asyncio.run(poll(history, cities, args.every, args.rounds, client))
+        except KeyboardInterrupt:
+            print("\nStopped")
+        return
+
+    start = int(time.time() - args.days * 86400)
+    if args.resolution == "raw":
+        for timestamp, temperature, condition in history.readings(args.city, start):
+            print(f"{datetime.fromtimestamp(timestamp, timezone.utc):%Y-%m-%d %H:%M} UTC  {temperature:6.1f}°C  {condition}")
+    else:
+        for bucket, count, low, high, mean, condition in history.rollups(args.city, args.resolution, start):
+            print(f"{datetime.fromtimestamp(bucket, timezone.utc):%Y-%m-%d %H:%M} UTC  {mean:6.1f}°C  "
+                  f"({low:.1f} to {high:.1f}, {count} readings)  {condition}")
+
+
+if __name__ == "__main__":
+    main()
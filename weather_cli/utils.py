@@ -0,0 +1,32 @@
+# utils.py
+# Small helpers shared by the weather CLI modules.
+import os
+import unicodedata
+
+
+def cache_dir() -> str:
+    """Folder for files the tools can rebuild at any time (the API answer cache, ...):
+    $WEATHER_CLI_CACHE, else weather_cli in the user's cache folder. Created by whoever writes."""
+    path = os.environ.get("WEATHER_CLI_CACHE")
+    if path:
+        return path
+    base = os.environ.get("XDG_CACHE_HOME") or (os.name == "nt" and os.environ.get("LOCALAPPDATA"))
+    return os.path.join(base or os.path.join(os.path.expanduser("~"), ".cache"), "weather_cli")
+
+
+def data_dir() -> str:
+    """Folder for files that can't be rebuilt (the recorded weather history): $WEATHER_CLI_DATA,
+    else weather_cli in the user's data folder. Created by whoever writes."""
+    path = os.environ.get("WEATHER_CLI_DATA")
+    if path:
+        return path
+    base = os.environ.get("XDG_DATA_HOME") or (os.name == "nt" and os.environ.get("LOCALAPPDATA"))
+    return os.path.join(base or os.path.join(os.path.expanduser("~"), ".local", "share"), "weather_cli")
+
+
+def normalize(name: str) -> str:
+    """Lowercase, accents removed and spaces collapsed: "  São  Paulo" -> "sao paulo"."""
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.casefold().split())
+
@@ -0,0 +1,317 @@
+# weather_api.py
+# A weather client that reuses its HTTP connections and remembers answers.
+# Weather changes over minutes, so every lookup going back to OpenWeatherMap is wasted time.
+# WeatherClient keeps one pooled requests.Session and a cache keyed by normalized city + units,
+# in memory and in a JSON file in the user's cache folder (utils.cache_dir) so it survives restarts:
+#   - younger than ttl: returned straight from the cache
+#   - older than ttl but younger than stale_ttl: returned from the cache right away while a
+#     background thread fetches a fresh copy (stale-while-revalidate)
+#   - unknown cities (404) are remembered for negative_ttl, so typos don't hit the API again
+# base_url can point at any server speaking the same API, e.g. stub_server.py for testing.
+# A place is a city name or a (lat, lon) pair (see gazetteer.py), so a city resolved offline
+# goes straight to the coordinate endpoint.
+#
+# fetch_many() looks up many cities concurrently: an asyncio loop hands at most `concurrency`
+# lookups at a time to worker threads sharing one client (and its connection pool and cache),
+# a token bucket keeps network requests within the provider's quota (cache hits don't use
+# tokens, the background refreshes of stale copies do), failed requests are retried with
+# jittered exponential backoff, and results are yielded as they complete. summarize() turns them into throughput and p50/p99 latency.
+# asyncio and the thread pool are imported by the code that uses them, so a single lookup
+# from the command line doesn't pay for loading them.
+import json
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils import cache_dir
+
+API_KEY = os.environ.get("OPENWEATHER_API_KEY", "a5c4587eb7d0fea4393168e756d914d3")
+BASE_URL = "https://api.openweathermap.org/data/2.5/weather"
+CACHE_FILE = os.path.join(cache_dir(), "weather_cache.json")
+
+TTL = 10 * 60            # seconds a reading is used as is
+STALE_TTL = 60 * 60      # seconds a reading may still be shown while it is refreshed
+NEGATIVE_TTL = 5 * 60    # seconds an unknown city is remembered
+POOL_SIZE = 10
+RATE = 1.0               # requests per second allowed by the provider (60 a minute on the free plan)
+BURST = 10               # requests that may go out at once after a quiet spell
+RETRIES = 3
+BACKOFF = 0.5            # seconds before the first retry, doubled for every retry after it
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+Weather = namedtuple("Weather", ["city", "temperature", "condition", "observed"], defaults=[None])   # observed: unix time
+Result = namedtuple("Result", ["query", "weather", "error", "seconds", "attempts"])
+
+
+class CityNotFound(requests.exceptions.HTTPError):
+    """The API doesn't know the city (also raised from the cache for a recent miss)."""
+
+
+def cache_key(place, units: str) -> str:
+    if isinstance(place, tuple):
+        return f"{place[0]:.2f},{place[1]:.2f}|{units}"
+    return f"{' '.join(place.split()).casefold()}|{units}"
+
+
+def place_params(place) -> dict:
+    if isinstance(place, tuple):
+        return {"lat": place[0], "lon": place[1]}
+    return {"q": place}
+
+
+def parse_weather(data: dict) -> Weather:
+    return Weather(data["name"], data["main"]["temp"], data["weather"][0]["description"], data.get("dt"))
+
+
+class WeatherClient:
+    def __init__(self, api_key=API_KEY, base_url=BASE_URL, cache_path=CACHE_FILE, ttl=TTL,
+                 stale_ttl=STALE_TTL, negative_ttl=NEGATIVE_TTL, timeout=10, pool_size=POOL_SIZE):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.lock = threading.Lock()
+        self.refreshing = set()   # keys being revalidated in the background
+        self.autosave = True      # write the disk cache after every fetch (fetch_many saves once at the end)
+        self.cache = self._load_cache()
+        self.stats = {"hits": 0, "stale": 0, "misses": 0, "negative": 0}
+
+    # --- cache -----------------------------------------------------------------------------
+
+    def _load_cache(self) -> dict:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return {}
+
+    def _save_cache(self):
+        """Write the cache to disk (callers hold the lock); stale entries are dropped."""
+        if not self.cache_path:
+            return
+        now = time.time()
+        self.cache = {key: entry for key, entry in self.cache.items()
+                      if now - entry["fetched"] < (self.stale_ttl if entry["data"] else self.negative_ttl)}
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.cache, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            pass   # the cache is an optimization; a read-only folder just means no disk cache
+
+    def _store(self, key: str, data):
+        with self.lock:
+            self.cache[key] = {"fetched": time.time(), "data": data}
+            if self.autosave:
+                self._save_cache()
+
+    def save(self):
+        with self.lock:
+            self._save_cache()
+
+    # --- fetching --------------------------------------------------------------------------
+
+    def _fetch(self, city, units: str, key: str) -> dict:
+        params = dict(place_params(city), appid=self.api_key, units=units)
+        response = self.session.get(self.base_url, params=params, timeout=self.timeout)
+        if response.status_code == 404:
+            self._store(key, None)
+            raise CityNotFound(f"City not found: {city}", response=response)
+        response.raise_for_status()
+        data = response.json()
+        self._store(key, data)
+        return data
+
+    def _revalidate(self, city, units: str, key: str):
+        try:
+            self._fetch(city, units, key)
+        except requests.exceptions.RequestException:
+            pass   # keep serving the stale copy; the next lookup tries again
+        finally:
+            with self.lock:
+                self.refreshing.discard(key)
+
+    def cached(self, city, units: str = "metric", revalidate=None) -> Weather | None:
+        """The weather from the cache, or None if it has to be fetched. A stale copy is refreshed
+        in the background by `revalidate(city, units)` if given, else on a thread of its own."""
+        key = cache_key(city, units)
+        with self.lock:
+            entry = self.cache.get(key)
+        if entry is not None:
+            age = time.time() - entry["fetched"]
+            if entry["data"] is None:
+                if age < self.negative_ttl:
+                    self.stats["negative"] += 1
+                    raise CityNotFound(f"City not found: {city}")
+            elif age < self.ttl:
+                self.stats["hits"] += 1
+                return parse_weather(entry["data"])
+            elif age < self.stale_ttl:
+                self.stats["stale"] += 1
+                with self.lock:
+                    start = key not in self.refreshing
+                    self.refreshing.add(key)
+                if start and revalidate:
+                    revalidate(city, units)
+                elif start:
+                    threading.Thread(target=self._revalidate, args=(city, units, key), daemon=True).start()
+                return parse_weather(entry["data"])
+        return None
+
+    def fetch(self, city, units: str = "metric") -> Weather:
+        """Ask the API, bypassing (but updating) the cache."""
+        self.stats["misses"] += 1
+        return parse_weather(self._fetch(city, units, cache_key(city, units)))
+
+    def get(self, city, units: str = "metric") -> Weather:
+        return self.cached(city, units) or self.fetch(city, units)
+
+    def close(self):
+        self.session.close()
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average and up to `capacity` in a burst."""
+
+    def __init__(self, rate=RATE, capacity=BURST):
+        import asyncio
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        import asyncio
+        async with self.lock:   # first come, first served
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def retry_delay(attempt: int, error: Exception, backoff=BACKOFF) -> float | None:
+    """Seconds to wait before retrying after `error`, or None if it isn't worth retrying."""
+    if isinstance(error, CityNotFound):
+        return None
+    response = getattr(error, "response", None)
+    if response is not None:
+        if response.status_code not in RETRY_STATUSES:
+            return None
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return float(retry_after)
+    return backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)   # jitter spreads the retries out
+
+
+async def fetch_many(cities, client=None, units="metric", concurrency=POOL_SIZE, rate=RATE, burst=BURST,
+                     retries=RETRIES, backoff=BACKOFF):
+    """Yield a Result for every city, in the order the lookups finish. Stale cached copies are
+    returned at once and refreshed within the rate limit; fetch_many waits for those refreshes
+    after the last result."""
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    own_client = client is None
+    client = client or WeatherClient(pool_size=concurrency)
+    bucket = TokenBucket(rate, burst)
+    slots = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+    refreshes = []
+
+    async def refresh(city):
+        key = cache_key(city, units)
+        try:
+            await bucket.acquire()
+            await loop.run_in_executor(workers, client._revalidate, city, units, key)
+        finally:
+            with client.lock:
+                client.refreshing.discard(key)   # also when cancelled before it ran
+
+    def revalidate(city, units):
+        refreshes.append(asyncio.ensure_future(refresh(city)))
+
+    async def lookup(city):
+        async with slots:
+            start = time.perf_counter()   # latency of the lookup itself, not of waiting for a slot
+            try:
+                weather = client.cached(city, units, revalidate)
+            except CityNotFound as err:
+                return Result(city, None, err, time.perf_counter() - start, 0)
+            if weather:
+                return Result(city, weather, None, time.perf_counter() - start, 0)
+            attempt = 0
+            while True:
+                attempt += 1
+                await bucket.acquire()
+                try:
+                    weather = await loop.run_in_executor(workers, client.fetch, city, units)
+                    return Result(city, weather, None, time.perf_counter() - start, attempt)
+                except requests.exceptions.RequestException as err:
+                    delay = retry_delay(attempt, err, backoff)
+                    if delay is None or attempt > retries:
+                        return Result(city, None, err, time.perf_counter() - start, attempt)
+                except (KeyError, IndexError, TypeError) as err:   # an answer without the usual fields
+                    return Result(city, None, err, time.perf_counter() - start, attempt)
+                await asyncio.sleep(delay)
+
+    autosave, client.autosave = client.autosave, False
+    with ThreadPoolExecutor(max_workers=concurrency) as workers:
+        tasks = [asyncio.ensure_future(lookup(city)) for city in cities]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+            await asyncio.gather(*refreshes)
+        finally:
+            for task in tasks + refreshes:
+                task.cancel()
+            client.autosave = autosave
+            client.save()
+            if own_client:
+                client.close()
+
+
+def summarize(results, elapsed: float) -> dict:
+    """Counts, throughput and latency percentiles (in ms) of a list of Results."""
+    seconds = sorted(result.seconds for result in results)
+    pick = lambda q: round(1000 * seconds[min(int(q * len(seconds)), len(seconds) - 1)], 1) if seconds else 0.0
+    return {
+        "cities": len(results),
+        "ok": sum(result.error is None for result in results),
+        "failed": sum(result.error is not None for result in results),
+        "requests": sum(result.attempts for result in results),
+        "elapsed": round(elapsed, 2),
+        "per_second": round(len(results) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": pick(0.5),
+        "p99_ms": pick(0.99),
+    }
+
+
+_default_client = None
+
+
+def default_client() -> WeatherClient:
+    """One shared client per process, so every lookup shares its connections and cache."""
+    global _default_client
+    if _default_client is None:
+        _default_client = WeatherClient()
+    return _default_client